@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+"""
+A script for measuring how quickly each kind of spider (and the venue apis)
+turns pages into events, off of fixtures recorded with --record, so that it
+can be run (and compared run to run) without a network connection.
+"""
+
+from Queue import Empty
+from multiprocessing import Process, Queue
+import argparse
+import os
+import resource
+import sys
+import time
+
+from mgrok import scrapers
+from mgrok.fixtures import (
+    record_api,
+    record_settings,
+    replay_api,
+    replay_settings,
+    )
+from mgrok.metrics import cpu_time
+from mgrok.ticketfly_api import (
+    BrooklynBowlApi,
+    CapitolTheatreApi,
+    GarciasAtTheCapitolTheatreApi,
+    StVitusApi,
+    )
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+
+
+# The spiders benchmarked for each base class
+BENCHMARKS = [
+    ('_BoweryPresentsSpider', [
+        scrapers.BoweryBallroomSpider,
+        scrapers.MercuryLoungeSpider,
+        scrapers.MusicHallOfWilliamsburgSpider,
+        scrapers.RoughTradeSpider,
+        scrapers.TerminalFiveSpider,
+        ]),
+    ('_TicketWebSpider', [
+        scrapers.HighlineBallroomSpider,
+        scrapers.KnittingFictorySpider,
+        scrapers.TheBoweryElectricSpider,
+        scrapers.TheHallAtMpSpider,
+        scrapers.TheStudioAtWebsterHallSpider,
+        scrapers.WarsawSpider,
+        scrapers.WebsterHallSpider,
+        ]),
+    ('_RockwoodSpider', [
+        scrapers.RockwoodSpider,
+        ]),
+    ('_MSGSpider', [
+        scrapers.MSGSpider,
+        scrapers.RadioCitySpider,
+        scrapers.TheBeaconSpider,
+        scrapers.TheTheaterAtMSGSpider,
+        ]),
+    ('CityWinerySpider', [
+        scrapers.CityWinerySpider,
+        ]),
+    ]
+
+TICKETFLY_APIS = [
+    BrooklynBowlApi,
+    CapitolTheatreApi,
+    GarciasAtTheCapitolTheatreApi,
+    StVitusApi,
+    ]
+
+def _crawl_settings(extra_settings):
+    settings = Settings({
+        'LOG_ENABLED': False,
+        'USER_AGENT': 'Chrome/41.0.2228.0'
+        })
+    settings.setdict(extra_settings)
+    return settings
+
+
+def record(fixture_dir):
+    """Crawls every benchmarked spider and api live, saving what comes back."""
+    crawler_process = CrawlerProcess(
+        _crawl_settings(record_settings(fixture_dir)))
+    for _, spiders in BENCHMARKS:
+        for spider in spiders:
+            crawler_process.crawl(spider)
+    crawler_process.start()
+
+    for api in TICKETFLY_APIS:
+        record_api(api(), fixture_dir)
+
+
+def _peak_memory_mb():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _replay_spiders(spiders, fixture_dir, results):
+    """Crawls spiders off of fixtures, putting how it went on results."""
+    extra_settings = replay_settings(fixture_dir)
+    extra_settings['SPIDER_MIDDLEWARES'] = {
+        'mgrok.metrics.ParseTimingMiddleware': 990
+        }
+    crawler_process = CrawlerProcess(_crawl_settings(extra_settings))
+    crawlers = []
+    for spider in spiders:
+        crawler = crawler_process.create_crawler(spider)
+        crawlers.append(crawler)
+        crawler_process.crawl(crawler)
+
+    started = time.time()
+    crawler_process.start()
+    wall_time = time.time() - started
+
+    items, responses, parse_time, max_parse_time = 0, 0, 0.0, 0.0
+    for crawler in crawlers:
+        stats = crawler.stats
+        items += stats.get_value('item_scraped_count', 0)
+        responses += stats.get_value('parse/responses', 0)
+        parse_time += stats.get_value('parse/cpu_time', 0.0)
+        max_parse_time = max(
+            max_parse_time, stats.get_value('parse/max_cpu_time', 0.0))
+    results.put({
+        'items': items,
+        'responses': responses,
+        'wall_time': wall_time,
+        'parse_time': parse_time,
+        'max_parse_time': max_parse_time,
+        'peak_memory_mb': _peak_memory_mb(),
+        })
+
+
+def _run_apart(target, args):
+    """
+    Runs target(*args, results) in a process of its own, and returns what it
+    puts on results, or None if the process dies without putting anything
+    there (e.g. it couldn't import something, or the reactor failed).
+    """
+    results = Queue()
+    process = Process(target=target, args=args + (results,))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=1)
+        except Empty:
+            if process.exitcode is not None:
+                # It may have put its result there just before exiting.
+                try:
+                    result = results.get(timeout=1)
+                except Empty:
+                    break
+    process.join()
+    if result is None:
+        sys.stderr.write('{} exited with {} without a result\n'.format(
+            target.__name__, process.exitcode))
+    return result
+
+
+def benchmark_spiders(spiders, fixture_dir):
+    """
+    Returns the timings of a crawl of spiders off of fixtures, or None if it
+    failed. Each crawl gets a process of its own, as the twisted reactor can
+    only be run once, and so that peak memory is the crawl's alone.
+    """
+    return _run_apart(_replay_spiders, (spiders, fixture_dir))
+
+
+def _replay_api(api, fixture_dir, repetitions, results):
+    events = replay_api(api, fixture_dir)
+    items = 0
+    started = cpu_time()
+    for _ in range(repetitions):
+        items += sum(len(venue_events) for venue_events in
+                     api.format_events(events).values())
+    parse_time = cpu_time() - started
+    results.put({
+        'items': items,
+        'responses': repetitions,
+        'wall_time': parse_time,
+        'parse_time': parse_time,
+        'max_parse_time': parse_time / repetitions,
+        'peak_memory_mb': _peak_memory_mb(),
+        })
+
+
+def benchmark_api(api, fixture_dir, repetitions):
+    """
+    Returns the timings of formatting an api's recorded events, or None if
+    it failed.
+    """
+    return _run_apart(_replay_api, (api, fixture_dir, repetitions))
+
+
+def print_result(name, result):
+    if result is None:
+        print '{:<48} {:>7}'.format(name, 'failed')
+        return
+    items_per_sec = (
+        result['items'] / result['wall_time'] if result['wall_time'] else 0)
+    parse_ms = (
+        1000 * result['parse_time'] / result['responses']
+        if result['responses'] else 0)
+    print '{:<48} {:>7} {:>10.1f} {:>10.2f} {:>10.2f} {:>9.1f}'.format(
+        name, result['items'], items_per_sec, parse_ms,
+        1000 * result['max_parse_time'], result['peak_memory_mb'])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='benchmark the spiders and venue apis off of fixtures.')
+    parser.add_argument(
+        'fixture_dir',
+        help='directory the fixtures are recorded to and replayed from')
+    parser.add_argument(
+        '--record', action='store_true',
+        help='crawl the sites (and query the apis) live, and record fixtures '
+        'of them, rather than benchmarking')
+    parser.add_argument(
+        '--repetitions', type=int, default=100,
+        help='number of times to format each api\'s events')
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.fixture_dir)
+        return os.EX_OK
+
+    print '{:<48} {:>7} {:>10} {:>10} {:>10} {:>9}'.format(
+        'benchmark', 'items', 'items/sec', 'ms/parse', 'max ms', 'peak MB')
+    results = []
+    for name, spiders in BENCHMARKS:
+        results.append(benchmark_spiders(spiders, args.fixture_dir))
+        print_result(name, results[-1])
+    for api in TICKETFLY_APIS:
+        results.append(
+            benchmark_api(api(), args.fixture_dir, args.repetitions))
+        print_result(
+            '_TicketFlyApi.format_events ({})'.format(api.__name__),
+            results[-1])
+    return os.EX_OK if None not in results else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
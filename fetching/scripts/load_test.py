@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+"""
+A script for measuring how many requests a second serve_events.py answers,
+by having a number of clients query it as fast as they can.
+"""
+
+from datetime import date, timedelta
+from itertools import cycle
+from threading import Thread
+import argparse
+import httplib
+import os
+import sys
+import time
+
+
+def default_queries():
+    """Returns a mix of the queries the frontend makes."""
+    today = date.today()
+    next_week = today + timedelta(7)
+    return [
+        '/events',
+        '/events?from={}&to={}'.format(today, today),
+        '/events?from={}&to={}'.format(today, next_week),
+        ]
+
+
+def run_client(host, port, queries, revalidate, results):
+    """
+    Requests each of queries over a single (kept alive) connection,
+    appending each response's status and latency to results.
+    """
+    connection = httplib.HTTPConnection(host, port)
+    etags = {}
+    for query in queries:
+        headers = {}
+        if revalidate and query in etags:
+            headers['If-None-Match'] = etags[query]
+        started = time.time()
+        connection.request('GET', query, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        results.append((response.status, time.time() - started))
+        if response.getheader('ETag'):
+            etags[query] = response.getheader('ETag')
+    connection.close()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='load test serve_events.py.')
+    parser.add_argument(
+        '--host', default='localhost', help='host the server is on')
+    parser.add_argument(
+        '--port', type=int, default=8080, help='port the server is on')
+    parser.add_argument(
+        '--clients', type=int, default=8,
+        help='number of clients making requests at once')
+    parser.add_argument(
+        '--requests', type=int, default=1000,
+        help='number of requests each client makes')
+    parser.add_argument(
+        '--query', action='append', dest='queries',
+        help='path to request (may be given more than once; defaults to a '
+        'mix of the frontend\'s queries)')
+    parser.add_argument(
+        '--revalidate', action='store_true',
+        help='send the ETag of each query\'s last response along with it')
+    args = parser.parse_args()
+
+    queries = args.queries or default_queries()
+    # Every client goes through the queries in turn, from a different one.
+    client_queries = []
+    for client in range(args.clients):
+        offset = client % len(queries)
+        rotated = cycle(queries[offset:] + queries[:offset])
+        client_queries.append([next(rotated) for _ in range(args.requests)])
+
+    results = []
+    clients = [
+        Thread(target=run_client, args=(
+            args.host, args.port, client_queries[client], args.revalidate,
+            results))
+        for client in range(args.clients)]
+    started = time.time()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.time() - started
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print '{} requests in {:.2f}s: {:.1f} requests/sec'.format(
+        len(results), elapsed, len(results) / elapsed)
+    print 'latency (ms): p50 {:.2f}, p90 {:.2f}, p99 {:.2f}, max {:.2f}'.format(
+        *[1000 * _percentile(latencies, fraction)
+          for fraction in (0.5, 0.9, 0.99, 1)])
+    print 'statuses: {}'.format(
+        ', '.join('{}: {}'.format(*item) for item in sorted(statuses.items())))
+    return os.EX_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
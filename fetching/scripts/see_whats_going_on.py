@@ -5,10 +5,14 @@ A script for collecting data about various shows going on and aggregating them
 into a single output file.
 """
 
-from datetime import datetime
+from functools import partial
 import argparse
 import json
+import os
+import shutil
+import subprocess
 import sys
+import tempfile
 
 from mgrok.scrapers import (
     BoweryBallroomSpider,
@@ -19,9 +23,7 @@ from mgrok.scrapers import (
     MercuryLoungeSpider,
     MusicHallOfWilliamsburgSpider,
     RadioCitySpider,
-    RockwoodStageOneSpider,
-    RockwoodStageThreeSpider,
-    RockwoodStageTwoSpider,
+    RockwoodSpider,
     RoughTradeSpider,
     TerminalFiveSpider,
     TheBeaconSpider,
@@ -37,11 +39,29 @@ from mgrok.ticketfly_api import (
     CapitolTheatreApi,
     GarciasAtTheCapitolTheatreApi,
     StVitusApi,
+    _TicketFlyApi,
+    fetch_api_sites_data,
     )
-from dateutil.parser import parse as parse_date_str
-from pytz import timezone
+from mgrok import compact, httpcache, search
+from mgrok.daemon import RefreshDaemon
+from mgrok.deltas import publish_delta, read_published
+from mgrok.horizon import Horizon
+from mgrok.metrics import RunReport
+from mgrok.output import (
+    JsonLinesWriter,
+    build_output,
+    finalize_jsonl,
+    group_by_venue,
+    read_jsonl,
+    truncate_jsonl,
+    write_shards,
+    )
+from mgrok.publish import publish
+from mgrok.store import EventDatabase
+from mgrok.workers import partition, spider_costs
 from scrapy.crawler import CrawlerProcess
 from scrapy.settings import Settings
+from twisted.internet import defer, reactor, task, threads
 
 
 SCRAPY_SPIDERS = [
@@ -59,10 +79,8 @@ SCRAPY_SPIDERS = [
     MusicHallOfWilliamsburgSpider,
     RoughTradeSpider,
     TerminalFiveSpider,
-    # Rockwood
-    RockwoodStageOneSpider,
-    RockwoodStageThreeSpider,
-    RockwoodStageTwoSpider,
+    # Rockwood (all stages)
+    RockwoodSpider,
     # MSG
     MSGSpider,
     RadioCitySpider,
@@ -72,8 +90,117 @@ SCRAPY_SPIDERS = [
     CityWinerySpider,
     ]
 
-def get_scraped_sites_data():
-    """Returns output for venues which need to be scraped."""
+TICKETFLY_APIS = [
+    BrooklynBowlApi,
+    CapitolTheatreApi,
+    GarciasAtTheCapitolTheatreApi,
+    StVitusApi,
+    ]
+
+def get_crawl_settings(args, report=None, database=None):
+    """
+    Returns the scrapy settings called for by the command line arguments, for
+    recording the crawl into a RunReport, if given, and for writing shows to
+    an EventDatabase, if given.
+    """
+    crawl_settings = {
+        # Only collect shows within the window the apis are queried for.
+        'DATE_HORIZON': [args.days_behind, args.days_ahead],
+        'ITEM_PIPELINES': {
+            'mgrok.horizon.HorizonFilterPipeline': 0
+            },
+        }
+    if report is not None:
+        crawl_settings['RUN_REPORT'] = report
+        crawl_settings.setdefault('EXTENSIONS', {}).update({
+            'mgrok.metrics.CrawlMetricsExtension': 500
+            })
+        crawl_settings.setdefault('SPIDER_MIDDLEWARES', {}).update({
+            'mgrok.metrics.ParseTimingMiddleware': 990
+            })
+    if args.cache_dir:
+        # Keep pages between runs, and revalidate them with conditional GETs
+        # instead of downloading them again.
+        crawl_settings.update({
+            'HTTPCACHE_ENABLED': True,
+            'HTTPCACHE_DIR': os.path.abspath(args.cache_dir),
+            'HTTPCACHE_EXPIRATION_SECS': args.cache_ttl,
+            'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.RFC2616Policy',
+            'HTTPCACHE_STORAGE':
+                'mgrok.httpcache.BoundedFilesystemCacheStorage',
+            })
+    if args.incremental_dir:
+        # Re-use what was scraped from known events' pages last time around.
+        crawl_settings.update({
+            'INCREMENTAL_STORE_DIR': os.path.abspath(args.incremental_dir),
+            'INCREMENTAL_REFRESH_LIMIT': args.incremental_refresh_limit,
+            })
+        crawl_settings.setdefault('SPIDER_MIDDLEWARES', {}).update({
+            'mgrok.incremental.IncrementalCrawlMiddleware': 950
+            })
+    if args.host_concurrency:
+        # Share per-host limits between all the spiders which hit the same
+        # ticketing site, rather than each crawling it as hard as it likes.
+        crawl_settings.update({
+            'HOST_THROTTLE_CONCURRENCY': args.host_concurrency,
+            'HOST_THROTTLE_MAX_DELAY': args.host_max_delay,
+            })
+        crawl_settings.setdefault('DOWNLOADER_MIDDLEWARES', {}).update({
+            'mgrok.throttle.HostThrottleMiddleware': 950
+            })
+    if args.shared_responses:
+        # Spiders which come across the same page (e.g. an event on more
+        # than one venue's calendar) only fetch it once between them.
+        crawl_settings['SHARED_RESPONSE_CACHE_SIZE'] = args.shared_responses
+        crawl_settings.setdefault('DOWNLOADER_MIDDLEWARES', {}).update({
+            'mgrok.sharing.SharedResponseMiddleware': 880
+            })
+    if args.stream:
+        # Write items out as they're scraped instead of collecting them.
+        crawl_settings.update({
+            'PIPELINE_JSONL_PATH': os.path.abspath(args.stream),
+            'PIPELINE_JSONL_PER_VENUE': args.stream_per_venue,
+            })
+        crawl_settings.setdefault('ITEM_PIPELINES', {}).update({
+            'mgrok.pipelines.JsonWriterPipeline': None,
+            'mgrok.pipelines.JsonLinesWriterPipeline': 1,
+            })
+    if database is not None:
+        # Upsert items into the database instead of collecting them.
+        crawl_settings['PIPELINE_DATABASE'] = database
+        crawl_settings.setdefault('ITEM_PIPELINES', {}).update({
+            'mgrok.pipelines.JsonWriterPipeline': None,
+            'mgrok.pipelines.DatabaseWriterPipeline': 1,
+            })
+    return crawl_settings
+
+def get_settings(extra_settings=None):
+    """Returns the scrapy settings to crawl with."""
+    settings = Settings({
+        'LOG_ENABLED': False,
+        'ITEM_PIPELINES': {
+            'mgrok.pipelines.JsonWriterPipeline': 1
+            },
+        'USER_AGENT': 'Chrome/41.0.2228.0'
+        })
+    for name, value in (extra_settings or {}).iteritems():
+        # Component dictionaries (pipelines, middlewares) are merged into the
+        # ones above rather than replacing them.
+        if isinstance(value, dict):
+            components = settings.getdict(name)
+            components.update(value)
+            value = components
+        settings.set(name, value)
+    return settings
+
+def get_scraped_sites_data(extra_settings=None, alongside=None, spiders=None):
+    """
+    Returns output for venues which need to be scraped (by the given spiders,
+    or all of them).
+
+    If given, alongside is called on the reactor's thread pool while the
+    spiders crawl, and the output it returns is merged in with theirs.
+    """
     class RefDict(dict):
         """A dictionary which returns a reference to itself when deepcopied."""
         def __deepcopy__(self, memo):
@@ -84,62 +211,337 @@ def get_scraped_sites_data():
     # only way to return the scraper output to the script itself.
     output = RefDict()
 
-    settings = Settings({
-        'LOG_ENABLED': False,
-        'ITEM_PIPELINES': {
-            'mgrok.pipelines.JsonWriterPipeline': 1
-            },
-        'PIPELINE_OUTPUT': output,
-        'USER_AGENT': 'Chrome/41.0.2228.0'
-        })
+    settings = get_settings(extra_settings)
+    settings.set('PIPELINE_OUTPUT', output)
 
     crawler_process = CrawlerProcess(settings)
-    for spider in SCRAPY_SPIDERS:
+    for spider in (SCRAPY_SPIDERS if spiders is None else spiders):
         crawler_process.crawl(spider)
 
-    crawler_process.start()
+    waiting_on = [crawler_process.join()]
+    if alongside is not None:
+        waiting_on.append(
+            threads.deferToThread(alongside).addCallback(output.update))
+
+    # The reactor is stopped by hand, once both the crawl and whatever's going
+    # on alongside it are done, rather than as soon as the crawl finishes.
+    failures = []
+    finished = defer.DeferredList(
+        waiting_on, fireOnOneErrback=True, consumeErrors=True)
+    finished.addErrback(lambda failure: failures.append(failure.value))
+    finished.addBoth(lambda _: reactor.stop())
+    crawler_process.start(stop_after_crawl=False)
+    if failures:
+        failures[0].subFailure.raiseException()
 
     return output
 
 
-def get_api_sites_data():
-    """Returns output for venues which have APIs"""
-    output = {}
-    output.update(BrooklynBowlApi().get_api_sites_data())
-    output.update(CapitolTheatreApi().get_api_sites_data())
-    output.update(StVitusApi().get_api_sites_data())
-    output.update(GarciasAtTheCapitolTheatreApi().get_api_sites_data())
+def run_worker(args):
+    """
+    Crawls the spiders named by args.worker_spider (in a worker process),
+    streaming their shows out to <args.worker_path>.jsonl and writing their
+    run report to <args.worker_path>.report.json.
+    """
+    path = args.worker_path
+    spiders = [
+        spider for spider in SCRAPY_SPIDERS
+        if spider.name in args.worker_spider]
+    report = RunReport()
+    crawl_settings = get_crawl_settings(args, report)
+    crawl_settings.update({
+        'PIPELINE_JSONL_PATH': path + '.jsonl',
+        'PIPELINE_JSONL_PER_VENUE': False,
+        })
+    crawl_settings.setdefault('ITEM_PIPELINES', {}).update({
+        'mgrok.pipelines.JsonWriterPipeline': None,
+        'mgrok.pipelines.JsonLinesWriterPipeline': 1,
+        })
+    # Per-host limits are per process, but they hold as they are: spiders
+    # crawling the same hosts are all given to the same worker.
+    get_scraped_sites_data(crawl_settings, spiders=spiders)
+    report.write(path + '.report.json')
+
+def get_sharded_sites_data(args, report, alongside=None):
+    """
+    Returns output for venues which need to be scraped, crawled by
+    args.workers worker processes between which the spiders are balanced by
+    their cost in the previous run's report, and adds the workers' metrics to
+    report. A worker which fails has its spiders counted as errors in report
+    and left out of the output, rather than losing everyone else's.
+
+    If given, alongside is called while the workers crawl, and the output it
+    returns is merged in with theirs.
+
+    The workers share the page cache (which only this process evicts, once
+    they're done) and incremental stores (which are per spider).
+    """
+    costs = spider_costs(args.report or args.outfile + '.report.json')
+    directory = tempfile.mkdtemp(prefix='mgrok-workers-')
+    workers = []
+    try:
+        for number, spiders in enumerate(
+                partition(SCRAPY_SPIDERS, costs, args.workers)):
+            path = os.path.join(directory, 'worker-{}'.format(number))
+            # Workers are started afresh rather than forked, as a forked
+            # process would share this one's (already installed) reactor.
+            command = [sys.executable] + sys.argv + ['--worker-path', path]
+            for spider in spiders:
+                command.extend(['--worker-spider', spider.name])
+            workers.append((subprocess.Popen(command), path, spiders))
+
+        output = alongside() if alongside is not None else {}
+        for worker, path, spiders in workers:
+            if worker.wait() != 0:
+                sys.stderr.write(
+                    'crawl worker for {} exited with {}\n'.format(
+                        ', '.join(spider.name for spider in spiders),
+                        worker.returncode))
+                for spider in spiders:
+                    report.source(spider.name, 'spider').errors += 1
+                continue
+            output.update(group_by_venue(read_jsonl(path + '.jsonl')))
+            report.include(path + '.report.json')
+    finally:
+        # Don't leave workers crawling if anything went wrong.
+        for worker, _, _ in workers:
+            if worker.poll() is None:
+                worker.terminate()
+                worker.wait()
+        shutil.rmtree(directory)
     return output
 
+def get_api_sites_data(concurrency=8, timeout=30, report=None, days=None,
+                       api_classes=TICKETFLY_APIS):
+    """
+    Returns output for venues which have APIs, recording the requests made
+    into a RunReport, if given. If given, days is the (days_behind,
+    days_ahead) window to query for.
+    """
+    apis = [api() for api in api_classes]
+    for api in apis:
+        if days is not None:
+            api.days_behind, api.days_ahead = days
+        if report is not None:
+            report.instrument_api(api)
+    return fetch_api_sites_data(apis, concurrency, timeout)
+
+def evict_page_cache(args):
+    """Trims the page cache (if there is one) down to size."""
+    if args.cache_dir:
+        httpcache.evict(
+            os.path.abspath(args.cache_dir), args.cache_max_mb * 1024 * 1024,
+            args.cache_ttl)
+
+def publish_output(output, args):
+    """Publishes the output wherever the command line arguments say."""
+    if args.delta_dir:
+        previous_output, previous_version = read_published(args.outfile)
+    version = publish(json.dumps(output), args.outfile)
+    if args.delta_dir:
+        publish_delta(
+            previous_output, previous_version, output, version,
+            args.delta_dir, args.delta_chain)
+    if args.shard_dir:
+        write_shards(output, args.shard_dir, args.shard_by_week)
+    if args.compact:
+        publish(compact.dumps(output), args.compact)
+    if args.search_index:
+        publish(search.dumps(output), args.search_index)
+
+def run_daemon(args):
+    """
+    Refreshes each spider and api on its own schedule, re-publishing the
+    output every time one of them finishes, until killed.
+    """
+    settings = get_settings(get_crawl_settings(args))
+    # Shared pages are only good for the refreshes going on at the time.
+    settings.set('SHARED_RESPONSE_MAX_AGE', 60)
+    # There's no end of the run to trim the page cache at, so do it hourly.
+    task.LoopingCall(
+        threads.deferToThread, evict_page_cache, args).start(
+            60 * 60, now=False)
+    RefreshDaemon(
+        settings,
+        SCRAPY_SPIDERS,
+        TICKETFLY_APIS,
+        lambda api: get_api_sites_data(
+            args.api_concurrency, args.api_timeout,
+            days=(args.days_behind, args.days_ahead), api_classes=[api]),
+        lambda shows: publish_output(build_output(shows), args),
+        args.daemon_jitter).run()
+
 def main():
     """
     Collects event data from various sources, aggregates said data in a single
     object, and prints that object
     """
     parser = argparse.ArgumentParser(description='see whats playing in nyc.')
-    parser.add_argument('outfile', type=argparse.FileType('w'))
+    parser.add_argument(
+        'outfile',
+        help='file to publish the shows to, along with compressed copies of '
+        'it and its ETag')
+    parser.add_argument(
+        '--cache-dir',
+        help='directory in which to cache scraped pages between runs')
+    parser.add_argument(
+        '--cache-ttl', type=int, default=7 * 24 * 60 * 60,
+        help='seconds a cached page is kept before being fetched from scratch')
+    parser.add_argument(
+        '--cache-max-mb', type=int, default=256,
+        help='size the page cache is trimmed down to after each run')
+    parser.add_argument(
+        '--incremental-dir',
+        help='directory in which to remember scraped events between runs, '
+        'so that only new events\' pages need to be fetched')
+    parser.add_argument(
+        '--incremental-refresh-limit', type=int, default=10,
+        help='number of known events per venue to re-fetch each run')
+    parser.add_argument(
+        '--days-behind', type=int, default=_TicketFlyApi.days_behind,
+        help='number of days back to collect (already played) shows for')
+    parser.add_argument(
+        '--days-ahead', type=int, default=_TicketFlyApi.days_ahead,
+        help='number of days ahead to collect shows for')
+    parser.add_argument(
+        '--api-concurrency', type=int, default=8,
+        help='number of venue api requests to have in flight at once')
+    parser.add_argument(
+        '--api-timeout', type=int, default=30,
+        help='seconds to wait on a venue api response')
+    parser.add_argument(
+        '--host-concurrency', type=int, default=4,
+        help='number of requests all the spiders together may have in flight '
+        'to any one host (0 leaves it up to each spider)')
+    parser.add_argument(
+        '--host-max-delay', type=float, default=60,
+        help='most seconds to wait between requests to a slow host')
+    parser.add_argument(
+        '--shared-responses', type=int, default=500,
+        help='number of fetched pages to keep in memory for other spiders '
+        'which request the same page (0 turns sharing off)')
+    parser.add_argument(
+        '--stream',
+        help='JSON lines file to write shows to as they\'re collected, which '
+        'the output is then assembled from')
+    parser.add_argument(
+        '--stream-per-venue', action='store_true',
+        help='treat --stream as a directory, with a JSON lines file per venue')
+    parser.add_argument(
+        '--finalize-only', action='store_true',
+        help='skip collecting shows, and just assemble the output out of what '
+        'a previous run left in --stream')
+    parser.add_argument(
+        '--shard-dir',
+        help='directory to also write a manifest and per-venue shards to, '
+        'for clients which load venues on demand')
+    parser.add_argument(
+        '--shard-by-week', action='store_true',
+        help='split each venue\'s shard up by week')
+    parser.add_argument(
+        '--compact',
+        help='file to also publish the shows to in compact, column-wise form')
+    parser.add_argument(
+        '--search-index',
+        help='file to also publish an index for searching the shows\' '
+        'venues and artists to')
+    parser.add_argument(
+        '--delta-dir',
+        help='directory to publish the changes since the previously '
+        'published output to, for clients holding an earlier version')
+    parser.add_argument(
+        '--delta-chain', type=int, default=10,
+        help='number of earlier versions to keep deltas from')
+    parser.add_argument(
+        '--daemon', action='store_true',
+        help='keep running, refreshing each venue every so often (as its '
+        'spider or api\'s refresh_interval says) and re-publishing the output '
+        'as each one finishes')
+    parser.add_argument(
+        '--daemon-jitter', type=float, default=0.1,
+        help='fraction by which to randomly stretch or shrink each refresh '
+        'interval, so that refreshes don\'t bunch up')
+    parser.add_argument(
+        '--db',
+        help='SQLite database to keep shows in from run to run, which the '
+        'output is then exported from')
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help='number of processes to split the spiders up between, so that '
+        'their parsing is spread over more than one core')
+    # For the worker processes --workers starts
+    parser.add_argument('--worker-path', help=argparse.SUPPRESS)
+    parser.add_argument(
+        '--worker-spider', action='append', default=[], help=argparse.SUPPRESS)
+    parser.add_argument(
+        '--report',
+        help='JSON file to write per-spider and per-api metrics on the run to '
+        '(defaults to alongside outfile, as <outfile>.report.json)')
     args = parser.parse_args()
+    if args.finalize_only and not args.stream:
+        parser.error('--finalize-only requires --stream')
+    if args.daemon and (args.stream or args.finalize_only):
+        parser.error('--daemon can\'t be used with --stream')
+    if args.db and (args.stream or args.daemon):
+        parser.error('--db can\'t be used with --stream or --daemon')
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.api_concurrency < 1:
+        parser.error('--api-concurrency must be at least 1')
+    if args.workers > 1 and (args.stream or args.daemon):
+        parser.error('--workers can\'t be used with --stream or --daemon')
+
+    if args.worker_path:
+        run_worker(args)
+        return os.EX_OK
+    if args.daemon:
+        run_daemon(args)
+        return os.EX_OK
 
     shows = {}
+    report = RunReport()
+    database = EventDatabase(args.db) if args.db else None
 
-    # Collect shows
-    shows.update(get_scraped_sites_data())
-    shows.update(get_api_sites_data())
+    # Collect shows, querying the apis while the spiders crawl
+    fetch_apis = partial(
+        get_api_sites_data, args.api_concurrency, args.api_timeout, report,
+        (args.days_behind, args.days_ahead))
+    if args.workers > 1:
+        shows.update(get_sharded_sites_data(args, report, fetch_apis))
+    elif not args.finalize_only:
+        if args.stream:
+            truncate_jsonl(args.stream, args.stream_per_venue)
+        shows.update(get_scraped_sites_data(
+            get_crawl_settings(args, report, database), alongside=fetch_apis))
+    if not args.finalize_only:
+        evict_page_cache(args)
 
     # Sort shows
-    def key_function(event):
-        date_str = event['date']
-        return parse_date_str(date_str)
-    for events in shows.values():
-        events.sort(key=key_function)
-
-    output = {
-        "updated": datetime.now(timezone('US/Eastern')).isoformat(),
-        "shows": shows
-        }
+    if args.stream:
+        # The spiders' shows have already been streamed out; the apis' shows
+        # still need to be.
+        writer = JsonLinesWriter(args.stream, args.stream_per_venue)
+        for events in shows.values():
+            for event in events:
+                writer.write(event)
+        writer.close()
+        output = finalize_jsonl(args.stream, args.stream_per_venue)
+    elif database is not None:
+        # The spiders' shows are already in the database (unless workers
+        # collected them); the apis' shows still need to be. The output comes
+        # back out of it in order.
+        database.write_shows(shows)
+        horizon = Horizon.from_days(args.days_behind, args.days_ahead)
+        output = build_output(
+            database.export(horizon.start, horizon.end), presorted=True)
+        database.close()
+    else:
+        output = build_output(shows)
 
-    # Print shows
-    args.outfile.write(json.dumps(output))
+    # Publish shows
+    publish_output(output, args)
+    if not args.finalize_only:
+        report.write(args.report or args.outfile + '.report.json')
 
 if __name__ == '__main__':
     sys.exit(main())
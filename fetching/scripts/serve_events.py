@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+
+"""
+A script for serving queries for the shows in the output of
+see_whats_going_on.py (see mgrok.server).
+"""
+
+import argparse
+import os
+import sys
+
+from mgrok.server import serve
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='serve queries for the shows in an output file.')
+    parser.add_argument(
+        'outfile', help='file see_whats_going_on.py publishes the shows to')
+    parser.add_argument(
+        '--host', default='', help='address to listen on (default: all)')
+    parser.add_argument(
+        '--port', type=int, default=8080, help='port to listen on')
+    args = parser.parse_args()
+
+    serve(args.outfile, args.host, args.port)
+    return os.EX_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,37 +1,15 @@
 #!/usr/bin/env python
 
+import argparse
 import json
 import os
 import sys
 
-from mgrok.scrapers import *
+from mgrok import fixtures, scrapers
 from scrapy.crawler import CrawlerProcess
 from scrapy.settings import Settings
 
-SCRAPY_SPIDERS = [
-    # WarsawSpider,
-    # HighlineBallroomSpider,
-    # BoweryBallroomSpider,
-    # MercuryLoungeSpider,
-    # MusicHallOfWilliamsburgSpider,
-    # RoughTradeSpider,
-    # TerminalFiveSpider,
-    # RockwoodStageOneSpider,
-    # RockwoodStageTwoSpider,
-    # RockwoodStageThreeSpider,
-    # WebsterHallSpider,
-    # TheSpaceAtWestburySpider,
-    # MSGSpider,
-    # TheBeaconSpider,
-    # TheTheaterAtMSG,
-    # RadioCity
-    # KnittingFictorySpider,
-    # TheBoweryElectricSpider
-    # CityWinerySpider
-    TheHallAtMpSpider
-    ]
-
-def get_scraped_sites_data():
+def get_scraped_sites_data(spiders, extra_settings=None):
     """Returns output for venues which need to be scraped."""
     class RefDict(dict):
         """A dictionary which returns a reference to itself when deepcopied."""
@@ -51,9 +29,10 @@ def get_scraped_sites_data():
         'PIPELINE_OUTPUT': output,
         'USER_AGENT': 'Chrome/41.0.2228.0'
         })
+    settings.setdict(extra_settings or {})
 
     crawler_process = CrawlerProcess(settings)
-    for spider in SCRAPY_SPIDERS:
+    for spider in spiders:
         crawler_process.crawl(spider)
 
     crawler_process.start()
@@ -62,7 +41,34 @@ def get_scraped_sites_data():
 
 
 def main():
-  print json.dumps(get_scraped_sites_data(), indent=2)
+  parser = argparse.ArgumentParser(
+      description='run spiders and print what they scrape.')
+  parser.add_argument(
+      'spiders', nargs='+', metavar='spider',
+      help='name of a spider class in mgrok.scrapers, e.g. WarsawSpider')
+  fixture_group = parser.add_mutually_exclusive_group()
+  fixture_group.add_argument(
+      '--record', metavar='FIXTURE_DIR',
+      help='save every response of the crawl to FIXTURE_DIR')
+  fixture_group.add_argument(
+      '--replay', metavar='FIXTURE_DIR',
+      help='crawl responses saved in FIXTURE_DIR instead of the network')
+  parser.add_argument(
+      '--detail-pages', action='store_true',
+      help='fetch every event\'s page, rather than only those of events '
+      'whose listings leave something out')
+  args = parser.parse_args()
+
+  extra_settings = {}
+  if args.record:
+    extra_settings = fixtures.record_settings(args.record)
+  elif args.replay:
+    extra_settings = fixtures.replay_settings(args.replay)
+  if args.detail_pages:
+    extra_settings['LISTING_FIRST'] = False
+
+  spiders = [getattr(scrapers, spider) for spider in args.spiders]
+  print json.dumps(get_scraped_sites_data(spiders, extra_settings), indent=2)
   return os.EX_OK
 
 if __name__ == '__main__':
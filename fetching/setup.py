@@ -10,10 +10,14 @@ setup(
     description = ('Utility to grok concerts'),
     packages=find_packages('src'),
     package_dir = {'':'src'},
+    test_suite = 'tests',
     install_requires = [
         'python-dateutil', # iso (+timezone) date parse
         'pytz',            # timezones
         'requests',        # nice http requests
         'scrapy',          # html scraping
         ],
+    extras_require = {
+        'brotli': ['brotli'], # precompressed .br output
+        },
 )
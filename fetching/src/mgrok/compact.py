@@ -0,0 +1,134 @@
+"""
+A compact, column-wise encoding of the output object.
+
+Rather than a list of event objects per venue, each of which repeats its
+venue's name and keys, events are stored as parallel arrays. Venue names,
+artist names and the common prefixes of event links are each stored once, in
+string tables, and referred to by index.
+"""
+
+from datetime import datetime
+import json
+import re
+
+import pytz
+
+from mgrok.events import Event
+from mgrok.output import build_output
+
+FORMAT = 'mgrok-compact-1'
+
+_UTC_OFFSET_REGEX = re.compile(r'(?:Z|([+-])(\d\d):(\d\d))$')
+
+
+class _StringTable(object):
+    """Assigns each distinct string an index, in order of first appearance."""
+    def __init__(self):
+        self.strings = []
+        self.indexes_ = {}
+
+    def index(self, string):
+        if string not in self.indexes_:
+            self.indexes_[string] = len(self.strings)
+            self.strings.append(string)
+        return self.indexes_[string]
+
+
+def _split_link(event_link):
+    """
+    Splits a link into the prefix it likely shares with other events' links
+    (everything up to the last '/' or '=') and what's particular to it.
+    """
+    if not event_link:
+        return None, event_link
+    split_at = max(
+        event_link.rstrip('/').rfind('/'), event_link.rfind('=')) + 1
+    return event_link[:split_at], event_link[split_at:]
+
+
+def _utc_offset_minutes(date):
+    """Returns the UTC offset, in minutes, at the end of an ISO date string."""
+    match = _UTC_OFFSET_REGEX.search(date)
+    if not match:
+        raise ValueError('{!r} has no UTC offset'.format(date))
+    sign, hours, minutes = match.groups()
+    if sign is None:
+        return 0
+    offset = int(hours) * 60 + int(minutes)
+    return -offset if sign == '-' else offset
+
+
+def encode(output):
+    """Returns the compact form of an output object."""
+    venues = _StringTable()
+    artists = _StringTable()
+    link_prefixes = _StringTable()
+    columns = {
+        'epoch': [],
+        'utc_offset': [],
+        'venue': [],
+        'artists': [],
+        'link_prefix': [],
+        'link_suffix': [],
+        }
+    for venue_name in sorted(output['shows']):
+        venue_index = venues.index(venue_name)
+        for event in output['shows'][venue_name]:
+            link_prefix, link_suffix = _split_link(event['event_link'])
+            columns['epoch'].append(event['epoch'])
+            columns['utc_offset'].append(_utc_offset_minutes(event['date']))
+            columns['venue'].append(venue_index)
+            columns['artists'].append(
+                [artists.index(artist) for artist in event['artists']])
+            columns['link_prefix'].append(
+                None if link_prefix is None else
+                link_prefixes.index(link_prefix))
+            columns['link_suffix'].append(link_suffix)
+    return {
+        'format': FORMAT,
+        'updated': output['updated'],
+        'venues': venues.strings,
+        'artists': artists.strings,
+        'link_prefixes': link_prefixes.strings,
+        'events': columns,
+        }
+
+
+def decode(compact):
+    """Returns the output object, indexes and all, a compact form encodes."""
+    if compact.get('format') != FORMAT:
+        raise ValueError('Unknown format: {}'.format(compact.get('format')))
+    venues = compact['venues']
+    artists = compact['artists']
+    link_prefixes = compact['link_prefixes']
+    columns = compact['events']
+
+    shows = dict((venue_name, []) for venue_name in venues)
+    offsets = {}
+    for i, epoch in enumerate(columns['epoch']):
+        offset = columns['utc_offset'][i]
+        if offset not in offsets:
+            offsets[offset] = pytz.FixedOffset(offset)
+        the_datetime = datetime.fromtimestamp(epoch, offsets[offset])
+        link_prefix = columns['link_prefix'][i]
+        event_link = columns['link_suffix'][i]
+        if link_prefix is not None:
+            event_link = link_prefixes[link_prefix] + event_link
+        venue_name = venues[columns['venue'][i]]
+        shows[venue_name].append(Event(
+            venue_name,
+            [artists[artist] for artist in columns['artists'][i]],
+            the_datetime.isoformat(),
+            epoch,
+            event_link))
+    return build_output(shows, compact['updated'])
+
+
+def dumps(output):
+    """Returns the compact form of an output object, as minimal JSON."""
+    return json.dumps(encode(output), separators=(',', ':'))
+
+
+def loads(content):
+    """Returns the output object encoded in compact JSON."""
+    return decode(json.loads(content))
@@ -0,0 +1,139 @@
+"""
+A long-running alternative to collecting every venue's shows in one go: each
+spider and venue api is refreshed on a schedule of its own, within a single
+twisted reactor, and the output is re-published whenever one of them is done.
+"""
+
+import logging
+import random
+
+from scrapy.crawler import Crawler, CrawlerRunner
+from scrapy.utils.log import configure_logging
+from twisted.internet import reactor, threads
+
+logger = logging.getLogger(__name__)
+
+# How often (in seconds) to refresh spiders and apis which don't say
+DEFAULT_REFRESH_INTERVAL = 24 * 60 * 60
+
+
+def refresh_interval(source):
+    """Returns how often (in seconds) a spider or api should be refreshed."""
+    return getattr(source, 'refresh_interval', DEFAULT_REFRESH_INTERVAL)
+
+
+class _OutputDict(dict):
+    """A dictionary which returns a reference to itself when deepcopied."""
+    def __deepcopy__(self, memo):
+        return self
+
+
+class RefreshDaemon(object):
+    """
+    Refreshes spiders (crawled with a CrawlerRunner, so the reactor can keep
+    on running between crawls) and venue apis (fetched with fetch_api, on the
+    reactor's thread pool) every refresh_interval seconds, give or take
+    jitter of that. Whenever one of them finishes, on_update is called with
+    everyone's latest shows, by venue, but not until every one of them has
+    been refreshed once (successfully or not), so that what was published
+    before isn't replaced by the first few sources' shows alone.
+
+    on_update is called on the reactor's thread pool, so that crawls carry
+    on while it publishes, and only once at a time: updates which come in
+    while it's busy are published together once it's done.
+    """
+    def __init__(self, settings, spiders, apis, fetch_api, on_update,
+                 jitter=0.1):
+        self.settings = settings
+        self.spiders = spiders
+        self.apis = apis
+        self.fetch_api = fetch_api
+        self.on_update = on_update
+        self.jitter = jitter
+        self.runner_ = CrawlerRunner(settings)
+        self.shows_ = {}
+        self.venues_ = {}
+        self.unrefreshed_ = set(spiders + apis)
+        self.publishing_ = False
+        self.republish_ = False
+
+    def run(self):
+        """Refreshes everything now and on schedule, until stopped."""
+        configure_logging(self.settings)
+        for source in self.spiders + self.apis:
+            # Spread the first refreshes out a bit, too.
+            self.schedule(source, random.uniform(0, self.jitter) * 60)
+        reactor.run()
+
+    def schedule(self, source, delay):
+        reactor.callLater(delay, self.refresh, source)
+
+    def next_delay(self, source):
+        """Returns the seconds until a spider or api's next refresh."""
+        return refresh_interval(source) * random.uniform(
+            1 - self.jitter, 1 + self.jitter)
+
+    def refresh(self, source):
+        """Refreshes a spider or api, and then schedules its next refresh."""
+        if source in self.spiders:
+            refreshed = self.crawl(source)
+        else:
+            refreshed = threads.deferToThread(self.fetch_api, source)
+        refreshed.addCallback(self.update, source)
+        refreshed.addErrback(
+            lambda failure: logger.error(
+                'Refreshing %s failed', source.__name__,
+                exc_info=(failure.type, failure.value, failure.tb)))
+        refreshed.addCallback(self.publish, source)
+        refreshed.addBoth(
+            lambda _: self.schedule(source, self.next_delay(source)))
+        return refreshed
+
+    def crawl(self, spider):
+        """Returns a deferred which fires with the shows a spider scrapes."""
+        output = _OutputDict()
+        settings = self.settings.copy()
+        settings.set('PIPELINE_OUTPUT', output)
+        crawled = self.runner_.crawl(Crawler(spider, settings))
+        return crawled.addCallback(lambda _: output)
+
+    def update(self, shows, source):
+        """Swaps a source's previous shows out for its latest ones."""
+        for venue_name in self.venues_.get(source, []):
+            self.shows_.pop(venue_name, None)
+        self.shows_.update(shows)
+        self.venues_[source] = list(shows)
+        return True
+
+    def publish(self, updated, source):
+        """
+        Hands everyone's latest shows to on_update after a source's refresh,
+        if it updated them or was the last of the first round of refreshes.
+        """
+        first_refresh = source in self.unrefreshed_
+        self.unrefreshed_.discard(source)
+        if self.unrefreshed_:
+            return
+        if updated or first_refresh:
+            self.publish_shows()
+
+    def publish_shows(self):
+        """Calls on_update with everyone's latest shows, in a thread."""
+        if self.publishing_:
+            # They'll be published once the publish under way is done.
+            self.republish_ = True
+            return
+        self.publishing_ = True
+        published = threads.deferToThread(self.on_update, dict(self.shows_))
+        published.addErrback(
+            lambda failure: logger.error(
+                'Publishing failed',
+                exc_info=(failure.type, failure.value, failure.tb)))
+        published.addBoth(self.published)
+
+    def published(self, _):
+        """Publishes whatever came in while the last publish was going on."""
+        self.publishing_ = False
+        if self.republish_:
+            self.republish_ = False
+            self.publish_shows()
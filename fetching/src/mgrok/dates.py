@@ -0,0 +1,207 @@
+"""
+Date and time parsing shared by all of the spiders and venue apis.
+
+Venues' sites write dates in a handful of formats, and the same date strings
+come up over and over again within a crawl, so parsers are compiled once per
+format and remember what they've already parsed (safely across threads, as
+the venue apis and the event server parse from several at once). Everything
+comes back as an (ISO date string, epoch) pair, ready to go into an Event.
+"""
+
+from datetime import date, datetime, timedelta
+import calendar
+import re
+import threading
+
+from dateutil.parser import parse as parse_date_str
+import pytz
+
+NEW_YORK = 'America/New_York'
+
+_MAX_MEMO_SIZE = 4096
+
+# How far back a date without a year may be before it's taken to be next
+# year's instead
+PAST_GRACE_DAYS = 21
+
+_timezones = {}
+
+def timezone(name=NEW_YORK):
+    """Returns the (cached) pytz timezone of the given name."""
+    if name not in _timezones:
+        _timezones[name] = pytz.timezone(name)
+    return _timezones[name]
+
+
+def iso_and_epoch(the_datetime):
+    """Returns the ISO string and epoch of a timezone-aware datetime."""
+    if the_datetime.utcoffset() is None:
+        # Its ISO string wouldn't say which moment it is, and its epoch
+        # would come out as if it were UTC.
+        raise ValueError('{!r} has no timezone'.format(the_datetime))
+    return (
+        the_datetime.isoformat(),
+        calendar.timegm(the_datetime.utctimetuple()))
+
+
+def guess_year(month, day_of_month, today=None, grace_days=PAST_GRACE_DAYS):
+    """
+    Returns the year a date given without one most likely falls in. Venues
+    list what's coming up, so it's the first year which puts the date no
+    more than grace_days in the past: a May show listed in October is next
+    May's, and a January show listed in December next January's, but last
+    week's shows are still this (or, in January, last) year's.
+    """
+    today = today or date.today()
+    earliest = today - timedelta(grace_days)
+    # Far enough ahead to reach a leap year, for February 29th.
+    for year in range(earliest.year, today.year + 5):
+        try:
+            candidate = date(year, month, day_of_month)
+        except ValueError:
+            # February 29th, outside of a leap year
+            continue
+        if candidate >= earliest:
+            return year
+    raise ValueError('No year has {}/{}'.format(month, day_of_month))
+
+
+_DIRECTIVES = {
+    'Y': r'(?P<Y>\d{4})',
+    'm': r'(?P<m>\d{1,2})',
+    'd': r'(?P<d>\d{1,2})',
+    'H': r'(?P<H>\d{1,2})',
+    'I': r'(?P<I>\d{1,2})',
+    'M': r'(?P<M>\d{2})',
+    'S': r'(?P<S>\d{2})',
+    'p': r'(?P<p>[AaPp][Mm])',
+    'b': r'(?P<b>[A-Za-z]{3})',
+    'B': r'(?P<B>[A-Za-z]+)',
+    # Days of the week just get checked for and skipped over
+    'a': r'[A-Za-z]{3}',
+    'A': r'[A-Za-z]+',
+    }
+
+_MONTHS = dict(
+    [(name.lower(), i) for i, name in enumerate(calendar.month_name) if name] +
+    [(name.lower(), i) for i, name in enumerate(calendar.month_abbr) if name])
+
+
+def _compile_format(date_format):
+    """Returns a regex which matches the subset of strptime formats we use."""
+    pattern = []
+    i = 0
+    while i < len(date_format):
+        char = date_format[i]
+        if char == '%':
+            pattern.append(_DIRECTIVES[date_format[i + 1]])
+            i += 2
+            continue
+        pattern.append(r'\s+' if char.isspace() else re.escape(char))
+        i += 1
+    return re.compile(r'\s*' + ''.join(pattern) + r'\s*$')
+
+
+class DateParser(object):
+    """
+    Parses date strings of a single strptime-style format, local to a single
+    timezone. Formats without a year have theirs guessed.
+    """
+    def __init__(self, date_format, tz_name=NEW_YORK):
+        self.date_format = date_format
+        self.regex_ = _compile_format(date_format)
+        self.timezone_ = timezone(tz_name)
+        self.has_year_ = '%Y' in date_format
+        self.memo_ = {}
+        self.memo_lock_ = threading.Lock()
+
+    def parse(self, date_str, is_dst=False):
+        """Returns the ISO string and epoch of a date string."""
+        key = (date_str, is_dst)
+        if not self.has_year_:
+            # What year gets guessed depends on when we're asking.
+            key += (date.today(),)
+        # Looked up just once, as another thread may clear the memo between
+        # checking for the key and getting it.
+        parsed = self.memo_.get(key)
+        if parsed is None:
+            parsed = iso_and_epoch(self.parse_datetime(date_str, is_dst))
+            with self.memo_lock_:
+                if len(self.memo_) >= _MAX_MEMO_SIZE:
+                    self.memo_.clear()
+                self.memo_[key] = parsed
+        return parsed
+
+    def parse_datetime(self, date_str, is_dst=False):
+        """Returns the timezone-aware datetime of a date string."""
+        match = self.regex_.match(date_str)
+        if not match:
+            raise ValueError('{!r} does not match format {!r}'.format(
+                date_str, self.date_format))
+        fields = match.groupdict()
+        month = int(fields['m']) if 'm' in fields else (
+            _MONTHS[(fields.get('B') or fields['b']).lower()])
+        day_of_month = int(fields['d'])
+        if 'I' in fields:
+            hour = int(fields['I']) % 12
+            if fields['p'].lower() == 'pm':
+                hour += 12
+        else:
+            hour = int(fields.get('H', 0))
+        year = int(fields['Y']) if self.has_year_ else (
+            guess_year(month, day_of_month))
+        return self.timezone_.localize(
+            datetime(
+                year, month, day_of_month,
+                hour, int(fields.get('M', 0)), int(fields.get('S', 0))),
+            is_dst)
+
+
+_parsers = {}
+
+def get_parser(date_format, tz_name=NEW_YORK):
+    """Returns the (shared) parser for a date format and timezone."""
+    key = (date_format, tz_name)
+    if key not in _parsers:
+        _parsers[key] = DateParser(date_format, tz_name)
+    return _parsers[key]
+
+
+_ISO_REGEX = re.compile(
+    r'^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d)(?::(\d\d)(?:\.\d+)?)?'
+    r'(Z|[+-]\d\d:?\d\d)$')
+
+_iso_memo = {}
+_iso_memo_lock = threading.Lock()
+
+def parse_iso(date_str):
+    """
+    Returns the (normalized) ISO string and epoch of an ISO 8601 date string
+    with a UTC offset. Anything fancier is handed off to dateutil, and taken
+    to be in New York if it doesn't say otherwise.
+    """
+    parsed = _iso_memo.get(date_str)
+    if parsed is None:
+        match = _ISO_REGEX.match(date_str)
+        if match:
+            year, month, day, hour, minute, second, offset = match.groups()
+            offset_minutes = 0
+            if offset != 'Z':
+                offset = offset.replace(':', '')
+                offset_minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+                if offset[0] == '-':
+                    offset_minutes = -offset_minutes
+            the_datetime = datetime(
+                int(year), int(month), int(day),
+                int(hour), int(minute), int(second or 0),
+                tzinfo=pytz.FixedOffset(offset_minutes))
+        else:
+            the_datetime = parse_date_str(date_str)
+            if the_datetime.utcoffset() is None:
+                the_datetime = timezone().localize(the_datetime)
+        parsed = iso_and_epoch(the_datetime)
+        with _iso_memo_lock:
+            if len(_iso_memo) >= _MAX_MEMO_SIZE:
+                _iso_memo.clear()
+            _iso_memo[date_str] = parsed
+    return parsed
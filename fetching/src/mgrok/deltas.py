@@ -0,0 +1,173 @@
+"""
+Deltas between successive versions of the published output, so that clients
+holding an earlier version can catch up without downloading all of it again.
+
+Versions go by the output's ETag. Alongside the deltas (each named after the
+version it's from, and leading to the one after it) is an index.json
+manifest:
+
+    {"format": "mgrok-delta-1", "latest": <version>, "updated": <its updated>,
+     "chain": [<oldest version with a delta>, ..., <the one before latest>]}
+
+A client holding a version in the chain applies the deltas from there on in
+order; one holding a version which isn't fetches the output in full.
+"""
+
+from operator import itemgetter
+import json
+import os
+
+from mgrok.publish import publish
+
+FORMAT = 'mgrok-delta-1'
+MANIFEST = 'index.json'
+
+
+def diff(old_output, new_output):
+    """
+    Returns the delta from one output object to another: each venue's added,
+    removed (by id) and changed events, the days whose indexes changed (to
+    None if they're gone), and the new 'updated' and 'next_events'.
+    """
+    old_shows = old_output['shows']
+    new_shows = new_output['shows']
+    venues = {}
+    for venue_name in set(old_shows) | set(new_shows):
+        old_events = dict(
+            (event['id'], event) for event in old_shows.get(venue_name, []))
+        new_events = new_shows.get(venue_name, [])
+        new_ids = set(event['id'] for event in new_events)
+        venue_delta = {}
+        added = [
+            event for event in new_events if event['id'] not in old_events]
+        changed = [
+            event for event in new_events
+            if event['id'] in old_events and old_events[event['id']] != event]
+        removed = sorted(
+            event_id for event_id in old_events if event_id not in new_ids)
+        for name, value in [
+                ('added', added), ('changed', changed), ('removed', removed)]:
+            if value:
+                venue_delta[name] = value
+        if venue_delta:
+            venues[venue_name] = venue_delta
+
+    old_days = old_output['days']
+    new_days = new_output['days']
+    days = dict(
+        (day, event_ids) for day, event_ids in new_days.iteritems()
+        if old_days.get(day) != event_ids)
+    for day in old_days:
+        if day not in new_days:
+            days[day] = None
+
+    return {
+        'updated': new_output['updated'],
+        'next_events': new_output['next_events'],
+        'venues': venues,
+        'days': days,
+        }
+
+
+def apply_delta(output, delta):
+    """Returns the output object a delta leads to from the given one."""
+    shows = dict(output['shows'])
+    for venue_name, venue_delta in delta['venues'].iteritems():
+        events = dict(
+            (event['id'], event) for event in shows.get(venue_name, []))
+        for event_id in venue_delta.get('removed', []):
+            events.pop(event_id, None)
+        for event in venue_delta.get('changed', []) + venue_delta.get(
+                'added', []):
+            events[event['id']] = event
+        if events:
+            shows[venue_name] = sorted(
+                events.itervalues(), key=itemgetter('epoch', 'id'))
+        else:
+            shows.pop(venue_name, None)
+
+    days = dict(output['days'])
+    for day, event_ids in delta['days'].iteritems():
+        if event_ids is None:
+            days.pop(day, None)
+        else:
+            days[day] = event_ids
+
+    return {
+        'updated': delta['updated'],
+        'shows': shows,
+        'days': days,
+        'next_events': delta['next_events'],
+        }
+
+
+def read_published(path):
+    """
+    Returns the output object published at path and its version, or a pair
+    of Nones if there isn't one.
+    """
+    try:
+        with open(path) as output_file:
+            output = json.load(output_file)
+        with open(path + '.etag') as etag_file:
+            version = etag_file.read().strip()
+    except (IOError, ValueError):
+        return None, None
+    return output, version
+
+
+def _delta_path(directory, version):
+    return os.path.join(directory, version.strip('"') + '.json')
+
+
+def _remove_published(path):
+    for suffix in ['', '.gz', '.br', '.etag']:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def publish_delta(previous_output, previous_version, output, version,
+                  directory, max_chain=10):
+    """
+    Publishes the delta from the previously published output (if there was
+    one) to the newly published one under directory, and updates the
+    manifest, keeping the deltas of only the max_chain latest versions.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    manifest_path = os.path.join(directory, MANIFEST)
+    old_chain = []
+    chain = []
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        old_chain = manifest['chain']
+        # The chain only carries on if nothing was published in between.
+        if previous_version and manifest['latest'] == previous_version:
+            chain = list(old_chain)
+
+    if previous_output is not None and previous_version != version:
+        delta = diff(previous_output, output)
+        delta.update({
+            'format': FORMAT,
+            'from': previous_version,
+            'to': version,
+            })
+        publish(
+            json.dumps(delta, separators=(',', ':')),
+            _delta_path(directory, previous_version))
+        chain.append(previous_version)
+
+    chain = chain[-max_chain:] if max_chain else []
+    publish(
+        json.dumps({
+            'format': FORMAT,
+            'latest': version,
+            'updated': output['updated'],
+            'chain': chain,
+            }),
+        manifest_path)
+    # Only once the manifest no longer points at them
+    for dropped_version in set(old_chain) - set(chain):
+        _remove_published(_delta_path(directory, dropped_version))
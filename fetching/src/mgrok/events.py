@@ -0,0 +1,88 @@
+"""
+The record type for events, as produced by every spider and venue api.
+"""
+
+import hashlib
+
+from mgrok import dates
+
+
+class Event(dict):
+    """
+    An event at a venue.
+
+    Events are dictionaries, so that they pass through scrapy and out to JSON
+    as-is, but on top of the ISO formatted 'date' they carry 'epoch': the
+    event's start in seconds since the (UTC) epoch. Everything downstream
+    sorts and compares on that instead of parsing dates.
+    """
+    __slots__ = ()
+
+    def __init__(self, venue_name, artists, date, epoch, event_link):
+        super(Event, self).__init__(
+            venue_name=venue_name,
+            artists=artists,
+            date=date,
+            epoch=epoch,
+            event_link=event_link)
+
+    @classmethod
+    def at(cls, venue_name, artists, the_datetime, event_link):
+        """Returns an event starting at a timezone-aware datetime."""
+        date, epoch = dates.iso_and_epoch(the_datetime)
+        return cls(venue_name, artists, date, epoch, event_link)
+
+    @classmethod
+    def from_dict(cls, event):
+        """
+        Returns an event made from a plain dictionary (e.g. one read back in
+        from JSON). Only dictionaries written before events carried an epoch
+        need their date parsed.
+        """
+        if isinstance(event, cls):
+            return event
+        epoch = event.get('epoch')
+        if epoch is None:
+            _, epoch = dates.parse_iso(event['date'])
+        new_event = cls(
+            event['venue_name'],
+            event['artists'],
+            event['date'],
+            epoch,
+            event['event_link'])
+        # Hang on to anything else which has been added along the way.
+        for key, value in event.iteritems():
+            new_event.setdefault(key, value)
+        return new_event
+
+    @property
+    def venue_name(self):
+        return self['venue_name']
+
+    @property
+    def artists(self):
+        return self['artists']
+
+    @property
+    def date(self):
+        return self['date']
+
+    @property
+    def epoch(self):
+        return self['epoch']
+
+    @property
+    def event_link(self):
+        return self['event_link']
+
+    @property
+    def day(self):
+        """The event's local YYYY-MM-DD, straight out of its ISO date."""
+        return self['date'][:10]
+
+    @property
+    def id(self):
+        """An id for the event which stays the same from run to run."""
+        key = u'|'.join([
+            self['venue_name'], self['event_link'] or u'', self['date']])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
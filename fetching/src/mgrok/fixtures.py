@@ -0,0 +1,60 @@
+"""
+Recording crawls (and venue api responses) to local fixtures, and replaying
+them without a network connection, for testing and benchmarking spiders.
+"""
+
+import json
+import os
+
+PAGES_DIR = 'pages'
+API_DIR = 'ticketfly'
+
+
+def record_settings(fixture_dir):
+    """
+    Returns scrapy settings which save every response of a crawl under
+    fixture_dir. Pages already saved there are replayed rather than fetched
+    again, so start from an empty directory to record from scratch.
+    """
+    return {
+        'HTTPCACHE_ENABLED': True,
+        'HTTPCACHE_DIR': os.path.abspath(os.path.join(fixture_dir, PAGES_DIR)),
+        'HTTPCACHE_EXPIRATION_SECS': 0,
+        'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.DummyPolicy',
+        'HTTPCACHE_STORAGE': 'scrapy.extensions.httpcache.FilesystemCacheStorage',
+        }
+
+
+def replay_settings(fixture_dir):
+    """
+    Returns scrapy settings which serve a crawl entirely out of the responses
+    recorded under fixture_dir. Requests which weren't recorded are dropped
+    instead of going out to the network.
+    """
+    settings = record_settings(fixture_dir)
+    settings['HTTPCACHE_IGNORE_MISSING'] = True
+    return settings
+
+
+def _api_fixture_path(api, fixture_dir):
+    return os.path.join(fixture_dir, API_DIR, type(api).__name__ + '.json')
+
+
+def record_api(api, fixture_dir):
+    """Saves every event a TicketFly api returns under fixture_dir."""
+    first_page = api.get_page(1)
+    events = list(first_page['events'])
+    for page_num in range(2, first_page['totalPages'] + 1):
+        events.extend(api.get_page(page_num)['events'])
+
+    path = _api_fixture_path(api, fixture_dir)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as fixture_file:
+        json.dump(events, fixture_file)
+
+
+def replay_api(api, fixture_dir):
+    """Returns the (unformatted) events recorded for a TicketFly api."""
+    with open(_api_fixture_path(api, fixture_dir)) as fixture_file:
+        return json.load(fixture_file)
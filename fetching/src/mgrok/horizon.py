@@ -0,0 +1,88 @@
+"""
+The window of dates shows are collected for. Spiders use it to avoid
+requesting pages of (and paginating into) events outside of it, and a pipeline
+drops any events which get scraped from outside of it anyway.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from scrapy.exceptions import DropItem, NotConfigured
+
+from mgrok import dates
+from mgrok.pipelines import individual_items
+
+
+class Horizon(object):
+    """The window from start to end, both in epoch seconds, inclusive."""
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_days(cls, days_behind, days_ahead, today=None,
+                  tz_name=dates.NEW_YORK):
+        """
+        Returns the window from the start of the day days_behind days ago to
+        the end of the day days_ahead days from now, as venue apis query it.
+        """
+        today = today or date.today()
+        timezone = dates.timezone(tz_name)
+        _, start = dates.iso_and_epoch(timezone.localize(datetime.combine(
+            today - timedelta(days_behind), time(0, 0, 0))))
+        _, end = dates.iso_and_epoch(timezone.localize(datetime.combine(
+            today + timedelta(days_ahead), time(23, 59, 59))))
+        return cls(start, end)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Returns the window given by the DATE_HORIZON setting, a (days_behind,
+        days_ahead) pair, or None if it isn't set.
+        """
+        days = settings.getlist('DATE_HORIZON')
+        if not days:
+            return None
+        days_behind, days_ahead = days
+        return cls.from_days(int(days_behind), int(days_ahead))
+
+    def contains(self, epoch):
+        return self.start <= epoch <= self.end
+
+    def is_past(self, epoch):
+        """Whether an epoch is after the end of the window."""
+        return epoch > self.end
+
+
+def get_horizon(spider):
+    """Returns a spider's (crawl's) horizon, or None if it doesn't have one."""
+    if not hasattr(spider, 'horizon_'):
+        spider.horizon_ = Horizon.from_settings(spider.settings)
+    return spider.horizon_
+
+
+class HorizonFilterPipeline(object):
+    """
+    Spider pipeline which drops events from outside of the DATE_HORIZON. It
+    should come before any pipelines which write items out.
+    """
+    def __init__(self, horizon):
+        self.horizon = horizon
+
+    @classmethod
+    def from_settings(cls, settings):
+        horizon = Horizon.from_settings(settings)
+        if horizon is None:
+            raise NotConfigured
+        return cls(horizon)
+
+    def process_item(self, item, scraper):
+        """Drops events (or the events of items) outside of the horizon."""
+        if 'events' in item:
+            item['events'] = [
+                event for event in individual_items(item)
+                if self.horizon.contains(event['epoch'])]
+            if not item['events']:
+                raise DropItem('no events within the date horizon')
+        elif not self.horizon.contains(item['epoch']):
+            raise DropItem('event outside of the date horizon')
+        return item
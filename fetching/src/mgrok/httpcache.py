@@ -0,0 +1,101 @@
+"""
+On-disk HTTP cache storage for the venue-scraping scrapy spiders.
+
+Revalidation itself (If-None-Match/If-Modified-Since, reusing the cached body
+on a 304) is handled by scrapy's RFC2616Policy; this module just keeps the
+cache directory from growing without bound. Eviction scans the whole
+directory, so it's done once per run (by whatever runs the crawl) rather than
+as each spider closes.
+"""
+
+import logging
+import os
+import shutil
+from time import time
+
+from scrapy.extensions.httpcache import FilesystemCacheStorage
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedFilesystemCacheStorage(FilesystemCacheStorage):
+    """
+    Filesystem cache storage which marks entries as used when they're read,
+    so that evict can remove the least recently used ones first.
+    """
+    def retrieve_response(self, spider, request):
+        response = super(BoundedFilesystemCacheStorage, self).retrieve_response(
+            spider, request)
+        if response is not None:
+            # The body's mtime marks when an entry was last used, which is
+            # what eviction orders by. The metadata's mtime is left alone
+            # since that's what the TTL is measured against.
+            body_path = os.path.join(
+                self._get_request_path(spider, request), 'response_body')
+            os.utime(body_path, None)
+        return response
+
+
+def evict(cachedir, max_bytes, expiration_secs=0):
+    """
+    Removes the expired entries (if expiration_secs is positive) from a cache
+    directory, then the least recently used ones until it's no bigger than
+    max_bytes (if positive).
+    """
+    if not os.path.isdir(cachedir):
+        return
+    now = time()
+    entries = []
+    total_bytes = 0
+    for entry_path in _iter_entries(cachedir):
+        meta_path = os.path.join(entry_path, 'pickled_meta')
+        body_path = os.path.join(entry_path, 'response_body')
+        try:
+            stored_at = os.stat(meta_path).st_mtime
+            used_at = os.stat(body_path).st_mtime
+        except OSError:
+            # Half-written entry; it will never be read back.
+            shutil.rmtree(entry_path, ignore_errors=True)
+            continue
+        if 0 < expiration_secs < now - stored_at:
+            shutil.rmtree(entry_path, ignore_errors=True)
+            continue
+        size = _entry_size(entry_path)
+        entries.append((used_at, size, entry_path))
+        total_bytes += size
+
+    if max_bytes <= 0 or total_bytes <= max_bytes:
+        return
+    entries.sort()
+    evicted = 0
+    for _, size, entry_path in entries:
+        if total_bytes <= max_bytes:
+            break
+        shutil.rmtree(entry_path, ignore_errors=True)
+        total_bytes -= size
+        evicted += 1
+    logger.debug('Evicted %d http cache entries', evicted)
+
+
+def _iter_entries(cachedir):
+    # Layout is <cachedir>/<spider name>/<fp[0:2]>/<fp>/
+    for spider_dir in os.listdir(cachedir):
+        spider_path = os.path.join(cachedir, spider_dir)
+        if not os.path.isdir(spider_path):
+            continue
+        for prefix in os.listdir(spider_path):
+            prefix_path = os.path.join(spider_path, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for fingerprint in os.listdir(prefix_path):
+                yield os.path.join(prefix_path, fingerprint)
+
+
+def _entry_size(entry_path):
+    size = 0
+    for file_name in os.listdir(entry_path):
+        try:
+            size += os.path.getsize(os.path.join(entry_path, file_name))
+        except OSError:
+            pass
+    return size
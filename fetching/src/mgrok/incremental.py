@@ -0,0 +1,115 @@
+"""
+Spider middleware for incrementally crawling venues: events whose detail pages
+were scraped on a previous run are re-emitted from a store instead of being
+fetched again.
+"""
+
+import json
+import os
+from time import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request
+
+from mgrok.events import Event
+from mgrok.output import slugify
+
+
+def _with_epoch(item):
+    """
+    Returns a stored item as it'd be scraped now: events stored before they
+    carried an epoch get one, worked out from their date.
+    """
+    if 'events' in item:
+        return dict(item, events=map(_with_epoch, item['events']))
+    if 'epoch' not in item and 'date' in item:
+        return dict(Event.from_dict(item))
+    return item
+
+
+class IncrementalCrawlMiddleware(object):
+    """
+    Keeps a per-spider store, on disk, mapping event detail page urls to the
+    items last extracted from them.
+
+    When a listing page links to an event that's already in the store, the
+    stored items are emitted in place of the detail page request. Only new
+    events, plus a handful of the stalest known ones, are actually fetched,
+    so that known events still get refreshed every now and again.
+    """
+    def __init__(self, store_dir, refresh_limit, refresh_after):
+        self.store_dir = store_dir
+        self.refresh_limit = refresh_limit
+        self.refresh_after = refresh_after
+        self.known_ = {}
+        self.refresh_ = set()
+        self.seen_ = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get('INCREMENTAL_STORE_DIR'):
+            raise NotConfigured
+        middleware = cls(
+            settings['INCREMENTAL_STORE_DIR'],
+            settings.getint('INCREMENTAL_REFRESH_LIMIT', 10),
+            settings.getint('INCREMENTAL_REFRESH_AFTER', 3 * 24 * 60 * 60))
+        crawler.signals.connect(
+            middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(
+            middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        path = self._store_path(spider)
+        if os.path.exists(path):
+            with open(path) as store_file:
+                self.known_ = json.load(store_file)
+
+        # Refresh the stalest events first, so that over successive runs
+        # every known event gets its turn.
+        now = time()
+        stale = [
+            (record['fetched'], url)
+            for url, record in self.known_.iteritems()
+            if now - record['fetched'] > self.refresh_after]
+        stale.sort()
+        self.refresh_ = set(url for _, url in stale[:self.refresh_limit])
+
+    def spider_closed(self, spider):
+        # Only events that were listed this time around are kept; anything
+        # else has either happened already or been taken down.
+        if not os.path.isdir(self.store_dir):
+            os.makedirs(self.store_dir)
+        path = self._store_path(spider)
+        with open(path + '.tmp', 'w') as store_file:
+            json.dump(self.seen_, store_file)
+        os.rename(path + '.tmp', path)
+
+    def process_spider_output(self, response, result, spider):
+        """Swaps requests for known events out for their stored items."""
+        store_key = response.meta.get('incremental_key')
+        items = []
+        for output in result:
+            if isinstance(output, Request) and output.meta.get('event_detail'):
+                record = self.known_.get(output.url)
+                if record is not None and output.url not in self.refresh_:
+                    record = dict(
+                        record, items=map(_with_epoch, record['items']))
+                    self.seen_[output.url] = record
+                    for item in record['items']:
+                        yield dict(item)
+                    continue
+                output.meta['incremental_key'] = output.url
+            elif store_key is not None and isinstance(output, dict):
+                items.append(dict(output))
+            yield output
+
+        # Events which didn't produce anything are left out of the store, so
+        # they're tried again next time.
+        if store_key is not None and items:
+            self.seen_[store_key] = {'fetched': time(), 'items': items}
+
+    def _store_path(self, spider):
+        return os.path.join(self.store_dir, slugify(spider.name) + '.json')
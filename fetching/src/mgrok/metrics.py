@@ -0,0 +1,299 @@
+"""
+Metrics on how each spider and venue api fared over a run, for finding slow
+venues and scrapers which have stopped turning anything up.
+"""
+
+from functools import wraps
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from mgrok.pipelines import individual_items
+
+
+def _percentile(ordered, fraction):
+    """Returns the value a fraction of the way into an ordered list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Per-thread usage, so that what the api threads use while a spider's parse
+# is being timed (on the reactor's thread) isn't put down to the spider.
+# Python 2's resource module leaves out linux's RUSAGE_THREAD, but passes it
+# on all the same.
+if hasattr(resource, 'RUSAGE_THREAD'):
+    _RUSAGE_THREAD = resource.RUSAGE_THREAD
+elif sys.platform.startswith('linux'):
+    _RUSAGE_THREAD = 1
+else:
+    _RUSAGE_THREAD = None
+
+
+def cpu_time():
+    """
+    Returns the CPU time, in seconds, the calling thread has used so far, or
+    the whole process has where that can't be had.
+    """
+    usage = resource.getrusage(
+        resource.RUSAGE_SELF if _RUSAGE_THREAD is None else _RUSAGE_THREAD)
+    return usage.ru_utime + usage.ru_stime
+
+
+class SourceMetrics(object):
+    """Metrics on a single spider or venue api."""
+    def __init__(self, kind):
+        self.kind = kind
+        self.started = None
+        self.finished = None
+        self.requests = 0
+        self.bytes = 0
+        self.latencies = []
+        self.parse_cpu_time = 0.0
+        self.items = 0
+        self.dropped_items = 0
+        self.none_items = 0
+        self.errors = 0
+        self.venues = {}
+
+    def start(self):
+        if self.started is None:
+            self.started = time.time()
+
+    def finish(self):
+        self.finished = time.time()
+
+    def add_response(self, num_bytes, latency):
+        self.requests += 1
+        self.bytes += num_bytes
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def add_item(self, item):
+        self.items += 1
+        self.venues[item['venue_name']] = (
+            self.venues.get(item['venue_name'], 0) + 1)
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+        wall_time = None
+        if self.started is not None and self.finished is not None:
+            wall_time = self.finished - self.started
+        return {
+            'kind': self.kind,
+            'wall_time': wall_time,
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'latency': {
+                'p50': _percentile(latencies, 0.5),
+                'p90': _percentile(latencies, 0.9),
+                'p99': _percentile(latencies, 0.99),
+                'max': latencies[-1] if latencies else None,
+                },
+            'parse_cpu_time': self.parse_cpu_time,
+            'items': self.items,
+            'dropped_items': self.dropped_items,
+            'none_items': self.none_items,
+            'errors': self.errors,
+            'venues': self.venues,
+            }
+
+
+class RunReport(object):
+    """
+    Metrics on every spider and venue api in a run. It's shared by everything
+    that records into it, spiders (by way of the RUN_REPORT setting) and api
+    threads alike.
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.sources_ = {}
+        self.included_ = {}
+        self.lock_ = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Scrapy deep-copies settings; every crawler should get this report.
+        return self
+
+    def source(self, name, kind):
+        """Returns the metrics of the given spider or api."""
+        with self.lock_:
+            if name not in self.sources_:
+                self.sources_[name] = SourceMetrics(kind)
+            return self.sources_[name]
+
+    def instrument_api(self, api):
+        """
+        Has a TicketFly api record its requests and formatting into the
+        report, by wrapping its make_request and format_events.
+        """
+        metrics = self.source(type(api).__name__, 'api')
+        lock = self.lock_
+        make_request = api.make_request
+        format_events = api.format_events
+
+        @wraps(make_request)
+        def timed_make_request(*args, **kwargs):
+            with lock:
+                metrics.start()
+            try:
+                response = make_request(*args, **kwargs)
+            except Exception:
+                with lock:
+                    metrics.errors += 1
+                raise
+            with lock:
+                metrics.add_response(
+                    len(response.content), response.elapsed.total_seconds())
+                metrics.finish()
+            return response
+
+        @wraps(format_events)
+        def timed_format_events(events):
+            started = cpu_time()
+            formatted_events = format_events(events)
+            with lock:
+                metrics.parse_cpu_time += cpu_time() - started
+                for venue_events in formatted_events.values():
+                    for event in venue_events:
+                        metrics.add_item(event)
+            return formatted_events
+
+        api.make_request = timed_make_request
+        api.format_events = timed_format_events
+        return api
+
+    def include(self, path):
+        """
+        Adds the sources of a report written out elsewhere (e.g. by a worker
+        process) to this one's.
+        """
+        with open(path) as report_file:
+            sources = json.load(report_file)['sources']
+        with self.lock_:
+            self.included_.update(sources)
+
+    def to_dict(self):
+        with self.lock_:
+            sources = dict(self.included_)
+            sources.update(
+                (name, metrics.to_dict())
+                for name, metrics in self.sources_.iteritems())
+        return {
+            'started': self.started,
+            'wall_time': time.time() - self.started,
+            'sources': sources,
+            # Spiders and apis which came up empty are likely broken.
+            'empty': sorted(
+                name for name, metrics in sources.iteritems()
+                if not metrics['items']),
+            }
+
+    def write(self, path):
+        """Writes the report out to a JSON file."""
+        with open(path + '.tmp', 'w') as report_file:
+            json.dump(self.to_dict(), report_file, indent=2, sort_keys=True)
+        os.rename(path + '.tmp', path)
+
+
+class CrawlMetricsExtension(object):
+    """
+    Extension which records a spider's requests, items and parse time (as
+    counted by ParseTimingMiddleware) into the RUN_REPORT.
+    """
+    def __init__(self, report, stats):
+        self.report = report
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        report = crawler.settings.get('RUN_REPORT')
+        if report is None:
+            raise NotConfigured
+        extension = cls(report, crawler.stats)
+        for handler, signal in [
+                (extension.spider_opened, signals.spider_opened),
+                (extension.spider_closed, signals.spider_closed),
+                (extension.response_received, signals.response_received),
+                (extension.item_scraped, signals.item_scraped),
+                (extension.item_dropped, signals.item_dropped),
+                (extension.spider_error, signals.spider_error)]:
+            crawler.signals.connect(handler, signal=signal)
+        return extension
+
+    def metrics(self, spider):
+        return self.report.source(spider.name, 'spider')
+
+    def spider_opened(self, spider):
+        self.metrics(spider).start()
+
+    def spider_closed(self, spider):
+        metrics = self.metrics(spider)
+        metrics.finish()
+        metrics.parse_cpu_time = self.stats.get_value(
+            'parse/cpu_time', 0.0, spider=spider)
+        metrics.none_items = self.stats.get_value(
+            'parse/none_items', 0, spider=spider)
+
+    def response_received(self, response, request, spider):
+        self.metrics(spider).add_response(
+            len(response.body), request.meta.get('download_latency'))
+
+    def item_scraped(self, item, response, spider):
+        metrics = self.metrics(spider)
+        for individual_item in individual_items(item):
+            metrics.add_item(individual_item)
+
+    def item_dropped(self, item, response, exception, spider):
+        self.metrics(spider).dropped_items += 1
+
+    def spider_error(self, failure, response, spider):
+        self.metrics(spider).errors += 1
+
+
+class ParseTimingMiddleware(object):
+    """
+    Spider middleware which records, in the crawl's stats, how much CPU time
+    is spent in the spider's callbacks ('parse/cpu_time') and on how many
+    responses ('parse/responses', 'parse/max_cpu_time'), along with how many
+    times they come up with None ('parse/none_items'). It should sit closest
+    to the spider, so as to time nothing but its callbacks.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler.stats)
+        crawler.signals.connect(
+            middleware.spider_opened, signal=signals.spider_opened)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.stats.set_value('parse/cpu_time', 0.0, spider=spider)
+        self.stats.set_value('parse/max_cpu_time', 0.0, spider=spider)
+
+    def process_spider_output(self, response, result, spider):
+        # The callback only does its work as its output is iterated over.
+        elapsed = 0.0
+        result = iter(result)
+        while True:
+            started = cpu_time()
+            try:
+                output = next(result)
+            except StopIteration:
+                break
+            finally:
+                elapsed += cpu_time() - started
+            if output is None:
+                self.stats.inc_value('parse/none_items', spider=spider)
+            yield output
+        self.stats.inc_value('parse/responses', spider=spider)
+        self.stats.inc_value('parse/cpu_time', elapsed, spider=spider)
+        self.stats.max_value('parse/max_cpu_time', elapsed, spider=spider)
@@ -0,0 +1,231 @@
+"""
+Helpers for writing out collected events and assembling them into the list
+the frontend displays.
+"""
+
+from datetime import datetime
+from operator import itemgetter
+from time import time
+import glob
+import hashlib
+import json
+import os
+import re
+
+import pytz
+
+from mgrok.events import Event
+
+
+def slugify(name):
+    """Returns a file-name friendly version of a venue (or spider) name."""
+    return re.sub(r'\W+', '_', name.lower()).strip('_')
+
+
+class JsonLinesWriter(object):
+    """
+    Appends events, one JSON object per line, to a file or, if per_venue, to
+    one file per venue within a directory. Each line is flushed as it's
+    written, so whatever was written survives a crash.
+    """
+    def __init__(self, path, per_venue=False):
+        self.path = path
+        self.per_venue = per_venue
+        self.files_ = {}
+
+    def write(self, event):
+        out_file = self._get_file(event['venue_name'])
+        out_file.write(json.dumps(dict(event)) + '\n')
+        out_file.flush()
+
+    def close(self):
+        for out_file in self.files_.values():
+            out_file.close()
+        self.files_ = {}
+
+    def _get_file(self, venue_name):
+        path = self.path
+        if self.per_venue:
+            path = os.path.join(self.path, slugify(venue_name) + '.jsonl')
+        if path not in self.files_:
+            self.files_[path] = open(path, 'a')
+        return self.files_[path]
+
+
+def truncate_jsonl(path, per_venue=False):
+    """Empties out JSON lines output left behind by a previous run."""
+    if not per_venue:
+        open(path, 'w').close()
+        return
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for venue_path in glob.glob(os.path.join(path, '*.jsonl')):
+        os.remove(venue_path)
+
+
+def read_jsonl(path, per_venue=False):
+    """
+    Yields the events written out by a JsonLinesWriter. One which never got
+    anything to write leaves no file behind, and so yields nothing.
+    """
+    paths = [path]
+    if per_venue:
+        paths = sorted(glob.glob(os.path.join(path, '*.jsonl')))
+    elif not os.path.exists(path):
+        return
+    for jsonl_path in paths:
+        with open(jsonl_path) as in_file:
+            for line in in_file:
+                # A crash can leave a partially written last line behind.
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def group_by_venue(events):
+    """Returns a dictionary of venue name to that venue's events."""
+    shows = {}
+    for event in events:
+        shows.setdefault(event['venue_name'], []).append(event)
+    return shows
+
+
+def sort_shows(shows):
+    """
+    Sorts each venue's events by date, in place, dropping duplicates and
+    adding the fields which save clients from having to parse dates: 'epoch'
+    (seconds since the epoch), 'day' (its local YYYY-MM-DD) and 'id'.
+    """
+    for venue_name, events in shows.items():
+        unique_events = {}
+        for event in events:
+            event = Event.from_dict(event)
+            event['day'] = event.day
+            event['id'] = event.id
+            unique_events[(event.epoch, event.event_link)] = event
+        shows[venue_name] = sorted(
+            unique_events.itervalues(), key=itemgetter('epoch', 'id'))
+
+
+def build_output(shows, updated=None, presorted=False):
+    """
+    Returns the object the frontend expects, with each venue's shows sorted
+    (unless they're presorted, as sort_shows would leave them). It's marked
+    as updated now, unless told otherwise.
+
+    Alongside the shows are a 'days' index, mapping each day to the ids of
+    that day's events in order, and 'next_events', mapping each venue to the
+    id of its next upcoming event.
+    """
+    if not presorted:
+        sort_shows(shows)
+    now = time()
+    days = {}
+    next_events = {}
+    for venue_name, events in shows.iteritems():
+        for event in events:
+            days.setdefault(event['day'], []).append(event)
+            if venue_name not in next_events and event['epoch'] >= now:
+                next_events[venue_name] = event['id']
+    for day, events in days.iteritems():
+        events.sort(key=itemgetter('epoch', 'id'))
+        days[day] = [event['id'] for event in events]
+    if updated is None:
+        updated = datetime.now(pytz.timezone('US/Eastern')).isoformat()
+    return {
+        "updated": updated,
+        "shows": shows,
+        "days": days,
+        "next_events": next_events,
+        }
+
+
+def finalize_jsonl(path, per_venue=False):
+    """Assembles the output object out of JSON lines written during a run."""
+    return build_output(group_by_venue(read_jsonl(path, per_venue)))
+
+
+def _write_atomically(path, content):
+    with open(path + '.tmp', 'w') as out_file:
+        out_file.write(content)
+    os.rename(path + '.tmp', path)
+
+
+def _shard_groups(events, by_week):
+    """Yields (week, events) pairs; week is None unless by_week."""
+    if not by_week:
+        yield None, events
+        return
+    weeks = {}
+    for event in events:
+        day = datetime.strptime(event['day'], '%Y-%m-%d')
+        year, week, _ = day.isocalendar()
+        weeks.setdefault('{}-W{:02d}'.format(year, week), []).append(event)
+    for week in sorted(weeks):
+        yield week, weeks[week]
+
+
+def write_shards(output, directory, by_week=False):
+    """
+    Writes each venue's shows (or each week of them, if by_week) to its own
+    shard within directory, along with a manifest.json describing the shards.
+    Returns the manifest.
+
+    Shards are named after a hash of their content, so they never change once
+    written and can be served with long-lived cache headers; only the
+    manifest needs to be fetched fresh.
+    """
+    shard_dir = os.path.join(directory, 'shards')
+    if not os.path.isdir(shard_dir):
+        os.makedirs(shard_dir)
+    manifest_path = os.path.join(directory, 'manifest.json')
+
+    now = time()
+    manifest = {'updated': output['updated'], 'venues': {}}
+    for venue_name, events in output['shows'].iteritems():
+        next_event = None
+        for event in events:
+            if event['epoch'] >= now:
+                next_event = event
+                break
+        shards = []
+        for week, shard_events in _shard_groups(events, by_week):
+            content = json.dumps(shard_events, sort_keys=True)
+            content_hash = hashlib.sha1(content).hexdigest()
+            file_name = '{}.{}.json'.format(
+                slugify(venue_name), content_hash[:16])
+            shard_path = os.path.join(shard_dir, file_name)
+            if not os.path.exists(shard_path):
+                _write_atomically(shard_path, content)
+            shards.append({
+                'path': 'shards/' + file_name,
+                'hash': content_hash,
+                'count': len(shard_events),
+                'week': week,
+                })
+        manifest['venues'][venue_name] = {
+            'count': len(events),
+            'next_event': next_event,
+            'shards': shards,
+            }
+
+    # Shards from the previous manifest are kept around, for the sake of
+    # clients which fetched it just before it was replaced.
+    keep = set(_manifest_shard_paths(manifest))
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            keep.update(_manifest_shard_paths(json.load(manifest_file)))
+    _write_atomically(manifest_path, json.dumps(manifest, sort_keys=True))
+    for shard_path in glob.glob(os.path.join(shard_dir, '*.json')):
+        if 'shards/' + os.path.basename(shard_path) not in keep:
+            os.remove(shard_path)
+
+    return manifest
+
+
+def _manifest_shard_paths(manifest):
+    return [
+        shard['path']
+        for venue in manifest['venues'].values()
+        for shard in venue['shards']]
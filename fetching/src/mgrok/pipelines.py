@@ -1,5 +1,15 @@
 """Pipelines for extracting data from venue-scraping scrapy spiders"""
 
+from mgrok.output import JsonLinesWriter
+
+
+def individual_items(item):
+    """Items may carry a list of 'events' rather than being an event."""
+    if 'events' in item:
+        return item['events']
+    return [item]
+
+
 class JsonWriterPipeline(object):
     """JSON extracting spider pipeline"""
     def __init__(self, items):
@@ -11,11 +21,8 @@ class JsonWriterPipeline(object):
 
     def process_item(self, item, scraper):
         """Adds items to the output dictionary."""
-        if 'events' in item:
-            for individual_item in item['events']:
-                self._process_item(individual_item)
-        else:
-            self._process_item(item)
+        for individual_item in individual_items(item):
+            self._process_item(individual_item)
 
         return item
 
@@ -24,3 +31,51 @@ class JsonWriterPipeline(object):
             self.items_[item['venue_name']] = []
         self.items_[item['venue_name']].append(dict(item))
         return item
+
+
+class JsonLinesWriterPipeline(object):
+    """
+    Spider pipeline which streams items out to JSON lines as they're scraped,
+    instead of holding on to them.
+    """
+    def __init__(self, path, per_venue):
+        self.writer_ = JsonLinesWriter(path, per_venue)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings['PIPELINE_JSONL_PATH'],
+            settings.getbool('PIPELINE_JSONL_PER_VENUE'))
+
+    def close_spider(self, scraper):
+        self.writer_.close()
+
+    def process_item(self, item, scraper):
+        """Writes items out to the JSON lines file(s)."""
+        for individual_item in individual_items(item):
+            self.writer_.write(individual_item)
+
+        return item
+
+
+class DatabaseWriterPipeline(object):
+    """
+    Spider pipeline which upserts items into the mgrok.store.EventDatabase in
+    the PIPELINE_DATABASE setting, committing as each spider finishes.
+    """
+    def __init__(self, database):
+        self.database_ = database
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings['PIPELINE_DATABASE'])
+
+    def close_spider(self, scraper):
+        self.database_.commit()
+
+    def process_item(self, item, scraper):
+        """Writes items to the database."""
+        for individual_item in individual_items(item):
+            self.database_.write(individual_item)
+
+        return item
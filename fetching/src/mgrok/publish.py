@@ -0,0 +1,73 @@
+"""
+Publishing of generated files for a static web server to serve.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _gzip(content):
+    compressed = io.BytesIO()
+    # A fixed mtime keeps the output the same for the same content.
+    gzip_file = gzip.GzipFile(
+        fileobj=compressed, mode='wb', compresslevel=9, mtime=0)
+    gzip_file.write(content)
+    gzip_file.close()
+    return compressed.getvalue()
+
+
+def etag(content):
+    """Returns a strong ETag for a file's content."""
+    return '"{}"'.format(hashlib.sha256(content).hexdigest()[:32])
+
+
+def publish(content, path):
+    """
+    Publishes content to path, alongside precompressed path.gz and path.br
+    (only if brotli is installed) siblings and a path.etag holding its ETag.
+    Returns the ETag.
+
+    Everything is written out to temporary files first and then renamed into
+    place, with the uncompressed file going last, so the server never sees a
+    partially written file, nor a compressed sibling older than the file.
+    """
+    if isinstance(content, unicode):
+        content = content.encode('utf-8')
+    content_etag = etag(content)
+    versions = [
+        (path + '.gz', _gzip(content)),
+        (path + '.etag', content_etag),
+        (path, content),
+        ]
+    if brotli is not None:
+        versions.insert(1, (path + '.br', brotli.compress(content)))
+    elif os.path.exists(path + '.br'):
+        # Don't leave a stale one around for the server to pick up.
+        os.remove(path + '.br')
+
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_paths = []
+    try:
+        for final_path, version in versions:
+            handle, temp_path = tempfile.mkstemp(
+                prefix='.' + os.path.basename(final_path), dir=directory)
+            temp_paths.append(temp_path)
+            with os.fdopen(handle, 'wb') as temp_file:
+                temp_file.write(version)
+            os.chmod(temp_path, 0o644)
+        for (final_path, _), temp_path in zip(versions, temp_paths):
+            os.rename(temp_path, final_path)
+    except Exception:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+    return content_etag
@@ -7,18 +7,84 @@ from datetime import datetime, timedelta
 from functools import partial
 import re
 
+from w3lib.url import add_or_replace_parameter, url_query_parameter
 import pytz
 import scrapy
 
+from mgrok import dates
+from mgrok.events import Event
+from mgrok.horizon import get_horizon
+
+
+def _event_request(url, callback):
+    """
+    Returns a request for an event's detail page. These are tagged so that
+    middlewares can tell them apart from listing and pagination requests.
+    """
+    return scrapy.Request(url, callback=callback, meta={'event_detail': True})
+
+def _listing_first(spider):
+    """
+    Whether a spider should build events straight out of its listings, only
+    fetching the pages of events whose listings leave something out. This is
+    on unless the LISTING_FIRST setting turns it off.
+    """
+    return spider.settings.getbool('LISTING_FIRST', True)
+
 class _BoweryPresentsSpider(scrapy.Spider):
     """
     Base class spider for Bowery Presents formatted venue websites
     """
+    date_parser = dates.get_parser('%a, %B %d, %Y %I:%M %p')
+
+    # Seconds between refreshes, when running as a daemon
+    refresh_interval = 6 * 60 * 60
+
     def parse(self, response):
-        selector = '.tfly-calendar .one-event .headliners > a::attr(href)'
-        for event_link in response.css(selector):
-            full_url = response.urljoin(event_link.extract())
-            yield scrapy.Request(full_url, callback=self._parse_event)
+        listing_first = _listing_first(self)
+        horizon = get_horizon(self)
+        for listed_event in response.css('.tfly-calendar .one-event'):
+            event_link = (
+                listed_event.css('.headliners > a::attr(href)').extract_first())
+            if not event_link:
+                continue
+            full_url = response.urljoin(event_link)
+            listed_date = self._parse_listed_date(listed_event)
+            if (horizon and listed_date and
+                    not horizon.contains(listed_date[1])):
+                continue
+            event = listing_first and self._parse_listed_event(
+                listed_event, full_url, listed_date)
+            if event:
+                yield event
+            else:
+                yield _event_request(full_url, self._parse_event)
+
+    def _parse_listed_date(self, listed_event):
+        """Returns a listing's ISO date and epoch, or None if it hasn't one."""
+        the_date = (
+            listed_event.css('.times .value-title::attr(title)').extract_first())
+        if not the_date:
+            return None
+        try:
+            return dates.parse_iso(the_date)
+        except ValueError:
+            return None
+
+    def _parse_listed_event(self, listed_event, event_link, listed_date):
+        """
+        Returns the event a listing describes, or None if the listing doesn't
+        say enough about it (and its page needs to be fetched).
+        """
+        artists = [
+            artist.strip() for artist in
+            listed_event.css('.headliners a, .supports a')
+            .xpath('./text()').extract()
+            if artist.strip()]
+        if not artists or not listed_date:
+            return None
+        the_date, epoch = listed_date
+        return Event(self.name, artists, the_date, epoch, event_link)
 
     def _parse_event(self, response):
         artists = (response
@@ -38,21 +104,12 @@ class _BoweryPresentsSpider(scrapy.Spider):
                 response
                 .css('.event-info .times .doors').xpath('./text()')
                 .extract()[0].lstrip('Doors: '))
-            timezone = pytz.timezone('America/New_York')
-            the_datetime = timezone.localize(
-                datetime.strptime(
-                    the_date + ' ' + the_time,
-                    '%a, %B %d, %Y %I:%M %p'))
-            the_date = the_datetime.isoformat()
+            the_date, epoch = self.date_parser.parse(
+                the_date + ' ' + the_time)
         else:
-            the_date = the_date[0]
+            the_date, epoch = dates.parse_iso(the_date[0])
 
-        yield {
-            'event_link': response.url,
-            'artists': artists,
-            'date': the_date,
-            'venue_name': self.name
-        }
+        yield Event(self.name, artists, the_date, epoch, response.url)
 
 class _TicketWebSpider(scrapy.Spider):
     """Base class spider for ticketweb formatted venue websites"""
@@ -62,27 +119,97 @@ class _TicketWebSpider(scrapy.Spider):
         'http://www.ticketweb.com/t3/sale/SaleEventDetail'
         '?dispatch=loadSelectionData&eventId=')
 
+    date_parser = dates.get_parser('%A, %b %d, %Y %I:%M %p')
+
+    refresh_interval = 6 * 60 * 60
+
+    listing_date_parser = dates.get_parser('%a, %b %d, %Y %I:%M %p')
+
+    # How many listing pages ahead each one requests, with a horizon
+    pages_ahead = 3
+
     def parse(self, response):
-        pages = [
-            scrapy.Request(response.url, callback=self._parse_event_list)
-        ]
-        num_pages = len(response.css('.pagination-nav li'))
-        for page_number in range(1, num_pages):
-            pages.append(
-                scrapy.Request(
-                    response.urljoin('?page={0}'.format(page_number+1)),
-                    callback=self._parse_event_list))
-        for page in pages:
-            yield page
+        # The pages after this one get requested from it, while it's parsed
+        # in place: every one of them at once, or, with a horizon, only the
+        # next few, which then request the few after them (the scheduler
+        # drops the repeats). Listings are in date order, so a page which
+        # goes past the horizon requests no more, and no more than a few
+        # pages past it ever get requested.
+        page_param = url_query_parameter(response.url, 'page') or ''
+        page_number = int(page_param) if page_param.isdigit() else 1
+        last_page_number = len(response.css('.pagination-nav li'))
+        horizon = get_horizon(self)
+        if horizon and any(
+                horizon.is_past(listed_date[1])
+                for listed_date in self._parse_listed_dates(response)):
+            last_page_number = page_number
+        elif horizon:
+            last_page_number = min(
+                last_page_number, page_number + self.pages_ahead)
+        for number in range(page_number + 1, last_page_number + 1):
+            yield scrapy.Request(
+                response.urljoin('?page={0}'.format(number)),
+                callback=self.parse)
+        for event in self._parse_event_list(response):
+            yield event
 
     def _parse_event_list(self, response):
-        selector = '.event-list .media-body .event-name a::attr(data-ng-href)'
-        for event_link in response.css(selector):
+        listing_first = _listing_first(self)
+        horizon = get_horizon(self)
+        for listed_event in response.css('.event-list .media-body'):
+            event_link = listed_event.css(
+                '.event-name a::attr(data-ng-href)').extract_first()
+            if not event_link:
+                continue
             # The link has angular template garbage in it, so we generate our
             # own link to the event
-            match = re.search(r'eventId=(\d+)', event_link.extract())
+            match = re.search(r'eventId=(\d+)', event_link)
             full_url = response.urljoin(self.event_url_format + match.group(1))
-            yield scrapy.Request(full_url, callback=self._parse_event)
+            listed_date = self._parse_listed_date(listed_event)
+            if (horizon and listed_date and
+                    not horizon.contains(listed_date[1])):
+                continue
+            event = listing_first and self._parse_listed_event(
+                listed_event, full_url, listed_date)
+            if event:
+                yield event
+            else:
+                yield _event_request(full_url, self._parse_event)
+
+    def _parse_listed_dates(self, response):
+        for listed_event in response.css('.event-list .media-body'):
+            listed_date = self._parse_listed_date(listed_event)
+            if listed_date:
+                yield listed_date
+
+    def _parse_listed_date(self, listed_event):
+        """Returns a listing's ISO date and epoch, or None if it hasn't one."""
+        date_text = ' '.join(
+            listed_event.css('.event-date').xpath('./text()').extract()).strip()
+        if not date_text:
+            return None
+        try:
+            # Listings don't say whether a time is EDT or EST, which only
+            # matters (and makes localizing fail) around the fall clock change.
+            return self.listing_date_parser.parse(
+                ' '.join(date_text.split()), is_dst=None)
+        except (ValueError, pytz.InvalidTimeError):
+            return None
+
+    def _parse_listed_event(self, listed_event, event_link, listed_date):
+        """
+        Returns the event a listing describes, or None if the listing doesn't
+        say enough about it (and its page needs to be fetched).
+        """
+        artists = [
+            artist.strip() for artist in
+            listed_event.css('.event-name a, .event-opening-act')
+            .xpath('./text()').extract()
+            if artist.strip()]
+        if not artists or not listed_date:
+            return None
+        the_date, epoch = listed_date
+        return Event(self.name, artists, the_date, epoch, event_link)
 
     def _parse_event(self, response):
         artists = (
@@ -109,28 +236,38 @@ class _TicketWebSpider(scrapy.Spider):
             r'(?P<am_pm>[AP]M) '
             r'(?P<timezone>\w+)', date_text)
         no_tz_date_str = date_text[0:match.end('am_pm')].strip()
-        timezone = pytz.timezone('America/New_York')
-        the_datetime = timezone.localize(
-            datetime.strptime(
-                no_tz_date_str,
-                '%A, %b %d, %Y %I:%M %p'),
-            match.group('timezone') == 'EDT')
-
-        yield {
-            'event_link': response.url,
-            'artists': artists,
-            'date': the_datetime.isoformat(),
-            'venue_name': self.name
-        }
-
-
-class _RockwoodSpider(scrapy.Spider):
+        the_date, epoch = self.date_parser.parse(
+            no_tz_date_str, match.group('timezone') == 'EDT')
+
+        yield Event(self.name, artists, the_date, epoch, response.url)
+
+
+class _SharedPageSpider(scrapy.Spider):
+    """
+    Base class for spiders whose page lists the events of several venues.
+
+    The page is fetched and parsed once, and then each of the (venue name,
+    selector) pairs in venues is handed, along with it, to the subclass's
+    parse_venue(response, venue_name, selector), which yields that venue's
+    items. Like the other underscored base classes, it's never crawled itself.
+    """
+    venues = []
+
+    def parse(self, response):
+        for venue_name, selector in self.venues:
+            for output in self.parse_venue(response, venue_name, selector):
+                yield output
+
+
+class _RockwoodSpider(_SharedPageSpider):
     """Base class for Rockwood spiders"""
     start_urls = ['http://www.rockwoodmusichall.com/']
-    selector = None
 
-    def parse(self, response):
-        for first_column in response.css(self.selector):
+    # A single page, listing that day's (often changing) sets
+    refresh_interval = 60 * 60
+
+    def parse_venue(self, response, venue_name, selector):
+        for first_column in response.css(selector):
             date_str = first_column.css('h2').xpath('./text()').extract()
             if not date_str:
                 continue
@@ -158,10 +295,9 @@ class _RockwoodSpider(scrapy.Spider):
                     hour += 12
 
                 event_date = datetime(
-                    datetime.now().year, month, day_of_month,
-                    hour, minute, 0, 0)
-                event_date = (
-                    pytz.timezone('America/New_York').localize(event_date))
+                    dates.guess_year(month, day_of_month), month,
+                    day_of_month, hour, minute, 0, 0)
+                event_date = dates.timezone().localize(event_date)
                 if ampm == 'am':
                     event_date += timedelta(1)
 
@@ -195,12 +331,11 @@ class _RockwoodSpider(scrapy.Spider):
             if not artists:
                 yield None
             else:
-                yield {
-                    'event_link': self.start_urls[0],
-                    'artists': artist_strings,
-                    'date': artists[0]['date'].isoformat(),
-                    'venue_name': self.name
-                }
+                yield Event.at(
+                    venue_name,
+                    artist_strings,
+                    artists[0]['date'],
+                    self.start_urls[0])
 
 
 class TheSpaceAtWestburySpider(scrapy.Spider):
@@ -220,7 +355,7 @@ class TheSpaceAtWestburySpider(scrapy.Spider):
         for location in response.xpath(attribute_selector):
             event_url_suffix = location.extract().partition('?')[2]
             event_url = '{0}?{1}'.format(self.base_url, event_url_suffix)
-            yield scrapy.Request(event_url, callback=self._parse_event)
+            yield _event_request(event_url, self._parse_event)
 
     def _parse_event(self, response):
         yield None
@@ -232,12 +367,17 @@ class _MSGSpider(scrapy.Spider):
         'http://www.beacontheatre.com/calendar'
         '?page=0&evmonth=&evtype=concert&venue={0}')
 
+    date_parser = dates.get_parser('%b %d %Y %I:%M %p')
+
+    # Arena shows are booked months out
+    refresh_interval = 7 * 24 * 60 * 60
+
     def parse(self, response):
         event_links = response.css('td.event_name a').xpath('@href').extract()
         for event_url in event_links:
             if event_url[0] == '/':
                 event_url = response.urljoin(event_url)
-            yield scrapy.Request(event_url, callback=self._parse_event)
+            yield _event_request(event_url, self._parse_event)
 
     def _parse_event(self, response):
         title = (
@@ -280,19 +420,10 @@ class _MSGSpider(scrapy.Spider):
                 year_str,
                 time_str)
 
-            the_datetime = datetime.strptime(
-                datetime_str,
-                '%b %d %Y %I:%M %p')
+            the_date, epoch = self.date_parser.parse(datetime_str)
 
-            timezone = pytz.timezone('America/New_York')
-            the_datetime = timezone.localize(the_datetime)
-
-            events.append({
-                'event_link': response.url,
-                'artists': [title],
-                'date': the_datetime.isoformat(),
-                'venue_name': self.name
-            })
+            events.append(
+                Event(self.name, [title], the_date, epoch, response.url))
         yield {'events': events}
 
 class CityWinerySpider(scrapy.Spider):
@@ -304,33 +435,118 @@ class CityWinerySpider(scrapy.Spider):
         '?cat=40&limit=100&p=0&view=list'
     ]
     name = 'City Winery'
+    # The listings leave the year off
+    date_parser = dates.get_parser('%A, %B %d %I:%M %p')
+
+    refresh_interval = 24 * 60 * 60
+
+    # ... and the time, which is only on events' pages
+    listing_date_parser = dates.get_parser('%A, %B %d')
+
+    # How many listing pages ahead each one requests, with a horizon
+    pages_ahead = 3
+
     def parse(self, response):
+        # Every page after this one which can be worked out from it gets
+        # requested at once or, with a horizon, only the next few. Pages get
+        # planned again from each of them, in case the pager only showed
+        # some (or they were held back); repeats are dropped by the
+        # scheduler. Listings are in date order, so a page which goes past
+        # the horizon plans no more, and no more than a few pages past it
+        # ever get requested.
+        pages = self._plan_pages(response)
+        horizon = get_horizon(self)
+        if horizon and any(
+                day is not None and horizon.is_past(day)
+                for day in (
+                    self._parse_listed_day(date_str)
+                    for date_str in self._listed_date_strs(response))):
+            pages = []
+        elif horizon and pages:
+            pages = pages[:self.pages_ahead]
+        if pages is None:
+            # There's nothing to plan with; just go on to the next page.
+            pages = response.css('a.next').xpath('./@href').extract()[:1]
+        for page_url in pages:
+            yield scrapy.Request(page_url, callback=self.parse)
+        for event in self._parse_event_list(response):
+            yield event
+
+    def _plan_pages(self, response):
+        """
+        Returns the urls of the pages after this one, going by the total
+        number of events ("Items 1 to 100 of 345 total") and the number per
+        page (the limit param), or else by the pager's links. Returns None if
+        the page has neither.
+        """
+        page_number = max(
+            int(url_query_parameter(response.url, 'p') or 1), 1)
+        last_page_number = None
+
+        limit = url_query_parameter(response.url, 'limit')
+        total = re.search(
+            r'of\s+(\d+)',
+            ' '.join(response.css('.amount').xpath('.//text()').extract()))
+        if limit and limit.isdigit() and int(limit) > 0 and total:
+            last_page_number = -(-int(total.group(1)) // int(limit))
+        else:
+            for page_link in response.css('.pages a').xpath('./@href').extract():
+                linked_page = url_query_parameter(page_link, 'p')
+                if linked_page and linked_page.isdigit():
+                    last_page_number = max(
+                        last_page_number or page_number, int(linked_page))
+        if last_page_number is None:
+            return None
+
+        return [
+            add_or_replace_parameter(response.url, 'p', str(number))
+            for number in range(page_number + 1, last_page_number + 1)]
+
+    def _listed_date_strs(self, response):
+        for event in response.css('.tickets-content.products-container dl'):
+            yield self._listed_date_str(event)
+
+    def _listed_date_str(self, event):
+        """Returns the date a listing is on, or '' if it doesn't say."""
+        date_str = event.css('dt').xpath('./text()').extract_first()
+        return (date_str or '').strip()
+
+    def _parse_listed_day(self, date_str):
+        """
+        Returns the epoch of the start of the day a listing is on, or None if
+        it can't be made out. That's left for the event's page (or failing
+        that, the horizon pipeline) to sort out, rather than losing the rest
+        of the listing page over it.
+        """
+        if not date_str:
+            return None
+        try:
+            return self.listing_date_parser.parse(date_str)[1]
+        except (ValueError, KeyError, pytz.InvalidTimeError):
+            return None
+
+    def _parse_event_list(self, response):
+        horizon = get_horizon(self)
         event_wrapper = response.css('.tickets-content.products-container dl')
         for event in event_wrapper:
             event_link = (
                 event
                 .css('p.addtocart a')
                 .xpath('./@href')
-                .extract()[0])
-            date_str = (
-                event
-                .css('dt')
-                .xpath('./text()')
-                .extract()[0]
-                .strip()
-            )
+                .extract_first())
+            if not event_link:
+                continue
+            date_str = self._listed_date_str(event)
+            listed_day = self._parse_listed_day(date_str)
+            if (horizon and listed_day is not None and
+                    not horizon.contains(listed_day)):
+                continue
 
-            yield scrapy.Request(
+            yield _event_request(
                 event_link,
-                callback=partial(self._parse_event, date_str)
+                partial(self._parse_event, date_str)
             )
 
-        next_page_link = response.css('a.next').xpath('./@href').extract()
-        if next_page_link:
-            yield scrapy.Request(next_page_link[0], callback=self.parse)
-        else:
-            yield None
-
     def _parse_event(self, date_str, response):
         times = (
             response
@@ -343,27 +559,13 @@ class CityWinerySpider(scrapy.Spider):
             if re.search('start', time, re.IGNORECASE):
                 the_time = time
         the_time = re.match(r'\d+:\d+ [AaPp][Mm]', the_time).group(0)
-        the_datetime = datetime.strptime(
-            date_str + ' ' + the_time,
-            '%A, %B %d %I:%M %p')
-        now = datetime.now()
-        year = now.year
-        if the_datetime.month < now.month:
-            year += 1
-        the_datetime = the_datetime.replace(year=year)
-        timezone = pytz.timezone('America/New_York')
-        the_datetime = timezone.localize(the_datetime)
+        the_date, epoch = self.date_parser.parse(date_str + ' ' + the_time)
 
         title = response.css('.event-head h1').xpath('./text()').extract()[0]
         title_match = re.match(r'(.+)-', title)
         if title_match:
             title = title_match.group(1).strip()
-        yield {
-            'event_link': response.url,
-            'artists': [title],
-            'date': the_datetime.isoformat(),
-            'venue_name': self.name
-        }
+        yield Event(self.name, [title], the_date, epoch, response.url)
 
 class MSGSpider(_MSGSpider):
     name = 'Madison Square Garden'
@@ -382,16 +584,24 @@ class RadioCitySpider(_MSGSpider):
     start_urls = [_MSGSpider.base_url_format.format('radiocity')]
 
 class RockwoodStageOneSpider(_RockwoodSpider):
-    selector = '.first_column'
     name = "Rockwood (Stage 1)"
+    venues = [(name, '.first_column')]
 
 class RockwoodStageTwoSpider(_RockwoodSpider):
-    selector = '.second_column'
     name = "Rockwood (Stage 2)"
+    venues = [(name, '.second_column')]
 
 class RockwoodStageThreeSpider(_RockwoodSpider):
-    selector = '.third_column'
     name = "Rockwood (Stage 3)"
+    venues = [(name, '.third_column')]
+
+class RockwoodSpider(_RockwoodSpider):
+    """All of Rockwood's stages, out of a single fetch of their page"""
+    name = "Rockwood"
+    venues = (
+        RockwoodStageOneSpider.venues +
+        RockwoodStageTwoSpider.venues +
+        RockwoodStageThreeSpider.venues)
 
 class BoweryBallroomSpider(_BoweryPresentsSpider):
     name = 'Bowery Ballroom'
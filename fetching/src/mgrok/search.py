@@ -0,0 +1,132 @@
+"""
+A search index of the output's venues and artists, built once by the
+generator rather than by every client on every keystroke.
+
+Names are normalized into keys (lowercased, accents and punctuation dropped)
+and every key's trigrams are indexed, so a query only has to be checked
+against the keys which have all of its trigrams:
+
+    {"format": "mgrok-search-1",
+     "venues": {"keys": [...], "names": [...], "trigrams": {...}},
+     "artists": {"keys": [...], "events": [[event ids], ...],
+                 "trigrams": {...}}}
+
+where trigrams map each trigram to the (ascending) positions in keys of the
+keys which contain it. frontend/js/app.js queries it the same way.
+"""
+
+import json
+import re
+import unicodedata
+
+FORMAT = 'mgrok-search-1'
+
+_NOT_KEY_CHARS = re.compile(r'[^a-z0-9 ]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(name):
+    """Returns the search key of a name (or query)."""
+    if isinstance(name, str):
+        name = name.decode('utf-8')
+    name = unicodedata.normalize('NFKD', name).lower()
+    name = _NOT_KEY_CHARS.sub('', _SPACES.sub(' ', name))
+    return _SPACES.sub(' ', name).strip()
+
+
+def trigrams(key):
+    """Returns the set of three character substrings of a key."""
+    return set(key[i:i + 3] for i in range(len(key) - 2))
+
+
+def _trigram_index(keys):
+    index = {}
+    for position, key in enumerate(keys):
+        for trigram in trigrams(key):
+            index.setdefault(trigram, []).append(position)
+    return index
+
+
+def build_index(output):
+    """Returns the search index of an output object."""
+    venue_keys = {}
+    artist_events = {}
+    for venue_name, events in output['shows'].iteritems():
+        venue_keys.setdefault(normalize(venue_name), []).append(venue_name)
+        for event in events:
+            for artist in event['artists']:
+                artist_events.setdefault(normalize(artist), []).append(
+                    event['id'])
+
+    venue_keys.pop('', None)
+    artist_events.pop('', None)
+    sorted_venue_keys = sorted(venue_keys)
+    sorted_artist_keys = sorted(artist_events)
+    return {
+        'format': FORMAT,
+        'venues': {
+            'keys': sorted_venue_keys,
+            'names': [venue_keys[key] for key in sorted_venue_keys],
+            'trigrams': _trigram_index(sorted_venue_keys),
+            },
+        'artists': {
+            'keys': sorted_artist_keys,
+            'events': [
+                sorted(set(artist_events[key])) for key in sorted_artist_keys],
+            'trigrams': _trigram_index(sorted_artist_keys),
+            },
+        }
+
+
+def dumps(output):
+    """Returns the search index of an output object, as JSON."""
+    return json.dumps(build_index(output), separators=(',', ':'))
+
+
+def _matching_positions(section, query):
+    """Returns the positions of the keys in a section containing query."""
+    keys = section['keys']
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        # Too short to have trigrams; there's nothing for it but to look.
+        candidates = range(len(keys))
+    else:
+        # Intersect the trigrams' keys, fewest first.
+        postings = sorted(
+            (section['trigrams'].get(trigram, [])
+             for trigram in query_trigrams),
+            key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        candidates = sorted(candidates)
+    return [position for position in candidates if query in keys[position]]
+
+
+class SearchIndex(object):
+    """Queries of a search index (as built by build_index)."""
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as index_file:
+            return cls(json.load(index_file))
+
+    def venues(self, query):
+        """Returns the names of the venues whose names contain query."""
+        section = self.index['venues']
+        names = []
+        for position in _matching_positions(section, normalize(query)):
+            names.extend(section['names'][position])
+        return names
+
+    def artist_events(self, query):
+        """Returns the ids of the events of artists matching query."""
+        section = self.index['artists']
+        event_ids = set()
+        for position in _matching_positions(section, normalize(query)):
+            event_ids.update(section['events'][position])
+        return event_ids
@@ -0,0 +1,165 @@
+"""
+A small HTTP service which answers queries for events out of the generated
+output, so that clients can ask for just the events they want instead of
+downloading all of them:
+
+    /events?from=2015-06-01&to=2015-06-07&venue=Warsaw&artist=wilco
+
+from and to are days (YYYY-MM-DD, in New York) or epoch seconds, and every
+parameter is optional. The output is reloaded whenever its file changes.
+"""
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from operator import itemgetter
+from urlparse import parse_qs, urlparse
+import json
+import os
+import threading
+
+from mgrok import dates
+from mgrok.publish import etag
+
+_day_parser = dates.get_parser('%Y-%m-%d')
+
+
+class EventIndex(object):
+    """
+    The events of an output object, sorted by epoch overall and per venue, so
+    that time ranges are found by bisecting and venues by hashing.
+    """
+    def __init__(self, output):
+        self.updated = output.get('updated')
+        self.events_ = []
+        self.by_venue_ = {}
+        for venue_name, events in output['shows'].iteritems():
+            self.events_.extend(events)
+            venue_events = sorted(events, key=itemgetter('epoch', 'id'))
+            self.by_venue_[venue_name.lower()] = (
+                [event['epoch'] for event in venue_events], venue_events)
+        self.events_.sort(key=itemgetter('epoch', 'id'))
+        self.epochs_ = [event['epoch'] for event in self.events_]
+
+    def query(self, start=None, end=None, venue=None, artist=None):
+        """
+        Returns the events between the start and end epochs (inclusive) at a
+        venue, with an artist whose name contains artist, in order.
+        """
+        if venue is None:
+            epochs, events = self.epochs_, self.events_
+        else:
+            epochs, events = self.by_venue_.get(venue.lower(), ([], []))
+        low = 0 if start is None else bisect_left(epochs, start)
+        high = len(events) if end is None else bisect_right(epochs, end)
+        events = events[low:high]
+        if artist:
+            artist = artist.lower()
+            events = [
+                event for event in events
+                if any(artist in name.lower() for name in event['artists'])]
+        return events
+
+
+class EventStore(object):
+    """
+    The index of the output file at path, which is rebuilt whenever the
+    file's modification time changes.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.mtime_ = None
+        self.index_ = None
+        self.etag_ = None
+        self.lock_ = threading.Lock()
+
+    def current(self):
+        """Returns the (up to date) index and the ETag of its file."""
+        mtime = os.stat(self.path).st_mtime
+        with self.lock_:
+            if mtime != self.mtime_:
+                with open(self.path, 'rb') as output_file:
+                    content = output_file.read()
+                self.index_ = EventIndex(json.loads(content))
+                self.etag_ = etag(content)
+                self.mtime_ = mtime
+            return self.index_, self.etag_
+
+
+def _parse_time(value, end_of_day=False):
+    """
+    Returns the epoch of a query's from/to parameter: either epoch seconds or
+    a day, taken to mean its start (or, for to, its end).
+    """
+    if value.isdigit():
+        return int(value)
+    the_datetime = _day_parser.parse_datetime(value)
+    if end_of_day:
+        next_day = (the_datetime + timedelta(1)).strftime('%Y-%m-%d')
+        return _day_parser.parse(next_day)[1] - 1
+    return _day_parser.parse(value)[1]
+
+
+class EventRequestHandler(BaseHTTPRequestHandler):
+    """Answers /events queries out of the server's EventStore."""
+    # Keep connections alive between requests, and send each response in one
+    # go (rather than a write per header) so as not to wait on delayed ACKs.
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/events':
+            self.send_error(404)
+            return
+        params = dict(
+            (name, values[-1]) for name, values in parse_qs(url.query).items())
+        start, end = None, None
+        try:
+            if params.get('from'):
+                start = _parse_time(params['from'])
+            if params.get('to'):
+                end = _parse_time(params['to'], end_of_day=True)
+        except ValueError:
+            self.send_error(400, 'from and to must be days or epochs')
+            return
+
+        index, data_etag = self.server.store.current()
+        # The same query of the same data always gets the same answer.
+        response_etag = etag(data_etag + self.path)
+        if self.headers.get('If-None-Match') == response_etag:
+            self.send_response(304)
+            self.send_header('ETag', response_etag)
+            self.end_headers()
+            return
+
+        events = index.query(
+            start, end, params.get('venue'), params.get('artist'))
+        body = json.dumps({'updated': index.updated, 'events': events})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', response_etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Logging every request to stderr would slow everything down.
+        pass
+
+
+class EventServer(ThreadingMixIn, HTTPServer):
+    """An HTTP server answering queries for the events in an output file."""
+    daemon_threads = True
+
+    def __init__(self, address, path):
+        HTTPServer.__init__(self, address, EventRequestHandler)
+        self.store = EventStore(path)
+        # Fail now, rather than on the first request, if it can't be loaded.
+        self.store.current()
+
+
+def serve(path, host='', port=8080):
+    """Serves queries for the events in the output file at path, forever."""
+    EventServer((host, port), path).serve_forever()
@@ -0,0 +1,117 @@
+"""
+Sharing of responses between every crawler in the process.
+
+Several spiders can end up requesting the same page (e.g. an event that's
+listed on more than one MSG venue's calendar). Rather than each of them
+fetching it, the first request goes out and the rest get its response.
+"""
+
+from collections import OrderedDict
+from time import time
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.request import request_fingerprint
+from twisted.internet import defer
+
+
+class SharedResponseCache(object):
+    """
+    Responses by request fingerprint, along with who's waiting on responses
+    which are still being downloaded. Only the max_entries most recently used
+    responses are kept, and, if max_age is given, only for max_age seconds
+    (for processes which crawl the same sites over and over).
+    """
+    def __init__(self, max_entries, max_age=None):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.responses_ = OrderedDict()
+        self.in_flight_ = {}
+
+    def get(self, fingerprint):
+        """Returns a cached response, if there is one."""
+        entry = self.responses_.pop(fingerprint, None)
+        if entry is None:
+            return None
+        response, fetched = entry
+        if self.max_age and time() - fetched > self.max_age:
+            return None
+        self.responses_[fingerprint] = entry
+        return response
+
+    def is_in_flight(self, fingerprint):
+        return fingerprint in self.in_flight_
+
+    def start(self, fingerprint):
+        """Notes that a response is being downloaded."""
+        self.in_flight_[fingerprint] = []
+
+    def wait(self, fingerprint):
+        """
+        Returns a deferred which fires with an in-flight response, or with None
+        if its download fails.
+        """
+        waiter = defer.Deferred()
+        self.in_flight_[fingerprint].append(waiter)
+        return waiter
+
+    def finish(self, fingerprint, response):
+        """Hands a downloaded response to whoever's waiting on it."""
+        if response.status == 200:
+            self.responses_[fingerprint] = (response, time())
+            while len(self.responses_) > self.max_entries:
+                self.responses_.popitem(last=False)
+        for waiter in self.in_flight_.pop(fingerprint, []):
+            waiter.callback(response.replace())
+
+    def fail(self, fingerprint):
+        """Lets whoever's waiting on a failed download go fetch it themselves."""
+        for waiter in self.in_flight_.pop(fingerprint, []):
+            waiter.callback(None)
+
+
+class SharedResponseMiddleware(object):
+    """
+    Downloader middleware which answers GET requests out of the process-wide
+    SharedResponseCache, if another crawler has already fetched (or is
+    fetching) the same page.
+    """
+    cache_ = None
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        max_entries = crawler.settings.getint('SHARED_RESPONSE_CACHE_SIZE')
+        if max_entries <= 0:
+            raise NotConfigured
+        # Every crawler shares the cache made for the first one.
+        if cls.cache_ is None:
+            cls.cache_ = SharedResponseCache(
+                max_entries,
+                crawler.settings.getint('SHARED_RESPONSE_MAX_AGE') or None)
+        return cls(cls.cache_)
+
+    def process_request(self, request, spider):
+        if request.method != 'GET':
+            return None
+        fingerprint = request_fingerprint(request)
+        response = self.cache.get(fingerprint)
+        if response is not None:
+            return response.replace()
+        if self.cache.is_in_flight(fingerprint):
+            return self.cache.wait(fingerprint)
+        self.cache.start(fingerprint)
+        request.meta['shared_fingerprint'] = fingerprint
+        return None
+
+    def process_response(self, request, response, spider):
+        fingerprint = request.meta.pop('shared_fingerprint', None)
+        if fingerprint is not None:
+            self.cache.finish(fingerprint, response)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        fingerprint = request.meta.pop('shared_fingerprint', None)
+        if fingerprint is not None:
+            self.cache.fail(fingerprint)
@@ -0,0 +1,154 @@
+"""
+A SQLite database of events, kept from run to run.
+
+Events are upserted by id as they're collected, so that the database holds
+every event ever seen (with when it was first and last seen), and the output
+is exported out of it with indexed queries.
+"""
+
+from time import time
+import json
+import sqlite3
+
+from mgrok.events import Event
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    venue_name TEXT NOT NULL,
+    artists TEXT NOT NULL,
+    date TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    event_link TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_venue ON events (venue_name, epoch);
+CREATE INDEX IF NOT EXISTS events_by_epoch ON events (epoch);
+
+CREATE TABLE IF NOT EXISTS artists (
+    artist TEXT NOT NULL,
+    event_id TEXT NOT NULL REFERENCES events (id),
+    PRIMARY KEY (artist, event_id)
+);
+CREATE INDEX IF NOT EXISTS artists_by_event ON artists (event_id);
+
+CREATE TABLE IF NOT EXISTS venues (
+    venue_name TEXT PRIMARY KEY,
+    refreshed REAL NOT NULL
+);
+'''
+
+# The events each venue's latest refresh turned up
+_CURRENT_EVENTS = '''
+SELECT events.id, events.venue_name, events.artists, events.date,
+       events.epoch, events.event_link
+FROM events JOIN venues ON venues.venue_name = events.venue_name
+WHERE events.last_seen >= venues.refreshed
+'''
+
+
+def _row_event(row):
+    event = Event(row[1], json.loads(row[2]), row[3], row[4], row[5])
+    event['day'] = event.day
+    event['id'] = row[0]
+    return event
+
+
+class EventDatabase(object):
+    """
+    A SQLite database of events at path. Every event written through the
+    same EventDatabase counts as seen at the same time, and a venue's events
+    as of its latest refresh are the ones seen when it was last written to;
+    venues which don't get written to keep their events from before.
+    """
+    def __init__(self, path):
+        self.connection_ = sqlite3.connect(path)
+        self.connection_.executescript(_SCHEMA)
+        self.seen_at = time()
+        self.refreshed_ = set()
+
+    def __deepcopy__(self, memo):
+        # Scrapy deep-copies settings; every crawler should get this database.
+        return self
+
+    def write(self, event):
+        """Inserts an event, or updates it if it's been seen before."""
+        event = Event.from_dict(event)
+        event_id = event.id
+        if event.venue_name not in self.refreshed_:
+            self.connection_.execute(
+                'INSERT OR REPLACE INTO venues (venue_name, refreshed) '
+                'VALUES (?, ?)', (event.venue_name, self.seen_at))
+            self.refreshed_.add(event.venue_name)
+        row = (
+            event.venue_name, json.dumps(event.artists), event.date,
+            event.epoch, event.event_link, self.seen_at, event_id)
+        updated = self.connection_.execute(
+            'UPDATE events SET venue_name = ?, artists = ?, date = ?, '
+            'epoch = ?, event_link = ?, last_seen = ? WHERE id = ?', row)
+        if updated.rowcount:
+            self.connection_.execute(
+                'DELETE FROM artists WHERE event_id = ?', (event_id,))
+        else:
+            self.connection_.execute(
+                'INSERT INTO events (venue_name, artists, date, epoch, '
+                'event_link, last_seen, id, first_seen) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', row + (self.seen_at,))
+        self.connection_.executemany(
+            'INSERT OR IGNORE INTO artists (artist, event_id) VALUES (?, ?)',
+            [(artist.lower(), event_id) for artist in event.artists])
+
+    def write_shows(self, shows):
+        """Writes every event of a dictionary of venue name to events."""
+        for events in shows.itervalues():
+            for event in events:
+                self.write(event)
+
+    def commit(self):
+        self.connection_.commit()
+
+    def close(self):
+        self.connection_.commit()
+        self.connection_.close()
+
+    def events_between(self, start=None, end=None, venue_name=None):
+        """
+        Returns the current events between the start and end epochs
+        (inclusive), at a venue if given, ordered by venue and then time.
+        """
+        query = [_CURRENT_EVENTS]
+        params = []
+        if venue_name is not None:
+            query.append('AND events.venue_name = ?')
+            params.append(venue_name)
+        if start is not None:
+            query.append('AND events.epoch >= ?')
+            params.append(start)
+        if end is not None:
+            query.append('AND events.epoch <= ?')
+            params.append(end)
+        query.append('ORDER BY events.venue_name, events.epoch, events.id')
+        return [
+            _row_event(row)
+            for row in self.connection_.execute(' '.join(query), params)]
+
+    def events_by_artist(self, artist):
+        """Returns the current events of an artist, in order."""
+        query = (
+            _CURRENT_EVENTS +
+            'AND events.id IN (SELECT event_id FROM artists WHERE artist = ?) '
+            'ORDER BY events.epoch, events.id')
+        return [
+            _row_event(row)
+            for row in self.connection_.execute(query, (artist.lower(),))]
+
+    def export(self, start=None, end=None):
+        """
+        Returns a dictionary of venue name to its current events between the
+        start and end epochs, in order, ready for build_output.
+        """
+        shows = {}
+        for event in self.events_between(start, end):
+            shows.setdefault(event.venue_name, []).append(event)
+        return shows
@@ -0,0 +1,153 @@
+"""
+Per-host request throttling shared by every crawler in the process.
+
+Scrapy's own concurrency limits and AutoThrottle are per crawler, but many of
+our spiders are just different venues on the same ticketing site, so their
+limits have to be shared to mean anything.
+"""
+
+from collections import deque
+from email.utils import mktime_tz, parsedate_tz
+from time import time
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import defer, reactor
+
+
+class _HostSlot(object):
+    """Book-keeping for requests to a single host."""
+    def __init__(self, delay):
+        self.active = 0
+        self.delay = delay
+        self.next_allowed = 0
+        self.waiting = deque()
+        self.wakeup = None
+
+
+class HostScheduler(object):
+    """
+    Hands out permission to make requests to a host, no more than concurrency
+    at a time and spaced out by a delay which adapts to the host's latency.
+    """
+    def __init__(self, concurrency, start_delay, min_delay, max_delay):
+        self.concurrency = concurrency
+        self.start_delay = start_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.slots_ = {}
+
+    def acquire(self, host):
+        """Returns a deferred which fires once a request to host may go."""
+        slot = self._get_slot(host)
+        waiter = defer.Deferred()
+        slot.waiting.append(waiter)
+        self._process(host)
+        return waiter
+
+    def release(self, host, latency=None, status=None, retry_after=None):
+        """
+        Gives back a request's permission, adjusting the host's delay based on
+        how its response went.
+        """
+        slot = self._get_slot(host)
+        slot.active -= 1
+        if retry_after is not None:
+            # The host told us to back off; push everything waiting on it
+            # back, and be more careful from here on out.
+            slot.next_allowed = max(slot.next_allowed, time() + retry_after)
+            slot.delay = min(self.max_delay, max(slot.delay * 2, retry_after))
+        elif latency is not None:
+            # Aim to have concurrency requests in flight over the span of a
+            # single response's latency. Like AutoThrottle, errors are never
+            # taken as a reason to speed up.
+            target_delay = latency / self.concurrency
+            new_delay = max(target_delay, (slot.delay + target_delay) / 2.0)
+            if status != 200 and new_delay < slot.delay:
+                new_delay = slot.delay
+            slot.delay = min(self.max_delay, max(self.min_delay, new_delay))
+        self._process(host)
+
+    def _get_slot(self, host):
+        if host not in self.slots_:
+            self.slots_[host] = _HostSlot(self.start_delay)
+        return self.slots_[host]
+
+    def _process(self, host):
+        slot = self.slots_[host]
+        if slot.wakeup is not None and slot.wakeup.active():
+            return
+        while slot.waiting and slot.active < self.concurrency:
+            now = time()
+            if now < slot.next_allowed:
+                slot.wakeup = reactor.callLater(
+                    slot.next_allowed - now, self._process, host)
+                return
+            slot.active += 1
+            slot.next_allowed = now + slot.delay
+            slot.waiting.popleft().callback(None)
+
+
+class HostThrottleMiddleware(object):
+    """
+    Downloader middleware which holds each request until the process-wide
+    HostScheduler lets it through to its host.
+    """
+    scheduler_ = None
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        concurrency = settings.getint('HOST_THROTTLE_CONCURRENCY')
+        if concurrency <= 0:
+            raise NotConfigured
+        # Every crawler shares the scheduler made for the first one.
+        if cls.scheduler_ is None:
+            cls.scheduler_ = HostScheduler(
+                concurrency,
+                settings.getfloat('HOST_THROTTLE_START_DELAY', 0.25),
+                settings.getfloat('HOST_THROTTLE_MIN_DELAY', 0),
+                settings.getfloat('HOST_THROTTLE_MAX_DELAY', 60))
+        return cls(cls.scheduler_)
+
+    def process_request(self, request, spider):
+        host = urlparse_cached(request).hostname
+        request.meta['host_throttle_slot'] = host
+        return self.scheduler.acquire(host)
+
+    def process_response(self, request, response, spider):
+        # Responses which never made it to the network (e.g. cache hits)
+        # won't have a slot to give back.
+        host = request.meta.pop('host_throttle_slot', None)
+        if host is not None:
+            retry_after = None
+            if response.status in (429, 503):
+                retry_after = _parse_retry_after(
+                    response.headers.get('Retry-After'))
+            self.scheduler.release(
+                host,
+                request.meta.get('download_latency'),
+                response.status,
+                retry_after)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        host = request.meta.pop('host_throttle_slot', None)
+        if host is not None:
+            self.scheduler.release(host)
+
+
+def _parse_retry_after(value):
+    """Returns the seconds a Retry-After header asks us to wait, if any."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0, mktime_tz(parsed) - time())
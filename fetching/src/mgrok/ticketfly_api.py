@@ -2,12 +2,41 @@
 Classes for collecting venue information from the venues who use TicketFly
 """
 
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+from urlparse import urlparse
 import os
 import re
 
+from requests.adapters import HTTPAdapter
 import requests
-import pytz
+
+from mgrok import dates
+from mgrok.events import Event
+
+
+_sessions = {}
+_sessions_lock = Lock()
+
+def _get_session(url, pool_size):
+    """
+    Returns the keep-alive session shared by every request to url's host
+    which wants a connection pool of pool_size.
+    """
+    # Keyed by pool size, too, so that a caller with more concurrency than
+    # whoever came first doesn't end up with too small a pool.
+    key = (urlparse(url).netloc, pool_size)
+    with _sessions_lock:
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
 
 class _TicketFlyApi(object):
     """
@@ -16,6 +45,10 @@ class _TicketFlyApi(object):
     base_url = 'http://www.ticketfly.com/api'
     days_behind = 7
     days_ahead = 3 * 31
+    timeout = 30
+    # Seconds between refreshes, when running as a daemon
+    refresh_interval = 6 * 60 * 60
+    max_connections = 8
 
     def __init__(self, venue_id, org_id=None):
         self.venue_id = venue_id
@@ -40,7 +73,15 @@ class _TicketFlyApi(object):
         if self.org_id:
             request_params['orgId'] = self.org_id
 
-        return requests.get(list_event_endpoint, params=request_params)
+        session = _get_session(list_event_endpoint, self.max_connections)
+        return session.get(
+            list_event_endpoint, params=request_params, timeout=self.timeout)
+
+    def get_page(self, page_num=1):
+        """Returns the parsed body of a page of api results."""
+        response = self.make_request(page_num)
+        response.raise_for_status()
+        return response.json()
 
     def format_events(self, events):
         """
@@ -56,20 +97,16 @@ class _TicketFlyApi(object):
                 artists.append(supporter['name'])
             venue_name = event['venue']['name']
 
-            time_zone = pytz.timezone(event['venue']['timeZone'])
-            event_date = time_zone.localize(
-                datetime.strptime(event['startDate'], '%Y-%m-%d %H:%M:%S'))
+            date_parser = dates.get_parser(
+                '%Y-%m-%d %H:%M:%S', event['venue']['timeZone'])
+            event_date, epoch = date_parser.parse(event['startDate'])
             url = event['ticketPurchaseUrl']
 
             if venue_name not in formatted_events:
                 formatted_events[venue_name] = []
 
-            formatted_events[venue_name].append({
-                'artists': artists,
-                'venue_name': venue_name,
-                'date': event_date.isoformat(),
-                'event_link': url
-                })
+            formatted_events[venue_name].append(
+                Event(venue_name, artists, event_date, epoch, url))
 
 
         for venue_name, event_list in formatted_events.iteritems():
@@ -81,19 +118,43 @@ class _TicketFlyApi(object):
         return events
 
     def get_api_sites_data(self):
-        response = self.make_request()
-        events = []
-        current_page = response.json()['pageNum']
-        total_pages = response.json()['totalPages']
-        while True:
-            events.extend(response.json()['events'])
-            next_page = current_page + 1
-            if next_page > total_pages:
-                break
-            response = self.make_request(next_page)
-            current_page = next_page
-
-        return self.format_events(events)
+        return fetch_api_sites_data([self], self.max_connections)
+
+
+def fetch_api_sites_data(apis, concurrency=8, timeout=None):
+    """
+    Returns the formatted events of all of the given apis, with every page of
+    every api fetched concurrently.
+    """
+    for api in apis:
+        api.max_connections = concurrency
+        if timeout is not None:
+            api.timeout = timeout
+
+    pool = ThreadPool(concurrency)
+    try:
+        # Each api's first page says how many more there are to get.
+        first_pages = pool.map(lambda api: api.get_page(1), apis)
+        remaining_pages = []
+        for api, first_page in zip(apis, first_pages):
+            for page_num in range(2, first_page['totalPages'] + 1):
+                remaining_pages.append((api, page_num))
+        other_pages = pool.map(
+            lambda page: page[0].get_page(page[1]), remaining_pages)
+    finally:
+        pool.close()
+        pool.join()
+
+    events = dict((id(api), []) for api in apis)
+    for api, page in zip(apis, first_pages):
+        events[id(api)].extend(page['events'])
+    for (api, _), page in zip(remaining_pages, other_pages):
+        events[id(api)].extend(page['events'])
+
+    output = {}
+    for api in apis:
+        output.update(api.format_events(events[id(api)]))
+    return output
 
 
 class BrooklynBowlApi(_TicketFlyApi):
@@ -0,0 +1,78 @@
+"""
+Splitting the spiders up between worker processes, so that a crawl's parsing
+is spread over every core rather than held to the one the reactor runs on.
+
+Spiders are balanced between the workers by what they cost in the previous
+run's report, so that no one worker is left crawling long after the others.
+Spiders which crawl the same hosts are kept together, so that per-host limits
+and pages shared between spiders still work as they do in a single process.
+"""
+
+from urlparse import urlparse
+import json
+
+
+def spider_costs(report_path):
+    """
+    Returns each source's cost (the CPU seconds its parsing took, or failing
+    that its wall time) in the run report at report_path, or nothing if there
+    isn't one.
+    """
+    try:
+        with open(report_path) as report_file:
+            sources = json.load(report_file)['sources']
+    except (IOError, ValueError, KeyError):
+        return {}
+    costs = {}
+    for name, metrics in sources.iteritems():
+        cost = metrics.get('parse_cpu_time') or metrics.get('wall_time')
+        if cost:
+            costs[name] = cost
+    return costs
+
+
+def host_families(spiders):
+    """
+    Returns the spiders split up into families, in order, which have none of
+    their start_urls' hosts in common with any other family.
+    """
+    families = []
+    for spider in spiders:
+        hosts = set(
+            urlparse(url).hostname for url in getattr(spider, 'start_urls', []))
+        family = [set(hosts), [spider]]
+        # Whichever families this one shares hosts with join it.
+        for other in [other for other in families if other[0] & hosts]:
+            family[0] |= other[0]
+            family[1] = other[1] + family[1]
+            families.remove(other)
+        families.append(family)
+    families = [
+        sorted(family_spiders, key=spiders.index)
+        for _, family_spiders in families]
+    return sorted(families, key=lambda family: spiders.index(family[0]))
+
+
+def partition(spiders, costs, num_workers):
+    """
+    Returns the spiders split up into at most num_workers groups of about
+    equal total cost, by handing out the costliest host family (see
+    host_families) left to whichever group costs least so far. Spiders with
+    no known cost are taken to cost the average of those with one.
+    """
+    known_costs = [
+        costs[spider.name] for spider in spiders if spider.name in costs]
+    default_cost = (
+        sum(known_costs) / len(known_costs) if known_costs else 1.0)
+
+    def family_cost(family):
+        return sum(costs.get(spider.name, default_cost) for spider in family)
+
+    ordered = sorted(
+        host_families(spiders), key=lambda family: -family_cost(family))
+    groups = [[0.0, []] for _ in range(max(1, num_workers))]
+    for family in ordered:
+        group = min(groups, key=lambda group: group[0])
+        group[0] += family_cost(family)
+        group[1].extend(family)
+    return [group_spiders for _, group_spiders in groups if group_spiders]
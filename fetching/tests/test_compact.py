@@ -0,0 +1,55 @@
+import json
+import unittest
+
+from mgrok import compact
+from mgrok.events import Event
+from mgrok.output import build_output
+
+
+def _output():
+    return build_output({
+        'A': [
+            Event('A', ['One', 'Two'], '2015-06-01T20:00:00-04:00',
+                  1433203200, 'http://tickets.example/event/1'),
+            Event('A', ['Two'], '2015-12-01T20:00:00-05:00',
+                  1449018000, 'http://tickets.example/event/2'),
+            ],
+        'B': [
+            Event('B', ['Three'], '2015-06-02T00:30:00+00:00',
+                  1433205000, None),
+            ],
+        }, updated='2015-05-31T12:00:00-04:00')
+
+
+class CompactTest(unittest.TestCase):
+    def test_round_trip(self):
+        output = _output()
+        decoded = compact.loads(compact.dumps(output))
+        self.assertEqual(json.loads(json.dumps(output)),
+                         json.loads(json.dumps(decoded)))
+
+    def test_strings_are_stored_once(self):
+        encoded = compact.encode(_output())
+        self.assertEqual(['A', 'B'], encoded['venues'])
+        self.assertEqual(['One', 'Two', 'Three'], encoded['artists'])
+        self.assertEqual(
+            ['http://tickets.example/event/'], encoded['link_prefixes'])
+        self.assertEqual([-240, -300, 0], encoded['events']['utc_offset'])
+
+    def test_utc_offsets(self):
+        self.assertEqual(0, compact._utc_offset_minutes('2015-06-01T20:00Z'))
+        self.assertEqual(
+            330, compact._utc_offset_minutes('2015-06-01T20:00:00+05:30'))
+        self.assertEqual(
+            -240, compact._utc_offset_minutes('2015-06-01T20:00:00-04:00'))
+
+    def test_dates_without_an_offset_are_rejected(self):
+        self.assertRaises(
+            ValueError, compact._utc_offset_minutes, '2015-06-01T20:00:00')
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, compact.decode, {'format': 'nope'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+from scrapy.settings import Settings
+from twisted.internet import defer
+
+from mgrok import daemon
+from mgrok.daemon import RefreshDaemon
+
+
+class SpiderA(object):
+    pass
+
+
+class SpiderB(object):
+    pass
+
+
+class ApiC(object):
+    pass
+
+
+class FakeThreads(object):
+    """
+    Stands in for twisted.internet.threads, running what's deferred to a
+    thread straight away or, if held, once it's let go.
+    """
+    def __init__(self):
+        self.hold = False
+        self.held = []
+
+    def deferToThread(self, function, *args):
+        if not self.hold:
+            return defer.maybeDeferred(function, *args)
+        deferred = defer.Deferred()
+        self.held.append((deferred, function, args))
+        return deferred
+
+    def let_go(self):
+        deferred, function, args = self.held.pop(0)
+        deferred.callback(function(*args))
+
+
+class RefreshDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.threads = FakeThreads()
+        self.real_threads = daemon.threads
+        daemon.threads = self.threads
+        self.published = []
+        self.daemon = RefreshDaemon(
+            Settings(), [SpiderA, SpiderB], [ApiC], None,
+            self.published.append)
+
+    def tearDown(self):
+        daemon.threads = self.real_threads
+
+    def refreshed(self, source, shows):
+        self.daemon.publish(self.daemon.update(shows, source), source)
+
+    def failed(self, source):
+        # What's left of a refresh after its failure has been logged
+        self.daemon.publish(None, source)
+
+    def test_holds_off_publishing_until_everything_has_refreshed(self):
+        self.refreshed(SpiderA, {'A': [1]})
+        self.refreshed(ApiC, {'C': [3]})
+        self.assertEqual([], self.published)
+        self.refreshed(SpiderB, {'B': [2]})
+        self.assertEqual(
+            [{'A': [1], 'B': [2], 'C': [3]}], self.published)
+
+    def test_failed_first_refresh_counts(self):
+        self.refreshed(SpiderA, {'A': [1]})
+        self.refreshed(SpiderB, {'B': [2]})
+        self.failed(ApiC)
+        self.assertEqual([{'A': [1], 'B': [2]}], self.published)
+
+    def test_publishes_every_update_after_the_first_round(self):
+        self.refreshed(SpiderA, {'A': [1]})
+        self.refreshed(SpiderB, {'B': [2]})
+        self.refreshed(ApiC, {'C': [3]})
+        self.failed(SpiderB)
+        self.assertEqual(1, len(self.published))
+        self.refreshed(SpiderA, {'A2': [4]})
+        # A source's venues are swapped out for whatever it finds next
+        self.assertEqual(
+            {'A2': [4], 'B': [2], 'C': [3]}, self.published[-1])
+
+    def test_publishes_one_at_a_time_in_a_thread(self):
+        self.threads.hold = True
+        self.refreshed(SpiderA, {'A': [1]})
+        self.refreshed(SpiderB, {'B': [2]})
+        self.refreshed(ApiC, {'C': [3]})
+        self.assertEqual(1, len(self.threads.held))
+        # Both come in while the first publish is under way...
+        self.refreshed(SpiderA, {'A': [4]})
+        self.refreshed(SpiderB, {'B': [5]})
+        self.assertEqual(1, len(self.threads.held))
+        self.threads.let_go()
+        # ... and are published together once it's done.
+        self.assertEqual(1, len(self.threads.held))
+        self.threads.let_go()
+        self.assertEqual(
+            [{'A': [1], 'B': [2], 'C': [3]}, {'A': [4], 'B': [5], 'C': [3]}],
+            self.published)
+        self.assertEqual([], self.threads.held)
+
+    def test_failed_publishes_dont_stop_later_ones(self):
+        def on_update(shows):
+            self.published.append(shows)
+            if len(self.published) == 1:
+                raise IOError('disk full')
+        self.daemon.on_update = on_update
+        self.refreshed(SpiderA, {'A': [1]})
+        self.refreshed(SpiderB, {'B': [2]})
+        self.refreshed(ApiC, {'C': [3]})
+        self.refreshed(ApiC, {'C': [4]})
+        self.assertEqual(2, len(self.published))
@@ -0,0 +1,119 @@
+from datetime import date, datetime
+import threading
+import unittest
+
+from mgrok import dates
+
+
+class IsoAndEpochTest(unittest.TestCase):
+    def test_naive_datetimes_are_rejected(self):
+        self.assertRaises(
+            ValueError, dates.iso_and_epoch, datetime(2015, 6, 1, 20))
+
+
+class GuessYearTest(unittest.TestCase):
+    def test_december_listing_of_january_shows(self):
+        self.assertEqual(2016, dates.guess_year(1, 5, date(2015, 12, 20)))
+
+    def test_october_listing_of_may_shows(self):
+        self.assertEqual(2027, dates.guess_year(5, 10, date(2026, 10, 18)))
+
+    def test_recent_shows_stay_in_the_past(self):
+        self.assertEqual(2026, dates.guess_year(10, 10, date(2026, 10, 18)))
+        self.assertEqual(2015, dates.guess_year(12, 29, date(2016, 1, 5)))
+
+    def test_shows_past_the_grace_period_roll_forward(self):
+        self.assertEqual(2027, dates.guess_year(9, 1, date(2026, 10, 18)))
+        self.assertEqual(
+            2026, dates.guess_year(9, 1, date(2026, 10, 18), grace_days=60))
+
+    def test_february_29th(self):
+        self.assertEqual(2028, dates.guess_year(2, 29, date(2026, 10, 18)))
+
+
+class DateParserTest(unittest.TestCase):
+    def test_parses_into_the_timezone(self):
+        parser = dates.DateParser('%a, %b %d, %Y %I:%M %p')
+        self.assertEqual(
+            ('2015-06-01T20:00:00-04:00', 1433203200),
+            parser.parse('Mon, Jun 01, 2015 08:00 PM'))
+        self.assertEqual(
+            ('2015-12-01T00:30:00-05:00', 1448947800),
+            parser.parse('Tue, Dec 01, 2015 12:30 AM'))
+
+    def test_full_month_names_and_24_hour_times(self):
+        parser = dates.DateParser('%Y-%m-%d %H:%M:%S', 'America/Los_Angeles')
+        self.assertEqual(
+            ('2015-06-01T20:00:00-07:00', 1433214000),
+            parser.parse('2015-06-01 20:00:00'))
+        self.assertEqual(
+            '2015-06-01T00:00:00-04:00',
+            dates.DateParser('%B %d %Y').parse('June 1 2015')[0])
+
+    def test_mismatched_strings_are_rejected(self):
+        parser = dates.DateParser('%Y-%m-%d')
+        self.assertRaises(ValueError, parser.parse, '06/01/2015')
+
+    def test_memo_is_bounded(self):
+        parser = dates.DateParser('%Y-%m-%d')
+        max_memo_size = dates._MAX_MEMO_SIZE
+        dates._MAX_MEMO_SIZE = 4
+        try:
+            for day in range(1, 29):
+                parser.parse('2015-02-{:02d}'.format(day))
+        finally:
+            dates._MAX_MEMO_SIZE = max_memo_size
+        self.assertTrue(len(parser.memo_) <= 4)
+        self.assertEqual(
+            '2015-02-28T00:00:00-05:00', parser.parse('2015-02-28')[0])
+
+    def test_memo_is_safe_across_threads(self):
+        parser = dates.DateParser('%Y-%m-%d')
+        errors = []
+
+        def parse_days():
+            try:
+                for _ in range(200):
+                    for day in range(1, 29):
+                        parser.parse('2015-02-{:02d}'.format(day))
+            except Exception as e:
+                errors.append(e)
+
+        max_memo_size = dates._MAX_MEMO_SIZE
+        # Small enough for the memo to be cleared out all the time
+        dates._MAX_MEMO_SIZE = 2
+        try:
+            threads = [threading.Thread(target=parse_days) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            dates._MAX_MEMO_SIZE = max_memo_size
+        self.assertEqual([], errors)
+
+    def test_parsers_are_shared(self):
+        self.assertIs(
+            dates.get_parser('%Y-%m-%d'), dates.get_parser('%Y-%m-%d'))
+        self.assertIsNot(
+            dates.get_parser('%Y-%m-%d'),
+            dates.get_parser('%Y-%m-%d', 'UTC'))
+
+
+class ParseIsoTest(unittest.TestCase):
+    def test_offsets(self):
+        self.assertEqual(
+            ('2015-06-01T20:00:00-04:00', 1433203200),
+            dates.parse_iso('2015-06-01T20:00:00-04:00'))
+        self.assertEqual(
+            ('2015-06-02T00:00:00+00:00', 1433203200),
+            dates.parse_iso('2015-06-02T00:00Z'))
+
+    def test_dates_without_a_timezone_are_taken_to_be_in_new_york(self):
+        self.assertEqual(
+            ('2015-06-01T20:00:00-04:00', 1433203200),
+            dates.parse_iso('June 1 2015 8pm'))
+
+
+if __name__ == '__main__':
+    unittest.main()
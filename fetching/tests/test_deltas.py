@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mgrok.deltas import (
+    MANIFEST, apply_delta, diff, publish_delta, read_published)
+from mgrok.output import build_output
+from mgrok.publish import publish
+
+
+def _event(venue_name, day, artists, event_link):
+    return {
+        'venue_name': venue_name,
+        'artists': artists,
+        'date': day + 'T20:00:00-04:00',
+        'event_link': event_link,
+        }
+
+
+def _output(updated, *events):
+    shows = {}
+    for event in events:
+        shows.setdefault(event['venue_name'], []).append(event)
+    # As clients would see it, once it's been through JSON
+    return json.loads(json.dumps(build_output(shows, updated)))
+
+
+FIRST = _output(
+    'first',
+    _event('A', '2015-06-01', ['Low'], 'http://a/1'),
+    _event('A', '2015-06-02', ['Wilco'], 'http://a/2'),
+    _event('B', '2015-06-03', ['Tortoise'], 'http://b/3'))
+SECOND = _output(
+    'second',
+    _event('A', '2015-06-02', ['Wilco', 'Low'], 'http://a/2'),
+    _event('A', '2015-06-04', ['Eleventh Dream Day'], 'http://a/4'),
+    _event('C', '2015-06-05', ['Shellac'], 'http://c/5'))
+THIRD = _output(
+    'third',
+    _event('C', '2015-06-05', ['Shellac'], 'http://c/5'))
+
+
+class DiffTest(unittest.TestCase):
+    def test_apply_undoes_diff(self):
+        for old, new in [
+                (FIRST, SECOND), (SECOND, FIRST), (SECOND, THIRD),
+                (FIRST, THIRD), (THIRD, FIRST), (FIRST, FIRST)]:
+            self.assertEqual(new, apply_delta(old, diff(old, new)))
+
+    def test_only_what_changed(self):
+        delta = diff(FIRST, SECOND)
+        self.assertEqual(['A', 'B', 'C'], sorted(delta['venues']))
+        venue_delta = delta['venues']['A']
+        self.assertEqual(
+            ['http://a/4'],
+            [event['event_link'] for event in venue_delta['added']])
+        self.assertEqual(
+            [['Wilco', 'Low']],
+            [event['artists'] for event in venue_delta['changed']])
+        self.assertEqual(1, len(venue_delta['removed']))
+        self.assertIsNone(delta['days']['2015-06-01'])
+        self.assertNotIn('2015-06-02', delta['days'])
+        self.assertEqual({}, diff(FIRST, FIRST)['venues'])
+
+
+class PublishDeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.outfile = os.path.join(self.directory, 'the_raw_list.json')
+        self.delta_dir = os.path.join(self.directory, 'deltas')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def publish(self, output, max_chain=10):
+        previous_output, previous_version = read_published(self.outfile)
+        version = publish(json.dumps(output), self.outfile)
+        publish_delta(
+            previous_output, previous_version, output, version,
+            self.delta_dir, max_chain)
+        return version
+
+    def manifest(self):
+        with open(os.path.join(self.delta_dir, MANIFEST)) as manifest_file:
+            return json.load(manifest_file)
+
+    def read_delta(self, version):
+        path = os.path.join(self.delta_dir, version.strip('"') + '.json')
+        with open(path) as delta_file:
+            return json.load(delta_file)
+
+    def test_nothing_published_before(self):
+        self.assertEqual((None, None), read_published(self.outfile))
+        version = self.publish(FIRST)
+        self.assertEqual(
+            {'format': 'mgrok-delta-1', 'latest': version,
+             'updated': 'first', 'chain': []},
+            self.manifest())
+
+    def test_chained_deltas_catch_up_to_the_latest(self):
+        first = self.publish(FIRST)
+        second = self.publish(SECOND)
+        third = self.publish(THIRD)
+        manifest = self.manifest()
+        self.assertEqual(third, manifest['latest'])
+        self.assertEqual([first, second], manifest['chain'])
+
+        output = FIRST
+        for version in manifest['chain']:
+            delta = self.read_delta(version)
+            self.assertEqual(version, delta['from'])
+            output = apply_delta(output, delta)
+        self.assertEqual(THIRD, output)
+
+    def test_old_deltas_are_pruned(self):
+        first = self.publish(FIRST, max_chain=1)
+        second = self.publish(SECOND, max_chain=1)
+        self.publish(THIRD, max_chain=1)
+        self.assertEqual([second], self.manifest()['chain'])
+        self.assertEqual(
+            sorted(['index.json', second.strip('"') + '.json']),
+            sorted(
+                name for name in os.listdir(self.delta_dir)
+                if name.endswith('.json')))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.delta_dir, first.strip('"') + '.json')))
@@ -0,0 +1,40 @@
+from datetime import datetime
+import unittest
+
+import pytz
+
+from mgrok.events import Event
+
+
+class EventTest(unittest.TestCase):
+    def test_at_precomputes_the_epoch(self):
+        the_datetime = pytz.timezone('America/New_York').localize(
+            datetime(2015, 6, 1, 20))
+        event = Event.at('A', ['Artist'], the_datetime, 'http://e/1')
+        self.assertEqual('2015-06-01T20:00:00-04:00', event.date)
+        self.assertEqual(1433203200, event.epoch)
+        self.assertEqual('2015-06-01', event.day)
+
+    def test_from_dict_parses_the_date_only_without_an_epoch(self):
+        event = Event.from_dict({
+            'venue_name': 'A',
+            'artists': ['Artist'],
+            'date': '2015-06-01T20:00:00-04:00',
+            'event_link': None,
+            'day': '2015-06-01',
+            })
+        self.assertEqual(1433203200, event.epoch)
+        self.assertEqual('2015-06-01', event['day'])
+        with_epoch = Event.from_dict(dict(event, epoch=1))
+        self.assertEqual(1, with_epoch.epoch)
+
+    def test_id_is_stable_and_ignores_artists(self):
+        event = Event('A', ['One'], '2015-06-01T20:00:00-04:00', 1, 'x')
+        renamed = Event('A', ['Two'], '2015-06-01T20:00:00-04:00', 1, 'x')
+        moved = Event('A', ['One'], '2015-06-02T20:00:00-04:00', 2, 'x')
+        self.assertEqual(event.id, renamed.id)
+        self.assertNotEqual(event.id, moved.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+import unittest
+
+from mgrok import fixtures
+
+
+class PagedApi(object):
+    """An api with two pages of canned events."""
+    pages = {
+        1: {'totalPages': 2, 'events': [{'id': 1}, {'id': 2}]},
+        2: {'totalPages': 2, 'events': [{'id': 3}]},
+        }
+
+    def get_page(self, page_num=1):
+        return self.pages[page_num]
+
+
+class FixturesTest(unittest.TestCase):
+    def setUp(self):
+        self.fixture_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.fixture_dir)
+
+    def test_api_events_round_trip(self):
+        fixtures.record_api(PagedApi(), self.fixture_dir)
+        self.assertEqual(
+            [{'id': 1}, {'id': 2}, {'id': 3}],
+            fixtures.replay_api(PagedApi(), self.fixture_dir))
+
+    def test_replay_never_goes_to_the_network(self):
+        record = fixtures.record_settings(self.fixture_dir)
+        replay = fixtures.replay_settings(self.fixture_dir)
+        self.assertEqual(record['HTTPCACHE_DIR'], replay['HTTPCACHE_DIR'])
+        self.assertNotIn('HTTPCACHE_IGNORE_MISSING', record)
+        self.assertTrue(replay['HTTPCACHE_IGNORE_MISSING'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+from datetime import date
+import unittest
+
+from scrapy.exceptions import DropItem
+from scrapy.settings import Settings
+
+from mgrok.horizon import Horizon, HorizonFilterPipeline
+
+
+class HorizonTest(unittest.TestCase):
+    def horizon(self):
+        return Horizon.from_days(7, 31, today=date(2015, 6, 8))
+
+    def test_from_days_spans_whole_days_in_new_york(self):
+        horizon = self.horizon()
+        # 2015-06-01T00:00:00-04:00 and 2015-07-09T23:59:59-04:00
+        self.assertEqual(1433131200, horizon.start)
+        self.assertEqual(1436500799, horizon.end)
+
+    def test_contains_is_inclusive(self):
+        horizon = self.horizon()
+        self.assertTrue(horizon.contains(horizon.start))
+        self.assertTrue(horizon.contains(horizon.end))
+        self.assertFalse(horizon.contains(horizon.start - 1))
+        self.assertFalse(horizon.contains(horizon.end + 1))
+
+    def test_is_past(self):
+        horizon = self.horizon()
+        self.assertFalse(horizon.is_past(horizon.end))
+        self.assertTrue(horizon.is_past(horizon.end + 1))
+        self.assertFalse(horizon.is_past(horizon.start - 1))
+
+    def test_from_settings(self):
+        self.assertIsNone(Horizon.from_settings(Settings()))
+        horizon = Horizon.from_settings(Settings({'DATE_HORIZON': [1, 2]}))
+        self.assertTrue(horizon.start < horizon.end)
+
+
+class HorizonFilterPipelineTest(unittest.TestCase):
+    def pipeline(self):
+        return HorizonFilterPipeline(Horizon(100, 200))
+
+    def test_drops_events_outside_of_the_horizon(self):
+        pipeline = self.pipeline()
+        self.assertEqual({'epoch': 150}, pipeline.process_item(
+            {'epoch': 150}, None))
+        self.assertRaises(
+            DropItem, pipeline.process_item, {'epoch': 250}, None)
+
+    def test_filters_lists_of_events(self):
+        pipeline = self.pipeline()
+        item = pipeline.process_item(
+            {'events': [{'epoch': 50}, {'epoch': 150}]}, None)
+        self.assertEqual([{'epoch': 150}], item['events'])
+        self.assertRaises(
+            DropItem, pipeline.process_item,
+            {'events': [{'epoch': 50}]}, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mgrok import httpcache
+
+
+class EvictTest(unittest.TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def add_entry(self, fingerprint, size, stored_at, used_at):
+        entry_path = os.path.join(
+            self.cachedir, 'spider', fingerprint[:2], fingerprint)
+        os.makedirs(entry_path)
+        meta_path = os.path.join(entry_path, 'pickled_meta')
+        body_path = os.path.join(entry_path, 'response_body')
+        with open(meta_path, 'w'):
+            pass
+        with open(body_path, 'w') as body_file:
+            body_file.write('x' * size)
+        os.utime(meta_path, (stored_at, stored_at))
+        os.utime(body_path, (used_at, used_at))
+        return entry_path
+
+    def test_removes_least_recently_used_until_under_budget(self):
+        now = time.time()
+        oldest = self.add_entry('aa01', 100, now, now - 30)
+        middle = self.add_entry('bb02', 100, now, now - 20)
+        newest = self.add_entry('cc03', 100, now, now - 10)
+        httpcache.evict(self.cachedir, 250)
+        self.assertFalse(os.path.exists(oldest))
+        self.assertTrue(os.path.exists(middle))
+        self.assertTrue(os.path.exists(newest))
+
+    def test_removes_expired_entries(self):
+        now = time.time()
+        expired = self.add_entry('aa01', 10, now - 100, now)
+        fresh = self.add_entry('bb02', 10, now, now)
+        httpcache.evict(self.cachedir, 0, expiration_secs=50)
+        self.assertFalse(os.path.exists(expired))
+        self.assertTrue(os.path.exists(fresh))
+
+    def test_removes_half_written_entries(self):
+        now = time.time()
+        entry_path = self.add_entry('aa01', 10, now, now)
+        os.remove(os.path.join(entry_path, 'response_body'))
+        httpcache.evict(self.cachedir, 0)
+        self.assertFalse(os.path.exists(entry_path))
+
+    def test_missing_cachedir(self):
+        httpcache.evict(os.path.join(self.cachedir, 'missing'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
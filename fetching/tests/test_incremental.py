@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from scrapy.http import Request, Response
+
+from mgrok.incremental import IncrementalCrawlMiddleware
+
+
+class FakeSpider(object):
+    name = 'Some Venue'
+
+
+def _detail_request(url):
+    return Request(url, meta={'event_detail': True})
+
+
+def _listing_response():
+    return Response('http://listing', request=Request('http://listing'))
+
+
+class IncrementalCrawlMiddlewareTest(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.spider = FakeSpider()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir)
+
+    def middleware(self, refresh_limit=0, refresh_after=60):
+        middleware = IncrementalCrawlMiddleware(
+            self.store_dir, refresh_limit, refresh_after)
+        middleware.spider_opened(self.spider)
+        return middleware
+
+    def write_store(self, known):
+        with open(os.path.join(self.store_dir, 'some_venue.json'), 'w') as f:
+            json.dump(known, f)
+
+    def test_known_events_are_replayed_from_the_store(self):
+        self.write_store({
+            'http://e/1': {'fetched': time.time(), 'items': [{'id': 1}]}})
+        middleware = self.middleware()
+        output = list(middleware.process_spider_output(
+            _listing_response(),
+            [_detail_request('http://e/1'), _detail_request('http://e/2')],
+            self.spider))
+        self.assertEqual({'id': 1}, output[0])
+        self.assertEqual('http://e/2', output[1].url)
+        self.assertEqual('http://e/2', output[1].meta['incremental_key'])
+
+    def test_events_stored_without_an_epoch_get_one(self):
+        event = {
+            'venue_name': 'Some Venue',
+            'artists': ['Artist'],
+            'date': '2015-06-01T20:00:00-04:00',
+            'event_link': 'http://e/1',
+            }
+        self.write_store({'http://e/1': {
+            'fetched': time.time(),
+            'items': [event, {'events': [event]}]}})
+        middleware = self.middleware()
+        output = list(middleware.process_spider_output(
+            _listing_response(), [_detail_request('http://e/1')],
+            self.spider))
+        self.assertEqual(1433203200, output[0]['epoch'])
+        self.assertEqual(1433203200, output[1]['events'][0]['epoch'])
+        # ... and are stored with it from then on.
+        middleware.spider_closed(self.spider)
+        with open(os.path.join(self.store_dir, 'some_venue.json')) as f:
+            stored = json.load(f)['http://e/1']['items']
+        self.assertEqual(1433203200, stored[0]['epoch'])
+
+    def test_stalest_known_events_are_refreshed(self):
+        now = time.time()
+        self.write_store({
+            'http://e/1': {'fetched': now - 100, 'items': [{'id': 1}]},
+            'http://e/2': {'fetched': now - 200, 'items': [{'id': 2}]},
+            'http://e/3': {'fetched': now, 'items': [{'id': 3}]},
+            })
+        middleware = self.middleware(refresh_limit=1)
+        self.assertEqual(set(['http://e/2']), middleware.refresh_)
+
+    def test_only_listed_events_are_kept(self):
+        self.write_store({
+            'http://e/1': {'fetched': time.time(), 'items': [{'id': 1}]},
+            'http://e/gone': {'fetched': time.time(), 'items': [{'id': 0}]},
+            })
+        middleware = self.middleware()
+        list(middleware.process_spider_output(
+            _listing_response(),
+            [_detail_request('http://e/1'), _detail_request('http://e/2')],
+            self.spider))
+        detail = Response(
+            'http://e/2', request=Request(
+                'http://e/2', meta={'incremental_key': 'http://e/2'}))
+        list(middleware.process_spider_output(
+            detail, [{'id': 2}], self.spider))
+        middleware.spider_closed(self.spider)
+
+        with open(os.path.join(self.store_dir, 'some_venue.json')) as f:
+            stored = json.load(f)
+        self.assertEqual(['http://e/1', 'http://e/2'], sorted(stored))
+        self.assertEqual([{'id': 2}], stored['http://e/2']['items'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from mgrok import metrics
+from mgrok.metrics import (
+    ParseTimingMiddleware, RunReport, SourceMetrics, cpu_time)
+
+
+class FakeCrawler(object):
+    settings = Settings({'STATS_DUMP': False})
+
+
+class FakeSpider(object):
+    name = 'Some Venue'
+
+
+class SourceMetricsTest(unittest.TestCase):
+    def test_counts_items_by_venue_and_latency_percentiles(self):
+        metrics = SourceMetrics('spider')
+        for latency in range(1, 101):
+            metrics.add_response(10, latency / 100.0)
+        metrics.add_item({'venue_name': 'A'})
+        metrics.add_item({'venue_name': 'A'})
+        metrics.add_item({'venue_name': 'B'})
+        summary = metrics.to_dict()
+        self.assertEqual(100, summary['requests'])
+        self.assertEqual(1000, summary['bytes'])
+        self.assertEqual(0.51, summary['latency']['p50'])
+        self.assertEqual(1.0, summary['latency']['max'])
+        self.assertEqual(3, summary['items'])
+        self.assertEqual({'A': 2, 'B': 1}, summary['venues'])
+        self.assertIsNone(summary['wall_time'])
+
+
+class RunReportTest(unittest.TestCase):
+    def test_empty_sources_are_called_out(self):
+        report = RunReport()
+        report.source('Quiet Venue', 'spider')
+        report.source('Busy Venue', 'spider').add_item({'venue_name': 'B'})
+        self.assertEqual(['Quiet Venue'], report.to_dict()['empty'])
+
+    def test_instrumented_apis_record_their_items(self):
+        class Api(object):
+            def make_request(self, page_num=1):
+                pass
+
+            def format_events(self, events):
+                return {'A': events}
+        report = RunReport()
+        api = report.instrument_api(Api())
+        api.format_events([{'venue_name': 'A'}, {'venue_name': 'A'}])
+        self.assertEqual(2, report.to_dict()['sources']['Api']['items'])
+
+    def test_includes_reports_written_elsewhere(self):
+        worker_report = RunReport()
+        worker_report.source('Worker Venue', 'spider').add_item(
+            {'venue_name': 'W'})
+        worker_report.source('Quiet Worker Venue', 'spider')
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'worker.report.json')
+            worker_report.write(path)
+            report = RunReport()
+            report.source('Venue', 'spider').add_item({'venue_name': 'V'})
+            report.include(path)
+        finally:
+            shutil.rmtree(directory)
+        summary = report.to_dict()
+        self.assertEqual(
+            ['Quiet Worker Venue', 'Venue', 'Worker Venue'],
+            sorted(summary['sources']))
+        self.assertEqual(
+            {'W': 1}, summary['sources']['Worker Venue']['venues'])
+        self.assertEqual(['Quiet Worker Venue'], summary['empty'])
+
+
+class CpuTimeTest(unittest.TestCase):
+    @unittest.skipIf(
+        metrics._RUSAGE_THREAD is None, 'no per-thread CPU time here')
+    def test_other_threads_are_left_out(self):
+        def spin():
+            started = cpu_time()
+            while cpu_time() - started < 0.2:
+                pass
+        started = cpu_time()
+        thread = threading.Thread(target=spin)
+        thread.start()
+        thread.join()
+        self.assertTrue(cpu_time() - started < 0.1)
+
+
+class ParseTimingMiddlewareTest(unittest.TestCase):
+    def test_records_parse_time_and_none_items(self):
+        stats = MemoryStatsCollector(FakeCrawler())
+        spider = FakeSpider()
+        stats.open_spider(spider)
+        middleware = ParseTimingMiddleware(stats)
+        middleware.spider_opened(spider)
+
+        def callback():
+            sum(range(100000))
+            yield {'venue_name': 'A'}
+            yield None
+        output = list(
+            middleware.process_spider_output(None, callback(), spider))
+        self.assertEqual([{'venue_name': 'A'}, None], output)
+        self.assertEqual(1, stats.get_value('parse/responses'))
+        self.assertEqual(1, stats.get_value('parse/none_items'))
+        self.assertTrue(stats.get_value('parse/cpu_time') >= 0)
+        self.assertEqual(
+            stats.get_value('parse/cpu_time'),
+            stats.get_value('parse/max_cpu_time'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mgrok.output import (
+    JsonLinesWriter,
+    build_output,
+    finalize_jsonl,
+    group_by_venue,
+    read_jsonl,
+    sort_shows,
+    truncate_jsonl,
+    write_shards,
+    )
+
+
+def _event(venue_name, date, epoch, event_link='http://example.com/'):
+    return {
+        'venue_name': venue_name,
+        'artists': ['Artist'],
+        'date': date,
+        'epoch': epoch,
+        'event_link': event_link,
+        }
+
+
+class JsonLinesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        path = os.path.join(self.directory, 'shows.jsonl')
+        events = [
+            _event('A', '2015-06-01T20:00:00-04:00', 1433203200),
+            _event('B', '2015-06-02T20:00:00-04:00', 1433289600),
+            ]
+        writer = JsonLinesWriter(path)
+        for event in events:
+            writer.write(event)
+        writer.close()
+        self.assertEqual(events, list(read_jsonl(path)))
+
+    def test_per_venue(self):
+        path = os.path.join(self.directory, 'venues')
+        truncate_jsonl(path, per_venue=True)
+        writer = JsonLinesWriter(path, per_venue=True)
+        writer.write(_event('The Venue', '2015-06-01T20:00:00-04:00', 1))
+        writer.write(_event('Other', '2015-06-01T20:00:00-04:00', 2))
+        writer.close()
+        self.assertEqual(
+            ['other.jsonl', 'the_venue.jsonl'], sorted(os.listdir(path)))
+        self.assertEqual(
+            [2, 1], [event['epoch'] for event in read_jsonl(path, True)])
+
+    def test_nothing_written(self):
+        # e.g. a worker whose spiders all came up empty
+        path = os.path.join(self.directory, 'shows.jsonl')
+        writer = JsonLinesWriter(path)
+        writer.close()
+        self.assertEqual({}, group_by_venue(read_jsonl(path)))
+        self.assertEqual(
+            [], list(read_jsonl(os.path.join(path, 'venues'), True)))
+
+    def test_partially_written_last_line_is_skipped(self):
+        path = os.path.join(self.directory, 'shows.jsonl')
+        writer = JsonLinesWriter(path)
+        writer.write(_event('A', '2015-06-01T20:00:00-04:00', 1))
+        writer.close()
+        with open(path, 'a') as jsonl_file:
+            jsonl_file.write('{"venue_name": "A", "art')
+        self.assertEqual(1, len(list(read_jsonl(path))))
+
+    def test_truncate_then_finalize(self):
+        path = os.path.join(self.directory, 'shows.jsonl')
+        with open(path, 'w') as jsonl_file:
+            jsonl_file.write('{"left": "over"}\n')
+        truncate_jsonl(path)
+        writer = JsonLinesWriter(path)
+        writer.write(_event('A', '2015-06-02T20:00:00-04:00', 1433289600))
+        writer.write(_event('A', '2015-06-01T20:00:00-04:00', 1433203200))
+        writer.close()
+        output = finalize_jsonl(path)
+        self.assertEqual(
+            [1433203200, 1433289600],
+            [event['epoch'] for event in output['shows']['A']])
+
+
+class SortShowsTest(unittest.TestCase):
+    def test_sorts_and_drops_duplicates(self):
+        later = _event('A', '2015-06-02T20:00:00-04:00', 1433289600, 'x')
+        earlier = _event('A', '2015-06-01T20:00:00-04:00', 1433203200, 'x')
+        shows = {'A': [later, earlier, dict(later)]}
+        sort_shows(shows)
+        self.assertEqual(
+            [1433203200, 1433289600],
+            [event['epoch'] for event in shows['A']])
+
+    def test_same_time_different_links_are_kept(self):
+        shows = {'A': [
+            _event('A', '2015-06-01T20:00:00-04:00', 1433203200, 'x'),
+            _event('A', '2015-06-01T20:00:00-04:00', 1433203200, 'y'),
+            ]}
+        sort_shows(shows)
+        self.assertEqual(2, len(shows['A']))
+
+    def test_adds_day_and_id(self):
+        shows = {'A': [_event('A', '2015-06-01T23:30:00-04:00', 1433215800)]}
+        sort_shows(shows)
+        event = shows['A'][0]
+        self.assertEqual('2015-06-01', event['day'])
+        self.assertEqual(12, len(event['id']))
+
+
+class BuildOutputTest(unittest.TestCase):
+    def test_days_index_and_next_events(self):
+        now = int(time.time())
+        past = _event('A', '2015-06-01T20:00:00-04:00', 1433203200, 'p')
+        soon = _event('A', '2030-06-01T20:00:00-04:00', now + 60, 's')
+        later = _event('A', '2030-06-01T21:00:00-04:00', now + 3660, 'l')
+        other = _event('B', '2030-06-01T19:00:00-04:00', now + 30, 'o')
+        output = build_output(
+            {'A': [later, past, soon], 'B': [other]}, updated='now')
+        ids = dict(
+            (event['event_link'], event['id'])
+            for events in output['shows'].values() for event in events)
+        self.assertEqual('now', output['updated'])
+        self.assertEqual(
+            [ids['o'], ids['s'], ids['l']], output['days']['2030-06-01'])
+        self.assertEqual([ids['p']], output['days']['2015-06-01'])
+        self.assertEqual(
+            {'A': ids['s'], 'B': ids['o']}, output['next_events'])
+
+
+class WriteShardsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def output(self, *events):
+        shows = {}
+        for event in events:
+            shows.setdefault(event['venue_name'], []).append(event)
+        return build_output(shows, updated='now')
+
+    def shard_files(self):
+        return sorted(os.listdir(os.path.join(self.directory, 'shards')))
+
+    def test_manifest_points_at_content_named_shards(self):
+        manifest = write_shards(
+            self.output(
+                _event('The Venue', '2015-06-01T20:00:00-04:00', 1433203200),
+                _event('Other', '2015-06-02T20:00:00-04:00', 1433289600)),
+            self.directory)
+        venue = manifest['venues']['The Venue']
+        self.assertEqual(1, venue['count'])
+        shard = venue['shards'][0]
+        self.assertTrue(shard['path'].startswith('shards/the_venue.'))
+        self.assertTrue(shard['hash'].startswith(
+            shard['path'].split('.')[1]))
+        with open(os.path.join(self.directory, shard['path'])) as shard_file:
+            self.assertEqual(
+                [1433203200],
+                [event['epoch'] for event in json.load(shard_file)])
+        with open(os.path.join(self.directory, 'manifest.json')) as f:
+            self.assertEqual(manifest, json.load(f))
+
+    def test_shards_by_week(self):
+        manifest = write_shards(
+            self.output(
+                _event('A', '2015-06-01T20:00:00-04:00', 1433203200, 'a'),
+                _event('A', '2015-06-08T20:00:00-04:00', 1433808000, 'b')),
+            self.directory, by_week=True)
+        self.assertEqual(
+            ['2015-W23', '2015-W24'],
+            [shard['week'] for shard in manifest['venues']['A']['shards']])
+
+    def test_previous_generation_of_shards_is_kept(self):
+        write_shards(
+            self.output(_event('A', '2015-06-01T20:00:00-04:00', 1, 'a')),
+            self.directory)
+        first = self.shard_files()
+        write_shards(
+            self.output(_event('A', '2015-06-01T20:00:00-04:00', 2, 'b')),
+            self.directory)
+        second = self.shard_files()
+        self.assertEqual(2, len(second))
+        self.assertTrue(set(first) < set(second))
+        write_shards(
+            self.output(_event('A', '2015-06-01T20:00:00-04:00', 3, 'c')),
+            self.directory)
+        self.assertFalse(set(first) & set(self.shard_files()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from mgrok import publish
+
+
+class PublishTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'the_raw_list.js')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_publishes_content_with_compressed_siblings_and_etag(self):
+        content_etag = publish.publish(u'{"shows": {}}', self.path)
+        with open(self.path) as published:
+            self.assertEqual('{"shows": {}}', published.read())
+        with open(self.path + '.etag') as etag_file:
+            self.assertEqual(content_etag, etag_file.read())
+        gzipped = gzip.open(self.path + '.gz')
+        self.assertEqual('{"shows": {}}', gzipped.read())
+        gzipped.close()
+
+    def test_etag_only_depends_on_content(self):
+        self.assertEqual(publish.etag('a'), publish.etag('a'))
+        self.assertNotEqual(publish.etag('a'), publish.etag('b'))
+        self.assertEqual(
+            publish.etag('a'), publish.publish('a', self.path))
+
+    def test_gzip_is_reproducible(self):
+        self.assertEqual(publish._gzip('content'), publish._gzip('content'))
+
+    def test_no_temporary_files_are_left_behind(self):
+        publish.publish('content', self.path)
+        publish.publish('more content', self.path)
+        self.assertFalse([
+            name for name in os.listdir(self.directory)
+            if name.startswith('.')])
+
+
+if __name__ == '__main__':
+    unittest.main()
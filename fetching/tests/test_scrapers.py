@@ -0,0 +1,316 @@
+from datetime import date, timedelta
+import unittest
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from mgrok.scrapers import (
+    BoweryBallroomSpider,
+    CityWinerySpider,
+    RockwoodSpider,
+    RockwoodStageTwoSpider,
+    WarsawSpider,
+    )
+
+
+def _response(url, body):
+    return HtmlResponse(url, body=body, encoding='utf-8')
+
+
+def _spider(spider_class, **settings):
+    return spider_class.from_crawler(get_crawler(spider_class, settings))
+
+
+def _requests(outputs):
+    return [output for output in outputs if isinstance(output, Request)]
+
+
+def _events(outputs):
+    return [output for output in outputs if isinstance(output, dict)]
+
+
+def _crawl_pages(spider, first_url, page_body):
+    """
+    Crawls a spider's listing pages, starting from first_url, with the body
+    of each page given by page_body(url), and returns the urls of the pages
+    it asks for, after the first, in order (and without repeats, as the
+    scheduler would drop them).
+    """
+    requested = [first_url]
+    for url in requested:
+        for request in _requests(spider.parse(_response(url, page_body(url)))):
+            if (not request.meta.get('event_detail') and
+                    request.url not in requested):
+                requested.append(request.url)
+    return requested[1:]
+
+
+_ROCKWOOD_PAGE = '''<html><body>
+<div class="first_column"><h2>11.05 Thu</h2><table class="sched_pod">
+  <tr><td>7:00pm</td><td><a>Band A</a></td></tr>
+  <tr><td>12:00am</td><td><strong>Late B</strong></td></tr>
+</table></div>
+<div class="second_column"><h2>11.05 Thu</h2><table class="sched_pod">
+  <tr><td>8:00pm</td><td><a>Band C</a></td></tr>
+</table></div>
+<div class="third_column"><h2>11.06 Fri</h2><table class="sched_pod">
+</table></div>
+</body></html>'''
+
+
+class RockwoodSpiderTest(unittest.TestCase):
+    def parse(self, spider_class):
+        return list(spider_class().parse(
+            _response(spider_class.start_urls[0], _ROCKWOOD_PAGE)))
+
+    def test_every_stage_out_of_one_page(self):
+        events = [event for event in self.parse(RockwoodSpider) if event]
+        self.assertEqual(
+            [('Rockwood (Stage 1)', [u'Band A (7:00)', u'Late B (12:00)']),
+             ('Rockwood (Stage 2)', [u'Band C (8:00)'])],
+            [(event['venue_name'], event['artists']) for event in events])
+        self.assertEqual(
+            '11-05T19:00', events[0]['date'][5:16])
+
+    def test_single_stage(self):
+        events = self.parse(RockwoodStageTwoSpider)
+        self.assertEqual(
+            ['Rockwood (Stage 2)'],
+            [event['venue_name'] for event in events])
+
+
+_BOWERY_LISTING = '''<html><body><div class="tfly-calendar">
+<div class="one-event">
+  <h2 class="times">
+    <span class="value-title" title="2015-06-01T20:00:00-04:00"></span>
+  </h2>
+  <h1 class="headliners"><a href="/e1">Headliner</a></h1>
+  <h2 class="supports"><a href="/e1">Support</a></h2>
+</div>
+<div class="one-event">
+  <h1 class="headliners"><a href="/e2">No Date</a></h1>
+</div>
+</div></body></html>'''
+
+
+class BoweryListingTest(unittest.TestCase):
+    def parse(self, **settings):
+        spider = _spider(BoweryBallroomSpider, **settings)
+        return list(spider.parse(_response(
+            'http://www.boweryballroom.com/calendar', _BOWERY_LISTING)))
+
+    def test_events_come_straight_out_of_listings(self):
+        outputs = self.parse()
+        self.assertEqual(
+            [(['Headliner', 'Support'], 1433203200,
+              'http://www.boweryballroom.com/e1')],
+            [(event['artists'], event['epoch'], event['event_link'])
+             for event in _events(outputs)])
+        self.assertEqual(
+            ['http://www.boweryballroom.com/e2'],
+            [request.url for request in _requests(outputs)])
+        self.assertTrue(_requests(outputs)[0].meta['event_detail'])
+
+    def test_listing_first_can_be_turned_off(self):
+        outputs = self.parse(LISTING_FIRST=False)
+        self.assertEqual([], _events(outputs))
+        self.assertEqual(2, len(_requests(outputs)))
+
+
+_TICKETWEB_LISTING = '''<html><body><div class="event-list">
+<div class="media-body">
+  <p class="event-date">Mon, Jun 01, 2015
+    8:00 PM</p>
+  <p class="event-name"><a data-ng-href="/x?eventId=111">Headliner</a></p>
+  <p class="event-opening-act">Opener</p>
+</div>
+<div class="media-body">
+  <p class="event-date">Someday</p>
+  <p class="event-name"><a data-ng-href="/x?eventId=222">Undated</a></p>
+</div>
+</div></body></html>'''
+
+
+class TicketWebListingTest(unittest.TestCase):
+    def test_events_come_straight_out_of_listings(self):
+        spider = _spider(WarsawSpider)
+        outputs = list(spider.parse(_response(
+            WarsawSpider.start_urls[0], _TICKETWEB_LISTING)))
+        events = _events(outputs)
+        self.assertEqual(
+            [(['Headliner', 'Opener'], '2015-06-01T20:00:00-04:00')],
+            [(event['artists'], event['date']) for event in events])
+        self.assertTrue(events[0]['event_link'].endswith('eventId=111'))
+        self.assertEqual(
+            ['eventId=222'],
+            [request.url[-11:] for request in _requests(outputs)])
+
+
+_TICKETWEB_PAGER = '''<ul class="pagination-nav">
+  <li>1</li><li>2</li><li>3</li>
+</ul>'''
+
+
+class TicketWebPaginationTest(unittest.TestCase):
+    def test_other_pages_are_requested_at_once(self):
+        spider = _spider(WarsawSpider)
+        outputs = list(spider.parse(_response(
+            WarsawSpider.start_urls[0],
+            _TICKETWEB_LISTING.replace(
+                '</body>', _TICKETWEB_PAGER + '</body>'))))
+        self.assertEqual(
+            ['?page=2', '?page=3'],
+            [request.url[-7:] for request in _requests(outputs)
+             if not request.meta.get('event_detail')])
+        self.assertEqual(1, len(_events(outputs)))
+
+    def test_pages_past_the_horizon_are_not_requested(self):
+        # Eight pages of a week's listings each, the fourth of which goes
+        # past the horizon
+        def page_body(url):
+            page_number = int(url.rsplit('=', 1)[1]) if '?' in url else 1
+            day = date.today() + timedelta(7 * page_number - 3)
+            return _ticketweb_listing(day).replace(
+                '</body>', _TICKETWEB_PAGER_OF_8 + '</body>')
+
+        spider = _spider(WarsawSpider, DATE_HORIZON=[7, 21])
+        pages = _crawl_pages(spider, WarsawSpider.start_urls[0], page_body)
+        # Each page within the horizon asks for the three after it, but the
+        # fourth, being past it, asks for none.
+        self.assertEqual(
+            ['?page={}'.format(number) for number in range(2, 7)],
+            [url[-7:] for url in pages])
+
+
+_TICKETWEB_PAGER_OF_8 = '<ul class="pagination-nav">{}</ul>'.format(
+    ''.join('<li>{}</li>'.format(number) for number in range(1, 9)))
+
+
+def _ticketweb_listing(day):
+    return _TICKETWEB_LISTING.replace(
+        'Mon, Jun 01, 2015', day.strftime('%a, %b %d, %Y'))
+
+
+def _city_winery_listing(days, amount='', pager='', next_link=''):
+    listings = ''.join(
+        '<dl><dt>{}</dt><dd><p class="addtocart">'
+        '<a href="http://www.citywinery.com/e{}">x</a></p></dd></dl>'.format(
+            day, number)
+        for number, day in enumerate(days))
+    return (
+        '<html><body><p class="amount">{}</p>'
+        '<div class="tickets-content products-container">{}</div>'
+        '<div class="pages">{}</div>{}</body></html>'.format(
+            amount, listings, pager, next_link))
+
+
+class CityWineryPaginationTest(unittest.TestCase):
+    url = 'http://www.citywinery.com/newyork/tickets.html?cat=40&limit=2&p=1'
+
+    def parse(self, body, url=None):
+        spider = _spider(CityWinerySpider)
+        return list(spider.parse(_response(url or self.url, body)))
+
+    def pages(self, outputs):
+        return [
+            request.url for request in _requests(outputs)
+            if not request.meta.get('event_detail')]
+
+    def test_pages_planned_from_the_total(self):
+        outputs = self.parse(_city_winery_listing(
+            ['Friday, June 5', 'Saturday, June 6'],
+            amount='Items 1 to 2 of 5 total'))
+        self.assertEqual(
+            [self.url.replace('p=1', 'p=2'), self.url.replace('p=1', 'p=3')],
+            self.pages(outputs))
+        self.assertEqual(
+            2, len([request for request in _requests(outputs)
+                    if request.meta.get('event_detail')]))
+
+    def test_pages_planned_from_the_pager(self):
+        outputs = self.parse(_city_winery_listing(
+            ['Friday, June 5'],
+            pager='<a href="?p=2">2</a><a href="?p=4">4</a>'))
+        self.assertEqual(
+            [self.url.replace('p=1', 'p={}'.format(number))
+             for number in (2, 3, 4)],
+            self.pages(outputs))
+
+    def test_last_page_plans_nothing(self):
+        outputs = self.parse(_city_winery_listing(
+            ['Friday, June 5'], amount='Items 5 to 5 of 5 total',
+            next_link='<a class="next" href="http://next">next</a>'),
+            url=self.url.replace('p=1', 'p=3'))
+        self.assertEqual([], self.pages(outputs))
+
+    def test_next_link_followed_when_pages_cannot_be_planned(self):
+        outputs = self.parse(_city_winery_listing(
+            ['Friday, June 5'],
+            next_link='<a class="next" href="http://next">next</a>'))
+        self.assertEqual(['http://next'], self.pages(outputs))
+
+
+def _listed_day(days_from_now):
+    """Returns a City Winery listing's date some days from now."""
+    return (date.today() + timedelta(days_from_now)).strftime('%A, %B %d')
+
+
+class CityWineryListingDatesTest(unittest.TestCase):
+    url = CityWineryPaginationTest.url
+
+    def parse(self, body, **settings):
+        spider = _spider(CityWinerySpider, **settings)
+        return list(spider.parse(_response(self.url, body)))
+
+    def test_listings_outside_of_the_horizon_are_skipped(self):
+        outputs = self.parse(
+            _city_winery_listing(
+                [_listed_day(200), _listed_day(201)],
+                amount='Items 1 to 2 of 5 total'),
+            DATE_HORIZON=[7, 30])
+        self.assertEqual([], _requests(outputs))
+
+    def test_unexpected_dates_only_lose_their_own_filtering(self):
+        body = _city_winery_listing(
+            [_listed_day(10), 'Sometime soon', 'Caturday, Smarch 3'],
+            amount='Items 1 to 3 of 5 total')
+        outputs = self.parse(body, DATE_HORIZON=[7, 30])
+        self.assertEqual(
+            ['http://www.citywinery.com/e1', 'http://www.citywinery.com/e2'],
+            [request.url for request in _requests(outputs)
+             if request.meta.get('event_detail')][-2:])
+        self.assertEqual(
+            [self.url.replace('p=1', 'p=2'), self.url.replace('p=1', 'p=3')],
+            [request.url for request in _requests(outputs)
+             if not request.meta.get('event_detail')])
+
+    def test_pages_past_the_horizon_are_not_requested(self):
+        # Eight pages of two listings a week apart each, the fourth of which
+        # goes past the horizon
+        def page_body(url):
+            page_number = int(url.rsplit('=', 1)[1])
+            return _city_winery_listing(
+                [_listed_day(14 * page_number - 10),
+                 _listed_day(14 * page_number - 3)],
+                amount='Items 1 to 2 of 16 total')
+
+        spider = _spider(CityWinerySpider, DATE_HORIZON=[7, 45])
+        pages = _crawl_pages(spider, self.url, page_body)
+        # Each page within the horizon plans the three after it, but the
+        # fourth, being past it, plans none.
+        self.assertEqual(
+            [self.url.replace('p=1', 'p={}'.format(number))
+             for number in range(2, 7)],
+            pages)
+
+    def test_listings_without_dates_are_kept(self):
+        body = _city_winery_listing(['Friday, June 5']).replace(
+            '<dt>Friday, June 5</dt>', '')
+        outputs = self.parse(body, DATE_HORIZON=[7, 30])
+        self.assertEqual(
+            ['http://www.citywinery.com/e0'],
+            [request.url for request in _requests(outputs)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mgrok import search
+from mgrok.search import SearchIndex, build_index, normalize, trigrams
+
+
+def _event(event_id, *artists):
+    return {'id': event_id, 'artists': list(artists)}
+
+
+OUTPUT = {
+    'shows': {
+        'The Bowery Ballroom': [
+            _event('a', u'Beyonc\xe9', 'AC/DC'),
+            _event('b', 'Low'),
+            ],
+        'Baby\'s All Right': [
+            _event('c', 'low', 'Yellow  Ostrich'),
+            ],
+        '!!!': [
+            _event('d', '!!!'),
+            ],
+        },
+    }
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_case_accents_and_punctuation(self):
+        self.assertEqual(u'beyonce', normalize(u'Beyonc\xe9'))
+        self.assertEqual(u'beyonce', normalize('Beyonc\xc3\xa9'))
+        self.assertEqual(u'acdc', normalize('AC/DC'))
+        self.assertEqual(u'babys all right', normalize("Baby's  All\tRight "))
+        self.assertEqual(u'', normalize('!!!'))
+
+    def test_trigrams(self):
+        self.assertEqual(set(['low']), trigrams('low'))
+        self.assertEqual(set(['yel', 'ell', 'llo']), trigrams('yello'))
+        self.assertEqual(set(), trigrams('lo'))
+
+
+class BuildIndexTest(unittest.TestCase):
+    def test_keys_and_trigrams(self):
+        index = build_index(OUTPUT)
+        venues = index['venues']
+        # Names with nothing left to search by are left out.
+        self.assertEqual(
+            ['babys all right', 'the bowery ballroom'], venues['keys'])
+        self.assertEqual(
+            [["Baby's All Right"], ['The Bowery Ballroom']], venues['names'])
+        self.assertEqual([0, 1], venues['trigrams']['all'])
+
+        artists = index['artists']
+        self.assertEqual(
+            ['acdc', 'beyonce', 'low', 'yellow ostrich'], artists['keys'])
+        self.assertEqual(
+            [['a'], ['a'], ['b', 'c'], ['c']], artists['events'])
+        self.assertEqual([2, 3], artists['trigrams']['low'])
+
+    def test_dumps(self):
+        self.assertEqual(
+            build_index(OUTPUT), json.loads(search.dumps(OUTPUT)))
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex(build_index(OUTPUT))
+
+    def test_venues(self):
+        self.assertEqual(['The Bowery Ballroom'], self.index.venues('BOWERY'))
+        self.assertEqual(
+            ["Baby's All Right", 'The Bowery Ballroom'],
+            self.index.venues('all'))
+        self.assertEqual([], self.index.venues('warsaw'))
+
+    def test_artist_events(self):
+        self.assertEqual(set(['b', 'c']), self.index.artist_events('Low'))
+        self.assertEqual(set(['a']), self.index.artist_events(u'beyonc\xe9'))
+        self.assertEqual(set(['a']), self.index.artist_events('AC-DC'))
+        self.assertEqual(set(), self.index.artist_events('lowe'))
+
+    def test_queries_too_short_for_trigrams(self):
+        self.assertEqual(set(['b', 'c']), self.index.artist_events('ow'))
+        self.assertEqual(
+            set(['a', 'b', 'c']), self.index.artist_events(''))
+
+    def test_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'search_index.json')
+            with open(path, 'w') as index_file:
+                index_file.write(search.dumps(OUTPUT))
+            self.assertEqual(
+                set(['c']),
+                SearchIndex.load(path).artist_events('ostrich'))
+        finally:
+            shutil.rmtree(directory)
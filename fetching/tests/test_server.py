@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mgrok.server import EventIndex, EventStore, _parse_time
+
+
+def _event(venue_name, artists, epoch, event_id):
+    return {
+        'venue_name': venue_name, 'artists': artists, 'epoch': epoch,
+        'id': event_id}
+
+
+OUTPUT = {
+    'updated': 1433131200,
+    'shows': {
+        'Warsaw': [
+            _event('Warsaw', ['Wilco'], 300, 'c'),
+            _event('Warsaw', ['Tortoise'], 100, 'a'),
+            ],
+        'Bowery Ballroom': [
+            _event('Bowery Ballroom', ['Wilco', 'Low'], 200, 'b'),
+            ],
+        },
+    }
+
+
+class EventIndexTest(unittest.TestCase):
+    def ids(self, events):
+        return [event['id'] for event in events]
+
+    def test_everything_in_order(self):
+        self.assertEqual(['a', 'b', 'c'], self.ids(EventIndex(OUTPUT).query()))
+
+    def test_time_range_is_inclusive(self):
+        index = EventIndex(OUTPUT)
+        self.assertEqual(['a', 'b'], self.ids(index.query(100, 200)))
+        self.assertEqual(['b', 'c'], self.ids(index.query(start=101)))
+        self.assertEqual([], self.ids(index.query(301)))
+
+    def test_venue_and_artist(self):
+        index = EventIndex(OUTPUT)
+        self.assertEqual(
+            ['a', 'c'], self.ids(index.query(venue='warsaw')))
+        self.assertEqual(
+            ['c'], self.ids(index.query(200, venue='Warsaw')))
+        self.assertEqual(['b', 'c'], self.ids(index.query(artist='WIL')))
+        self.assertEqual([], self.ids(index.query(venue='Nowhere')))
+
+
+class ParseTimeTest(unittest.TestCase):
+    def test_epochs(self):
+        self.assertEqual(1433131200, _parse_time('1433131200'))
+
+    def test_days_in_new_york(self):
+        self.assertEqual(1433131200, _parse_time('2015-06-01'))
+        self.assertEqual(
+            1433217599, _parse_time('2015-06-01', end_of_day=True))
+
+    def test_bad_days(self):
+        self.assertRaises(ValueError, _parse_time, 'June 1')
+
+
+class EventStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'output.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, output, mtime):
+        with open(self.path, 'w') as output_file:
+            json.dump(output, output_file)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_reloads_when_the_file_changes(self):
+        self.write(OUTPUT, 1000)
+        store = EventStore(self.path)
+        index, first_etag = store.current()
+        self.assertEqual(3, len(index.query()))
+        self.assertIs(index, store.current()[0])
+
+        self.write({'updated': 1, 'shows': {}}, 2000)
+        index, second_etag = store.current()
+        self.assertEqual([], index.query())
+        self.assertNotEqual(first_etag, second_etag)
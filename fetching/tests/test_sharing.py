@@ -0,0 +1,73 @@
+import unittest
+
+from scrapy.http import Request, Response
+
+from mgrok.sharing import SharedResponseCache, SharedResponseMiddleware
+
+
+class SharedResponseCacheTest(unittest.TestCase):
+    def test_keeps_the_most_recently_used(self):
+        cache = SharedResponseCache(2)
+        for fingerprint in ['a', 'b']:
+            cache.start(fingerprint)
+            cache.finish(fingerprint, Response('http://' + fingerprint))
+        cache.get('a')
+        cache.start('c')
+        cache.finish('c', Response('http://c'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_expires_after_max_age(self):
+        cache = SharedResponseCache(2, max_age=60)
+        cache.finish('a', Response('http://a'))
+        response, fetched = cache.responses_['a']
+        cache.responses_['a'] = (response, fetched - 61)
+        self.assertIsNone(cache.get('a'))
+
+    def test_only_successful_responses_are_kept(self):
+        cache = SharedResponseCache(2)
+        cache.finish('a', Response('http://a', status=500))
+        self.assertIsNone(cache.get('a'))
+
+
+class SharedResponseMiddlewareTest(unittest.TestCase):
+    def test_same_page_is_only_fetched_once(self):
+        first = SharedResponseMiddleware(SharedResponseCache(10))
+        second = SharedResponseMiddleware(first.cache)
+        request = Request('http://example.com/page')
+        self.assertIsNone(first.process_request(request, None))
+
+        waiting = second.process_request(
+            Request('http://example.com/page'), None)
+        shared = []
+        waiting.addCallback(shared.append)
+        response = Response('http://example.com/page', body='body')
+        first.process_response(request, response, None)
+        self.assertEqual('body', shared[0].body)
+        self.assertIsNot(response, shared[0])
+
+        later = second.process_request(
+            Request('http://example.com/page'), None)
+        self.assertEqual('body', later.body)
+
+    def test_failed_downloads_let_waiters_fetch_for_themselves(self):
+        first = SharedResponseMiddleware(SharedResponseCache(10))
+        request = Request('http://example.com/page')
+        first.process_request(request, None)
+        waiting = first.process_request(
+            Request('http://example.com/page'), None)
+        shared = []
+        waiting.addCallback(shared.append)
+        first.process_exception(request, IOError(), None)
+        self.assertEqual([None], shared)
+
+    def test_other_methods_are_left_alone(self):
+        middleware = SharedResponseMiddleware(SharedResponseCache(10))
+        request = Request('http://example.com/page', method='POST')
+        self.assertIsNone(middleware.process_request(request, None))
+        self.assertNotIn('shared_fingerprint', request.meta)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mgrok.events import Event
+from mgrok.store import EventDatabase
+
+
+def _event(venue_name, artists, day, link):
+    return Event(
+        venue_name, artists, day + 'T20:00:00-04:00',
+        int(day[-2:]) * 100, link)
+
+
+class EventDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'events.db')
+        self.seen_at = 1000.0
+        self.databases = []
+
+    def tearDown(self):
+        for database in self.databases:
+            database.close()
+        shutil.rmtree(self.dir)
+
+    def run_with(self, *events):
+        """Writes events as a run of their own would, a while after the last."""
+        self.seen_at += 100
+        database = EventDatabase(self.path)
+        database.seen_at = self.seen_at
+        for event in events:
+            database.write(event)
+        database.close()
+        self.databases.append(EventDatabase(self.path))
+        return self.databases[-1]
+
+    def links(self, events):
+        return [event.event_link for event in events]
+
+    def test_upserts_by_id(self):
+        self.run_with(_event('A', ['Low'], '2015-06-01', 'http://a/1'))
+        database = self.run_with(
+            _event('A', ['Low', 'Wilco'], '2015-06-01', 'http://a/1'))
+        events = database.events_between()
+        self.assertEqual(1, len(events))
+        self.assertEqual(['Low', 'Wilco'], events[0].artists)
+        self.assertEqual('2015-06-01', events[0]['day'])
+        first_seen, last_seen = database.connection_.execute(
+            'SELECT first_seen, last_seen FROM events').fetchone()
+        self.assertEqual((1100.0, 1200.0), (first_seen, last_seen))
+
+    def test_refreshed_venues_drop_events_which_are_gone(self):
+        self.run_with(
+            _event('A', ['Low'], '2015-06-01', 'http://a/1'),
+            _event('A', ['Wilco'], '2015-06-02', 'http://a/2'),
+            _event('B', ['Tortoise'], '2015-06-03', 'http://b/3'))
+        database = self.run_with(
+            _event('A', ['Wilco'], '2015-06-02', 'http://a/2'))
+        self.assertEqual(
+            ['http://a/2', 'http://b/3'],
+            self.links(database.events_between()))
+
+    def test_events_between_is_inclusive(self):
+        database = self.run_with(
+            _event('A', ['Low'], '2015-06-01', 'http://a/1'),
+            _event('A', ['Wilco'], '2015-06-02', 'http://a/2'),
+            _event('B', ['Tortoise'], '2015-06-03', 'http://b/3'))
+        self.assertEqual(
+            ['http://a/2', 'http://b/3'],
+            self.links(database.events_between(200, 300)))
+        self.assertEqual(
+            ['http://a/1'],
+            self.links(database.events_between(end=100, venue_name='A')))
+
+    def test_events_by_artist(self):
+        database = self.run_with(
+            _event('A', ['Low'], '2015-06-02', 'http://a/2'),
+            _event('B', ['Wilco', 'low'], '2015-06-01', 'http://b/1'))
+        self.assertEqual(
+            ['http://b/1', 'http://a/2'],
+            self.links(database.events_by_artist('LOW')))
+        self.assertEqual([], database.events_by_artist('Lo'))
+
+    def test_export(self):
+        database = self.run_with(
+            _event('A', ['Wilco'], '2015-06-02', 'http://a/2'),
+            _event('A', ['Low'], '2015-06-01', 'http://a/1'),
+            _event('B', ['Tortoise'], '2015-06-03', 'http://b/3'))
+        shows = database.export(start=100, end=200)
+        self.assertEqual(['A'], list(shows))
+        self.assertEqual(
+            ['http://a/1', 'http://a/2'], self.links(shows['A']))
@@ -0,0 +1,55 @@
+import unittest
+
+from mgrok.throttle import HostScheduler, _parse_retry_after
+
+
+class HostSchedulerTest(unittest.TestCase):
+    def scheduler(self, concurrency=2):
+        return HostScheduler(concurrency, 0, 0, 60)
+
+    def test_limits_requests_in_flight_per_host(self):
+        scheduler = self.scheduler()
+        fired = []
+        for number in range(3):
+            scheduler.acquire('a.example').addCallback(
+                lambda _, number=number: fired.append(number))
+        scheduler.acquire('b.example').addCallback(
+            lambda _: fired.append('b'))
+        self.assertEqual([0, 1, 'b'], fired)
+        scheduler.release('a.example')
+        self.assertEqual([0, 1, 'b', 2], fired)
+
+    def test_delay_follows_latency(self):
+        scheduler = self.scheduler()
+        scheduler.acquire('a.example')
+        scheduler.release('a.example', latency=4, status=200)
+        self.assertEqual(2, scheduler.slots_['a.example'].delay)
+
+    def test_errors_never_speed_up(self):
+        scheduler = HostScheduler(2, 5, 0, 60)
+        scheduler.acquire('a.example')
+        scheduler.release('a.example', latency=0, status=500)
+        self.assertEqual(5, scheduler.slots_['a.example'].delay)
+
+    def test_retry_after_backs_off(self):
+        scheduler = HostScheduler(2, 1, 0, 60)
+        scheduler.acquire('a.example')
+        scheduler.release('a.example', status=429, retry_after=10)
+        self.assertEqual(10, scheduler.slots_['a.example'].delay)
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(120, _parse_retry_after(' 120 '))
+
+    def test_http_date_in_the_past(self):
+        self.assertEqual(
+            0, _parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'))
+
+    def test_missing_or_garbage(self):
+        self.assertIsNone(_parse_retry_after(None))
+        self.assertIsNone(_parse_retry_after('soon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from mgrok import ticketfly_api
+from mgrok.ticketfly_api import _TicketFlyApi, fetch_api_sites_data
+
+
+class GetSessionTest(unittest.TestCase):
+    def test_shared_per_host_and_pool_size(self):
+        session = ticketfly_api._get_session('http://a.example/x', 4)
+        self.assertIs(
+            session, ticketfly_api._get_session('http://a.example/y', 4))
+        self.assertIsNot(
+            session, ticketfly_api._get_session('http://b.example/x', 4))
+
+    def test_larger_pool_gets_its_own_session(self):
+        small = ticketfly_api._get_session('http://c.example/', 2)
+        large = ticketfly_api._get_session('http://c.example/', 16)
+        self.assertIsNot(small, large)
+        self.assertEqual(
+            16, large.get_adapter('http://c.example/')._pool_maxsize)
+
+
+def _api_event(event_id):
+    return {
+        'headliners': [{'name': 'Headliner {}'.format(event_id)}],
+        'supports': [],
+        'venue': {'name': 'Venue', 'timeZone': 'America/New_York'},
+        'startDate': '2015-06-0{} 20:00:00'.format(event_id),
+        'ticketPurchaseUrl': 'http://example.com/{}'.format(event_id),
+        }
+
+
+class FakeApi(_TicketFlyApi):
+    """An api whose pages are canned, two events to a page."""
+    def __init__(self, events):
+        super(FakeApi, self).__init__(None)
+        self.events = events
+        self.pages_requested = []
+
+    def get_page(self, page_num=1):
+        self.pages_requested.append(page_num)
+        return {
+            'totalPages': (len(self.events) + 1) // 2,
+            'events': self.events[2 * (page_num - 1):2 * page_num],
+            }
+
+
+class FetchApiSitesDataTest(unittest.TestCase):
+    def test_fetches_every_page(self):
+        api = FakeApi([_api_event(i) for i in range(1, 6)])
+        output = fetch_api_sites_data([api], concurrency=2)
+        self.assertEqual([1, 2, 3], sorted(api.pages_requested))
+        self.assertEqual(
+            ['Headliner {}'.format(i) for i in range(1, 6)],
+            [event['artists'][0] for event in output['Venue']])
+        self.assertEqual(
+            '2015-06-01T20:00:00-04:00', output['Venue'][0]['date'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mgrok.workers import host_families, partition, spider_costs
+
+
+def _spider(name, *hosts):
+    return type(str(name), (object,), {
+        'name': name,
+        'start_urls': ['http://{}/events'.format(host) for host in hosts],
+        })
+
+
+class SpiderCostsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parse_time_or_else_wall_time(self):
+        path = os.path.join(self.directory, 'report.json')
+        with open(path, 'w') as report_file:
+            json.dump({'sources': {
+                'A': {'parse_cpu_time': 2.0, 'wall_time': 10.0},
+                'B': {'parse_cpu_time': 0.0, 'wall_time': 5.0},
+                'C': {'parse_cpu_time': 0.0, 'wall_time': None},
+                }}, report_file)
+        self.assertEqual({'A': 2.0, 'B': 5.0}, spider_costs(path))
+
+    def test_no_report(self):
+        self.assertEqual(
+            {}, spider_costs(os.path.join(self.directory, 'missing.json')))
+
+
+class HostFamiliesTest(unittest.TestCase):
+    def test_spiders_sharing_hosts_are_kept_together(self):
+        a = _spider('A', 'one.com')
+        b = _spider('B', 'two.com')
+        c = _spider('C', 'three.com')
+        d = _spider('D', 'one.com')
+        # Joins B's and C's families together
+        e = _spider('E', 'three.com', 'two.com')
+        self.assertEqual(
+            [[a, d], [b, c, e]], host_families([a, b, c, d, e]))
+
+    def test_spiders_without_start_urls_are_on_their_own(self):
+        a = _spider('A')
+        b = _spider('B')
+        self.assertEqual([[a], [b]], host_families([a, b]))
+
+
+class PartitionTest(unittest.TestCase):
+    def names(self, groups):
+        return [[spider.name for spider in group] for group in groups]
+
+    def test_balances_by_cost(self):
+        spiders = [_spider(name, name + '.com') for name in 'ABCD']
+        groups = partition(
+            spiders, {'A': 1.0, 'B': 4.0, 'C': 2.0, 'D': 3.0}, 2)
+        self.assertEqual([['B', 'A'], ['D', 'C']], self.names(groups))
+
+    def test_unknown_costs_are_the_average(self):
+        spiders = [_spider(name, name + '.com') for name in 'ABC']
+        groups = partition(spiders, {'A': 4.0, 'B': 2.0}, 2)
+        self.assertEqual([['A'], ['C', 'B']], self.names(groups))
+
+    def test_host_families_stay_in_one_group(self):
+        spiders = [
+            _spider('A', 'shared.com'), _spider('B', 'shared.com'),
+            _spider('C', 'c.com'), _spider('D', 'shared.com')]
+        groups = partition(
+            spiders, {'A': 1.0, 'B': 1.0, 'C': 2.5, 'D': 1.0}, 3)
+        self.assertEqual([['A', 'B', 'D'], ['C']], self.names(groups))
+
+    def test_never_more_groups_than_spiders(self):
+        spiders = [_spider('A', 'a.com')]
+        self.assertEqual([['A']], self.names(partition(spiders, {}, 4)))
+        self.assertEqual([['A']], self.names(partition(spiders, {}, 0)))
@@ -3,24 +3,220 @@
   // Helpers //
   /////////////
 
-  var zeroOutTime = function(date) {
-    date.setHours(0);
-    date.setMinutes(0);
-    date.setSeconds(0);
-    date.setMilliseconds(0);
-    return date;
-  };
-
   var replaceNonAlphaNumChars = function(str) {
     return str.replace(/[.,-\/#!$%\^&\*;:{}=\-_`~()]/g, '');
   }
 
+  var pad = function(n) { return (n < 10 ? '0' : '') + n; };
+
+  // Events' precomputed 'day' field is their date in New York, so the
+  // browser's own time zone won't do for working out what day it is.
+  var newYorkDateFormat = null;
+  try {
+    newYorkDateFormat = new Intl.DateTimeFormat('en-US', {
+      timeZone: 'America/New_York',
+      year: 'numeric',
+      month: 'numeric',
+      day: 'numeric'
+    });
+  } catch (e) {}
+
+  // Formats a date the same way as events' precomputed 'day' field.
+  var toDayKey = function(date) {
+    if (!newYorkDateFormat) {
+      return date.getFullYear() + '-' + pad(date.getMonth() + 1) + '-' +
+        pad(date.getDate());
+    }
+    var parts = {};
+    newYorkDateFormat.formatToParts(date).forEach(function(part) {
+      parts[part.type] = part.value;
+    });
+    return parts.year + '-' + pad(+parts.month) + '-' + pad(+parts.day);
+  };
+
+  // Returns the day key of the day after the one a day key is for.
+  var nextDayKey = function(dayKey) {
+    var ymd = dayKey.split('-');
+    var date = new Date(Date.UTC(+ymd[0], +ymd[1] - 1, +ymd[2] + 1));
+    return date.getUTCFullYear() + '-' + pad(date.getUTCMonth() + 1) + '-' +
+      pad(date.getUTCDate());
+  };
+
+
+  // Normalizes a name or query the same way as mgrok.search.normalize
+  var toSearchKey = function(str) {
+    if (str.normalize) {
+      str = str.normalize('NFKD');
+    }
+    return str.toLowerCase().replace(/\s+/g, ' ').replace(/[^a-z0-9 ]/g, '')
+      .replace(/\s+/g, ' ').trim();
+  };
+
+  // Returns the positions of the keys in a section of the search index (see
+  // mgrok.search) which contain a normalized query.
+  var searchIndexSection = function(section, query) {
+    var candidates = null;
+    for (var i = 0; i + 3 <= query.length; i++) {
+      var posting = section.trigrams[query.substr(i, 3)] || [];
+      if (candidates === null) {
+        candidates = posting;
+      } else {
+        var inPosting = {};
+        posting.forEach(function(position) { inPosting[position] = true; });
+        candidates = candidates.filter(function(position) {
+          return inPosting[position];
+        });
+      }
+      if (!candidates.length) {
+        break;
+      }
+    }
+    if (candidates === null) {
+      // Too short to have trigrams
+      candidates = section.keys.map(function(key, position) {
+        return position;
+      });
+    }
+    return candidates.filter(function(position) {
+      return section.keys[position].indexOf(query) >= 0;
+    });
+  };
+
+  var LIST_URL = '/data/the_raw_list.json';
+  var SEARCH_INDEX_URL = '/data/search_index.json';
+  var DELTAS_URL = '/data/deltas/';
+  var CACHE_KEY = 'theRawList';
+  // When the deltas' manifest was last found missing (i.e. the list isn't
+  // being published with --delta-dir), and how long to go without asking
+  // for it again after that
+  var NO_DELTAS_KEY = 'theRawListNoDeltas';
+  var NO_DELTAS_RECHECK_MS = 24 * 60 * 60 * 1000;
+
+  // Applies a delta (see mgrok.deltas) to a version of the list.
+  var applyDelta = function(data, delta) {
+    var shows = angular.extend({}, data.shows);
+    angular.forEach(delta.venues, function(venueDelta, venueName) {
+      var events = {};
+      (shows[venueName] || []).forEach(function(event) {
+        events[event.id] = event;
+      });
+      (venueDelta.removed || []).forEach(function(eventId) {
+        delete events[eventId];
+      });
+      (venueDelta.changed || []).concat(venueDelta.added || []).forEach(
+        function(event) { events[event.id] = event; });
+      var venueEvents = [];
+      angular.forEach(events, function(event) { venueEvents.push(event); });
+      venueEvents.sort(function(a, b) {
+        return a.epoch - b.epoch || (a.id > b.id ? 1 : -1);
+      });
+      if (venueEvents.length) {
+        shows[venueName] = venueEvents;
+      } else {
+        delete shows[venueName];
+      }
+    });
+
+    var days = angular.extend({}, data.days);
+    angular.forEach(delta.days, function(eventIds, day) {
+      if (eventIds === null) {
+        delete days[day];
+      } else {
+        days[day] = eventIds;
+      }
+    });
+
+    return {
+      updated: delta.updated,
+      shows: shows,
+      days: days,
+      next_events: delta.next_events
+    };
+  };
+
+  // Loads the list. A copy kept from an earlier visit is caught up with the
+  // published deltas, if it isn't too old, instead of downloading all of it
+  // again.
+  var loadList = function($http, $q) {
+    var cached = null;
+    try {
+      cached = JSON.parse(window.localStorage.getItem(CACHE_KEY));
+    } catch (e) {}
+
+    var save = function(version, data) {
+      try {
+        window.localStorage.setItem(
+          CACHE_KEY, JSON.stringify({version: version, data: data}));
+      } catch (e) {}
+    };
+
+    var loadFull = function(manifest) {
+      return $http.get(LIST_URL).then(function(response) {
+        // Only remember the version if the list wasn't republished between
+        // fetching the manifest and fetching the list
+        if (manifest && response.data.updated == manifest.updated) {
+          save(manifest.latest, response.data);
+        }
+        return response.data;
+      });
+    };
+
+    var noDeltasSince = null;
+    try {
+      noDeltasSince = Number(window.localStorage.getItem(NO_DELTAS_KEY));
+    } catch (e) {}
+    if (noDeltasSince &&
+        new Date().getTime() - noDeltasSince < NO_DELTAS_RECHECK_MS) {
+      return loadFull(null);
+    }
+
+    return $http.get(DELTAS_URL + 'index.json').then(
+      function(response) {
+        var manifest = response.data;
+        if (!cached) {
+          return loadFull(manifest);
+        }
+        if (cached.version == manifest.latest) {
+          return cached.data;
+        }
+        var start = manifest.chain.indexOf(cached.version);
+        if (start < 0) {
+          return loadFull(manifest);
+        }
+        var deltas = manifest.chain.slice(start).map(function(version) {
+          return $http.get(DELTAS_URL + version.replace(/"/g, '') + '.json');
+        });
+        return $q.all(deltas).then(
+          function(responses) {
+            var data = cached.data;
+            responses.forEach(function(response) {
+              data = applyDelta(data, response.data);
+            });
+            if (data.updated != manifest.updated) {
+              return loadFull(manifest);
+            }
+            save(manifest.latest, data);
+            return data;
+          },
+          function() { return loadFull(manifest); });
+      },
+      function(response) {
+        if (response.status == 404) {
+          try {
+            window.localStorage.setItem(
+              NO_DELTAS_KEY, String(new Date().getTime()));
+          } catch (e) {}
+        }
+        return loadFull(null);
+      });
+  };
+
 
   /////////////////
   // Controllers //
   /////////////////
 
-  var TheListController = function($scope, $http, $filter) {
+  var TheListController = function($scope, $http, $q, $filter) {
     var self = this;
     this.$filter = $filter;
     this.venueNames = [];
@@ -28,15 +224,23 @@
 
     $scope['eventModel'] = this.eventModel;
 
+    // Searches go through the prebuilt index, if there is one.
+    this.searchIndex = null;
+    $http.get(SEARCH_INDEX_URL).then(function(response) {
+      self.searchIndex = response.data;
+    });
+
     // Get Venue Data
-    $http.get("/data/the_raw_list.json").then(
-      function(response) {
+    loadList($http, $q).then(
+      function(data) {
         // Add updated date
-        self.eventModel['lastUpdated'] = response.data.updated;
+        self.eventModel['lastUpdated'] = data.updated;
 
         // Add venue data to the scope
-        var shows = response.data.shows;
+        var shows = data.shows;
         self.eventModel['venueData'] = shows;
+        self.eventModel['days'] = data.days;
+        self.eventModel['nextEvents'] = data.next_events;
 
         // Add sorted venue names to the scope
         self.venueNames = [];
@@ -50,12 +254,18 @@
         });
         self.eventModel['filteredVenues'] = angular.copy(self.venueNames);
 
-        // Add a convenience array of the events to the scope
+        // Add a convenience array of the events to the scope, along with a
+        // way of looking events (and their place in their venue's list) up
+        // by id
         self.eventModel['eventList'] = [];
+        self.eventsById = {};
         angular.forEach(
           self.eventModel['venueData'], function(events, venueName) {
             self.eventModel['eventList'] =
               self.eventModel['eventList'].concat(events);
+            events.forEach(function(event, index) {
+              self.eventsById[event.id] = {event: event, index: index};
+            });
           });
 
         // Set up a default date filter
@@ -83,14 +293,16 @@
   TheListController.prototype.showNextShow = function() {
     this.hideAllShows();
     this.eventModel['showing'] = 'nextshow';
-    var today = new Date();
+    var self = this;
+    var now = new Date().getTime() / 1000;
     angular.forEach(
-      this.eventModel['venueData'], function(events, venueName) {
-        for (i in events) {
-          var event = events[i];
-          var eventDate = new Date(event.date);
-          if (eventDate >= today) {
-            event.show = true;
+      this.eventModel['nextEvents'], function(eventId, venueName) {
+        // The list may have been generated a while ago, so start looking from
+        // what was the next event back then.
+        var events = self.eventModel['venueData'][venueName];
+        for (var i = self.eventsById[eventId].index; i < events.length; i++) {
+          if (events[i].epoch >= now) {
+            events[i].show = true;
             break;
           }
         }});
@@ -106,10 +318,7 @@
   };
   
   TheListController.prototype.alreadyHappened = function(event) {
-    var today = zeroOutTime(new Date());
-    var eventDate = zeroOutTime(new Date(event.date));
-    var eventInThePast = (eventDate.getTime() < today.getTime());
-    return eventInThePast;
+    return event.day < toDayKey(new Date());
   };
 
   TheListController.prototype.isVenueDead = function(venueName) {
@@ -120,20 +329,31 @@
 
   TheListController.prototype.getEventsToShow = function(venueName) {
     var events = this.eventModel['venueData'][venueName];
-    return events.filter(function(event) { return event.show; });
+    var artistEventIds = this.eventModel['artistEventIds'];
+    return events.filter(function(event) {
+      return event.show && (!artistEventIds || artistEventIds[event.id]);
+    });
   };
 
   TheListController.prototype.showBetweenDates =
     function(startDate, endDate, opt_dateFormat) {
       this.eventModel['eventList'].forEach(function(event) {
-        var eventDate = new Date(event.date);
-        event.show = (
-          eventDate.getTime() >= startDate.getTime() &&
-            eventDate.getTime() <= endDate.getTime());
-
+        event.show = false;
       });
-      
+
+      // Only the days in the window need to be looked at
       var self = this;
+      var startEpoch = startDate.getTime() / 1000;
+      var endEpoch = endDate.getTime() / 1000;
+      var lastDay = toDayKey(endDate);
+      for (var day = toDayKey(startDate); day <= lastDay;
+           day = nextDayKey(day)) {
+        (this.eventModel['days'][day] || []).forEach(function(eventId) {
+          var event = self.eventsById[eventId].event;
+          event.show = (event.epoch >= startEpoch && event.epoch <= endEpoch);
+        });
+      }
+      
       var dateFormat = (opt_dateFormat == undefined) ?
           'EEEE @ h:mm a' : opt_dateFormat;
       this.eventModel['filterDate'] = function(date) {
@@ -144,7 +364,7 @@
   TheListController.prototype.getEventClass = function(event) {
     var alreadyHappened = this.alreadyHappened(event);
     var contains_link = (event.event_link && event.event_link != '');
-    var isToday = this.isToday(event.date)
+    var isToday = this.isToday(event)
 
     return {
       contains_link: contains_link,
@@ -154,12 +374,8 @@
     };
   };
 
-  TheListController.prototype.isToday = function(date) {
-    date = new Date(date);
-    var today = new Date();
-    return date.getYear() == today.getYear() &&
-      date.getMonth() == today.getMonth() &&
-        date.getDate() == today.getDate();
+  TheListController.prototype.isToday = function(event) {
+    return event.day == toDayKey(new Date());
   }
 
   
@@ -169,6 +385,19 @@
       this.eventModel['filteredVenues'] = angular.copy(this.venueNames);
       return;
     }
+    if (this.searchIndex) {
+      var section = this.searchIndex.venues;
+      var matches = {};
+      searchIndexSection(section, toSearchKey(filterStr)).forEach(
+        function(position) {
+          section.names[position].forEach(function(venueName) {
+            matches[venueName] = true;
+          });
+        });
+      this.eventModel['filteredVenues'] = this.venueNames.filter(
+        function(venueName) { return matches[venueName]; });
+      return;
+    }
     var filteredVenueNames = [];
     var lowerCaseFilterName = filterStr.toLowerCase();
     this.eventModel['filteredVenues'] = this.venueNames.filter(function(venueName) {
@@ -181,6 +410,25 @@
     });
   };
 
+  // Only shows the events of artists matching the artist filter. It takes
+  // the search index, so until that's loaded, nothing is filtered.
+  TheListController.prototype.filterEventsByArtist = function() {
+    var filterStr = this.eventModel['artistFilter'];
+    if (!filterStr || !this.searchIndex) {
+      this.eventModel['artistEventIds'] = null;
+      return;
+    }
+    var section = this.searchIndex.artists;
+    var artistEventIds = {};
+    searchIndexSection(section, toSearchKey(filterStr)).forEach(
+      function(position) {
+        section.events[position].forEach(function(eventId) {
+          artistEventIds[eventId] = true;
+        });
+      });
+    this.eventModel['artistEventIds'] = artistEventIds;
+  };
+
 
   ////////////////
   // Directives //